@@ -1,6 +1,9 @@
 """
 Configurações da aplicação
 """
+import json
+import os
+from dataclasses import dataclass, replace
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -14,6 +17,17 @@ class Settings(BaseSettings):
     db_password: str = "rootpassword"
     db_name: str = "auth_voice_db"
     
+    # Engine e pool de conexões do banco de dados
+    db_driver: str = "mysql"  # "mysql" ou "sqlite" (execução local, sem servidor)
+    db_sqlite_path: str = "./auth_voice.db"
+    db_async: bool = False  # engine assíncrona (aiomysql/aiosqlite) para as rotas no event loop
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0  # espera máxima por uma conexão livre do pool
+    db_pool_recycle: int = 3600
+    db_connect_timeout: int = 10
+    db_echo: bool = False  # loga todas as instruções SQL (independente de debug)
+    
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     debug: bool = True
@@ -21,6 +35,69 @@ class Settings(BaseSettings):
     similarity_threshold: float = 0.75
     vosk_model_path: str = "./models/vosk-model-small-pt-0.3"
     speechbrain_model: str = "speechbrain/spkrec-ecapa-voxceleb"
+    encoder_backend: str = "eager"  # eager, int8, torchscript ou onnx (ver scripts/benchmark_encoder.py)
+    encoder_export_dir: str = "./models/speechbrain/export"
+    
+    # Executor de inferência (FFmpeg + Vosk + SpeechBrain fora do event loop)
+    inference_executor: str = "thread"  # "thread", "process" ou "prefork"
+    inference_max_workers: int = 4
+    inference_queue_size: int = 16
+    parallel_stages: bool = True  # Vosk e SpeechBrain em paralelo dentro da requisição
+    asr_pool_size: int = 0  # KaldiRecognizers reaproveitados; 0 = workers + sessões de streaming
+    asr_grammar_mode: str = "off"  # off, vocabulary (palavras de todas as frases) ou phrase (só a frase esperada)
+    
+    # Perfil de execução em CPU (threads do PyTorch e decodificações Vosk por worker)
+    web_concurrency: int = 1  # workers do uvicorn/gunicorn na mesma máquina
+    torch_num_threads: int = 0  # 0 = perfil do autotune ou automático
+    torch_interop_threads: int = 0  # 0 = perfil do autotune ou automático
+    asr_max_concurrency: int = 0  # decodificações Vosk simultâneas por processo; 0 = perfil
+    torch_inference_mode: bool = True
+    runtime_profile_path: str = "./runtime_profile.json"  # gerado por scripts/autotune_runtime.py
+    
+    # Validação de uploads (antes e logo após a decodificação)
+    max_upload_bytes: int = 10 * 1024 * 1024
+    audio_min_seconds: float = 1.0
+    audio_max_seconds: float = 30.0
+    audio_max_clipping_ratio: float = 0.05  # fração de amostras saturadas
+    audio_min_rms_dbfs: float = -50.0
+    
+    # Detecção de atividade de voz (remoção de silêncio antes dos modelos)
+    vad_enabled: bool = True
+    vad_min_speech_seconds: float = 1.0  # abaixo disso o áudio é rejeitado
+    vad_max_pause_ms: float = 300.0  # pausas internas mais longas são encurtadas
+    
+    # Enrollment com múltiplas amostras
+    enrollment_max_samples: int = 10  # máximo de arquivos por requisição
+    
+    # Verificação em streaming (WebSocket)
+    stream_max_sessions: int = 8
+    stream_max_seconds: float = 30.0  # duração máxima de áudio por sessão
+    stream_idle_timeout_seconds: float = 10.0
+    
+    # Armazenamento binário de embeddings
+    embedding_storage_dtype: str = "float32"  # "float32" ou "float16"
+    embedding_model_version: int = 1
+    
+    # Cache em memória de embeddings de perfis
+    profile_cache_enabled: bool = True
+    profile_cache_max_entries: int = 10000
+    profile_cache_ttl_seconds: float = 5.0  # atraso máximo de uma escrita feita por outro processo/réplica
+    profile_cache_multiprocess: bool = False  # mantém o cache com vários processos no nó (ver README)
+    
+    # Índice de identificação (1:N)
+    speaker_index_ivf_threshold: int = 50000  # a partir deste número de perfis usa IVF
+    speaker_index_nlist: int = 0  # 0 = automático (~4*sqrt(N))
+    speaker_index_nprobe: int = 16
+    speaker_index_refresh_seconds: float = 600.0  # prazo para perfis novos de outros processos aparecerem
+    
+    # Micro-batching do encoder SpeechBrain
+    embedding_batching: bool = True
+    embedding_max_batch_size: int = 8
+    embedding_max_wait_ms: float = 10.0
+    embedding_max_padding_ratio: float = 0.3
+    
+    # Observabilidade por requisição (rotas /voice)
+    server_timing_enabled: bool = True  # cabeçalho Server-Timing com a duração de cada estágio
     
     class Config:
         env_file = ".env"
@@ -29,9 +106,101 @@ class Settings(BaseSettings):
     @property
     def database_url(self) -> str:
         """Retorna a URL de conexão do banco de dados"""
+        if self.db_driver == "sqlite":
+            return f"sqlite:///{self.db_sqlite_path}"
         return f"mysql+pymysql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+    
+    @property
+    def async_database_url(self) -> str:
+        """Retorna a URL de conexão do banco de dados com driver assíncrono"""
+        if self.db_driver == "sqlite":
+            return f"sqlite+aiosqlite:///{self.db_sqlite_path}"
+        return f"mysql+aiomysql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
 
 
 @lru_cache()
 def get_settings() -> Settings:
     return Settings()
+
+
+@dataclass(frozen=True)
+class RuntimeProfile:
+    """Threads do PyTorch e limite de decodificações Vosk de um processo da API"""
+    
+    torch_num_threads: int
+    torch_interop_threads: int
+    asr_max_concurrency: int
+    source: str  # "automático", caminho do perfil do autotune ou "configuração"
+
+
+def available_cores() -> int:
+    """Núcleos que este processo pode usar (respeita a afinidade de CPU, ex.: containers)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def encoder_parallelism(settings: Settings) -> int:
+    """Forward passes do encoder que podem rodar ao mesmo tempo em um worker da API"""
+    if settings.inference_executor in ("process", "prefork"):
+        return settings.inference_max_workers
+    # Com micro-batching, uma única thread executa o encoder
+    return 1 if settings.embedding_batching else settings.inference_max_workers
+
+
+def auto_runtime_profile(settings: Settings, cores: int) -> RuntimeProfile:
+    """
+    Divide os núcleos de um worker entre o Vosk e o PyTorch
+    
+    Metade dos núcleos fica com as decodificações Vosk (uma thread cada) e o resto
+    é repartido entre os forward passes simultâneos do encoder
+    
+    Args:
+        settings: Configurações da aplicação
+        cores: Núcleos disponíveis na máquina
+    
+    Returns:
+        RuntimeProfile sem oversubscription dos núcleos
+    """
+    cores_per_worker = max(1, cores // max(1, settings.web_concurrency))
+    asr_max_concurrency = max(1, cores_per_worker // 2)
+    torch_num_threads = max(1, (cores_per_worker - asr_max_concurrency) // encoder_parallelism(settings))
+    return RuntimeProfile(torch_num_threads, 1, asr_max_concurrency, "automático")
+
+
+@lru_cache()
+def get_runtime_profile() -> RuntimeProfile:
+    """
+    Perfil de execução do processo
+    
+    Ordem de precedência: valores explícitos (diferentes de 0) nas configurações,
+    perfil do autotune (se gerado para o mesmo número de núcleos e workers) e,
+    por fim, o perfil automático
+    
+    Returns:
+        RuntimeProfile a aplicar no processo
+    """
+    settings = get_settings()
+    cores = available_cores()
+    profile = auto_runtime_profile(settings, cores)
+    
+    if os.path.exists(settings.runtime_profile_path):
+        with open(settings.runtime_profile_path, 'r', encoding='utf-8') as f:
+            tuned = json.load(f)
+        if tuned.get("cores") == cores and tuned.get("web_concurrency") == settings.web_concurrency:
+            profile = RuntimeProfile(
+                tuned["torch_num_threads"],
+                tuned["torch_interop_threads"],
+                tuned["asr_max_concurrency"],
+                settings.runtime_profile_path
+            )
+    
+    overrides = {
+        name: getattr(settings, name)
+        for name in ("torch_num_threads", "torch_interop_threads", "asr_max_concurrency")
+        if getattr(settings, name) > 0
+    }
+    if overrides:
+        profile = replace(profile, source="configuração", **overrides)
+    return profile
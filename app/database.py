@@ -1,28 +1,76 @@
 """
 Configuração do banco de dados
 """
-from sqlalchemy import create_engine
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.debug
-)
+
+def _engine_options() -> Dict[str, Any]:
+    """
+    Opções comuns às engines síncrona e assíncrona (pool, timeouts e echo)
+    
+    No SQLite não há servidor: sem limite de pool nem reciclagem de conexões
+    """
+    options: Dict[str, Any] = {"echo": settings.db_echo}
+    if settings.db_driver == "sqlite":
+        # Sessões usadas pelas threads do executor de inferência
+        options["connect_args"] = {"check_same_thread": False, "timeout": settings.db_pool_timeout}
+        return options
+    
+    options.update(
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        connect_args={"connect_timeout": settings.db_connect_timeout}
+    )
+    return options
+
+
+engine = create_engine(settings.database_url, **_engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+@lru_cache()
+def get_async_engine() -> "AsyncEngine":
+    """
+    Engine assíncrona (aiomysql ou aiosqlite), criada no primeiro uso
+    
+    Usada pelas rotas que consultam o banco direto no event loop; os jobs de
+    inferência continuam na engine síncrona, nas threads ou processos do executor
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    return create_async_engine(settings.async_database_url, **_engine_options())
+
+
+@lru_cache()
+def get_async_sessionmaker() -> "async_sessionmaker[AsyncSession]":
+    """Fábrica de sessões assíncronas; como as síncronas, só obtêm conexão na primeira consulta"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
 def get_db():
     """
     Dependency para obter sessão do banco de dados
+    
+    A sessão só obtém uma conexão do pool na primeira consulta
     """
     db = SessionLocal()
     try:
@@ -31,8 +79,35 @@ def get_db():
         db.close()
 
 
+def _ping_sync() -> None:
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def ping_database() -> None:
+    """
+    Executa SELECT 1 sem bloquear o event loop
+    
+    Raises:
+        Exception: Se o banco de dados estiver inacessível
+    """
+    if not settings.db_async:
+        await asyncio.to_thread(_ping_sync)
+        return
+    
+    async with get_async_engine().connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
 def init_db():
     """
     Inicializa o banco de dados criando todas as tabelas
     """
     Base.metadata.create_all(bind=engine)
+
+
+async def dispose_engines() -> None:
+    """Fecha as conexões dos pools no shutdown"""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    engine.dispose()
@@ -1,29 +1,73 @@
 """
 Aplicação principal FastAPI
 """
+import asyncio
 import logging
-import os
 import warnings
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 warnings.filterwarnings("ignore", category=UserWarning, module="speechbrain")
 warnings.filterwarnings("ignore", message="torchaudio._backend.set_audio_backend")
 warnings.filterwarnings("ignore", message="torchvision is not available")
 
 from app.config import get_settings
-from app.database import init_db
+from app.database import dispose_engines, init_db, ping_database
+from app.middleware.request_timing import RequestIdLogFilter, RequestTimingMiddleware
+from app.middleware.upload_limit import UploadSizeLimitMiddleware
 from app.routers import voice
+from app.services.inference_executor import InferenceExecutor, get_inference_executor
+from app.services.voice_service import CHALLENGE_PHRASES_FILE, load_challenge_phrases
+from app.utils.audio_processing import warm_up_models
+from app.utils.metrics import REGISTRY
+from app.utils.runtime_profile import apply_runtime_profile
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 )
+# Os processos de inferência criados por fork herdam os handlers com o filtro
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdLogFilter())
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Estado de prontidão reportado por /health/ready
+_readiness = {"database": False, "models": False, "error": None}
+
+
+async def _warm_up(executor: InferenceExecutor) -> None:
+    """
+    Aquece os modelos onde a inferência roda e aguarda os processos de inferência
+    
+    No modo "thread" os jobs rodam no processo da API, que aquece os modelos; nos
+    modos "process" e "prefork" cada worker se aquece no inicializador e o
+    processo da API só aguarda (a sessão em streaming carrega o Vosk no primeiro uso)
+    """
+    try:
+        if executor.mode == "thread":
+            await asyncio.to_thread(warm_up_models, settings.vosk_model_path, settings.speechbrain_model)
+        else:
+            await asyncio.to_thread(executor.wait_ready)
+        _readiness["models"] = True
+        logger.info("✅ Modelos prontos")
+    except Exception as e:
+        _readiness["error"] = str(e)
+        logger.error(f"❌ Erro no aquecimento dos modelos: {e}", exc_info=True)
+
+
+async def _check_database() -> bool:
+    """Executa SELECT 1 no banco de dados"""
+    try:
+        await ping_database()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️  Banco de dados indisponível: {e}")
+        return False
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,30 +76,37 @@ async def lifespan(app: FastAPI):
     """
     logger.info("🚀 Iniciando aplicação Voice Authentication API...")
     
+    # Antes do executor: no modo prefork os workers herdam as threads configuradas
+    # e as frases de desafio (usadas na gramática do Vosk)
+    apply_runtime_profile()
+    if load_challenge_phrases():
+        logger.info("✅ Frases de desafio carregadas")
+    else:
+        logger.info(f"ℹ️  Usando frases padrão ({CHALLENGE_PHRASES_FILE} não encontrado ou vazio)")
+    
+    # O executor vem antes de qualquer outra thread: no modo prefork o fork acontece aqui
     try:
-        init_db()
+        executor = get_inference_executor()
+        executor.start()
+    except Exception as e:
+        logger.error(f"❌ Erro ao iniciar executor de inferência: {e}")
+        raise
+    
+    # Carga e aquecimento dos modelos em segundo plano, em paralelo com o banco de dados
+    warm_up = asyncio.create_task(_warm_up(executor))
+    
+    try:
+        await asyncio.to_thread(init_db)
+        if settings.db_async:
+            # Falha no startup se o driver assíncrono não estiver instalado
+            await ping_database()
+        _readiness["database"] = True
         logger.info("✅ Banco de dados inicializado com sucesso")
     except Exception as e:
         logger.error(f"❌ Erro ao inicializar banco de dados: {e}")
+        executor.shutdown()
         raise
     
-    phrases_file = "phrases.txt"
-    if os.path.exists(phrases_file):
-        try:
-            from app.services.voice_service import VoiceService
-            from app.database import SessionLocal
-            db = SessionLocal()
-            try:
-                service = VoiceService(db)
-                service.load_phrases_from_file(phrases_file)
-                logger.info("✅ Frases de desafio carregadas")
-            finally:
-                db.close()
-        except Exception as e:
-            logger.warning(f"⚠️  Erro ao carregar frases: {e}")
-    else:
-        logger.info("ℹ️  Usando frases padrão (phrases.txt não encontrado)")
-    
     logger.info("=" * 60)
     logger.info("✨ API INICIADA COM SUCESSO!")
     logger.info(f"📡 Acesse: http://localhost:8000/docs")
@@ -65,6 +116,9 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("👋 Encerrando aplicação...")
+    warm_up.cancel()
+    executor.shutdown()
+    await dispose_engines()
 
 
 
@@ -82,6 +136,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimitMiddleware)
+# Por último (mais externo): mede também as respostas 413 do limite de upload
+app.add_middleware(RequestTimingMiddleware)
 
 app.include_router(voice.router)
 
@@ -95,7 +152,11 @@ async def root():
         "endpoints": {
             "challenge": "/voice/challenge",
             "enroll": "/voice/enroll",
+            "enroll_samples": "/voice/enroll/samples",
             "verify": "/voice/verify",
+            "verify_stream": "/voice/verify/stream",
+            "identify": "/voice/identify",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
@@ -103,13 +164,37 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: o processo responde)"""
+    database = await _check_database()
     return {
         "status": "healthy",
-        "database": "connected"
+        "database": "connected" if database else "disconnected"
     }
 
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: 200 somente com o banco acessível e os modelos carregados e aquecidos"""
+    database = _readiness["database"] and await _check_database()
+    models = _readiness["models"]
+    ready = database and models
+    
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "database": "connected" if database else "disconnected",
+        "models": "warm" if models else ("error" if _readiness["error"] else "warming")
+    }
+    if _readiness["error"]:
+        body["error"] = _readiness["error"]
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas no formato texto do Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,118 @@
+"""
+Tempos por estágio de cada requisição: cabeçalho Server-Timing e log estruturado
+"""
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+from app.config import get_settings
+from app.utils.metrics import StageTrace, collect_stages
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("voice_request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    """ID da requisição em andamento (propagado às threads do executor de inferência)"""
+    return _request_id.get()
+
+
+@contextmanager
+def request_id_context(request_id: Optional[str]) -> Iterator[None]:
+    """Associa ao ID da requisição os logs de um job executado em outro processo"""
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+class RequestIdLogFilter(logging.Filter):
+    """
+    Acrescenta o atributo request_id aos registros de log ("-" fora de uma requisição)
+    
+    Instalado nos handlers do processo da API; os logs do executor e da inferência
+    passam a carregar o mesmo ID da linha de log JSON e do cabeçalho X-Request-ID
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+def server_timing_header(trace: StageTrace, total: float) -> str:
+    """
+    Monta o valor do cabeçalho Server-Timing (durações em milissegundos)
+    
+    Args:
+        trace: Estágios executados na requisição
+        total: Duração total da requisição em segundos
+    
+    Returns:
+        Ex.: "queue;dur=0.4, decode;dur=12.1, asr;dur=310.5, total;dur=355.0"
+    """
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in trace.durations().items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware ASGI que mede os estágios de cada requisição das rotas de voz
+    
+    Os estágios (decode, asr, embedding, db, ...) são coletados pelo trace da
+    requisição, inclusive quando rodam no executor de inferência, e devolvidos no
+    cabeçalho Server-Timing junto com X-Request-ID. Ao final, uma linha de log JSON
+    resume a requisição: ID, rota, status, tamanho e duração do áudio e os estágios
+    """
+    
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = ("/voice/",)):
+        self.app = app
+        self.path_prefixes = path_prefixes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = _request_id.set(request_id)
+        started = time.perf_counter()
+        status = 500
+        
+        with collect_stages() as trace:
+            async def timed_send(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                    if settings.server_timing_enabled:
+                        value = server_timing_header(trace, time.perf_counter() - started)
+                        headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+            
+            try:
+                await self.app(scope, receive, timed_send)
+            finally:
+                total = time.perf_counter() - started
+                _request_id.reset(token)
+                logger.info(json.dumps({
+                    "event": "request",
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(total * 1000, 1),
+                    "audio_bytes": int(trace.attributes.get("audio_bytes", 0)),
+                    "audio_seconds": round(trace.attributes.get("audio_seconds", 0.0), 2),
+                    "stages_ms": {stage: round(elapsed * 1000, 1) for stage, elapsed in trace.durations().items()}
+                }))
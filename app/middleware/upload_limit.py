@@ -0,0 +1,86 @@
+"""
+Limite de tamanho do corpo das requisições de upload, aplicado durante o recebimento
+"""
+import logging
+from typing import Callable, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Folga para os demais campos do formulário multipart (user_id, frase, boundaries)
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class PayloadTooLargeError(HTTPException):
+    """Corpo da requisição excedeu o limite; o FastAPI responde 413 diretamente"""
+    
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Requisição muito grande (máximo de {limit / (1024 * 1024):.1f} MB)"
+        )
+
+
+def upload_limit_for_path(method: str, path: str) -> Optional[int]:
+    """
+    Limite de bytes do corpo para cada rota de upload de áudio
+    
+    Returns:
+        Limite em bytes ou None se a rota não recebe áudio
+    """
+    if method != "POST":
+        return None
+    if path == "/voice/enroll/samples":
+        return settings.max_upload_bytes * settings.enrollment_max_samples + FORM_OVERHEAD_BYTES
+    if path in ("/voice/enroll", "/voice/verify", "/voice/identify"):
+        return settings.max_upload_bytes + FORM_OVERHEAD_BYTES
+    return None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Middleware ASGI que rejeita uploads grandes sem recebê-los por inteiro
+    
+    Content-Length acima do limite é recusado antes de ler o corpo; sem o
+    cabeçalho (chunked), a contagem é feita a cada pedaço recebido e a
+    requisição é interrompida assim que o limite é ultrapassado
+    """
+    
+    def __init__(self, app, limit_for_path: Callable[[str, str], Optional[int]] = upload_limit_for_path):
+        self.app = app
+        self.limit_for_path = limit_for_path
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        limit = self.limit_for_path(scope["method"], scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"Upload recusado em {scope['path']}: Content-Length {int(content_length)} bytes")
+            error = PayloadTooLargeError(limit)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    logger.warning(f"Upload interrompido em {scope['path']}: mais de {limit} bytes")
+                    raise PayloadTooLargeError(limit)
+            return message
+        
+        await self.app(scope, limited_receive, send)
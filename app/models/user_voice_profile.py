@@ -0,0 +1,23 @@
+"""
+Model do perfil de voz do usuário
+"""
+from sqlalchemy import Column, Integer, String, JSON, LargeBinary, TIMESTAMP, func
+from app.database import Base
+
+
+class UserVoiceProfile(Base):
+    """Perfil de voz (embedding) de um usuário"""
+    
+    __tablename__ = "user_voice_profile"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(255), nullable=False, unique=True, index=True)
+    # Formato legado (lista JSON de floats); mantido apenas até a migração dos registros
+    embedding = Column(JSON, nullable=True)
+    # Formato binário compacto (ver app/repositories/embedding_codec.py)
+    embedding_blob = Column(LargeBinary, nullable=True)
+    # Estatísticas do centróide: soma dos embeddings normalizados (float32) e número de amostras
+    embedding_sum = Column(LargeBinary, nullable=True)
+    sample_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
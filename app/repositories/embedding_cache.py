@@ -0,0 +1,165 @@
+"""
+Cache em memória de embeddings de perfis de voz (LRU + TTL)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
+from app.config import Settings, get_settings
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS = REGISTRY.counter(
+    "voice_profile_cache_hits_total",
+    "Leituras de embedding atendidas pelo cache"
+)
+CACHE_MISSES = REGISTRY.counter(
+    "voice_profile_cache_misses_total",
+    "Leituras de embedding que precisaram ir ao banco de dados"
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "voice_profile_cache_evictions_total",
+    "Entradas removidas do cache por motivo (lru, ttl, invalidation)"
+)
+CACHE_STALE_PUTS = REGISTRY.counter(
+    "voice_profile_cache_stale_puts_total",
+    "Leituras do banco descartadas porque o perfil foi alterado durante a consulta"
+)
+CACHE_SIZE = REGISTRY.gauge(
+    "voice_profile_cache_entries",
+    "Número de embeddings no cache"
+)
+
+
+class EmbeddingCache:
+    """
+    Cache thread-safe de embeddings normalizados, indexado por user_id
+    
+    As entradas expiram após ttl_seconds e, quando o cache atinge max_entries,
+    a menos usada recentemente é descartada
+    
+    Cada invalidação avança um contador de geração. Quem lê o banco após um miss
+    captura a geração antes da consulta e a informa no put: se o usuário foi
+    invalidado nesse meio tempo, a leitura pode ser anterior à escrita e não é
+    armazenada
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Geração da última invalidação de cada usuário (as max_entries mais recentes);
+        # usuários descartados daqui contam como invalidados em _horizon
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._horizon = 0
+    
+    def generation(self) -> int:
+        """Geração atual, capturada antes de ler um perfil do banco (ver put)"""
+        with self._lock:
+            return self._generation
+    
+    def get(self, user_id: str) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding em cache ou None (ausente ou expirado)
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                CACHE_MISSES.inc()
+                return None
+            
+            expires_at, embedding = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                CACHE_EVICTIONS.inc(reason="ttl")
+                CACHE_MISSES.inc()
+                CACHE_SIZE.set(len(self._entries))
+                return None
+            
+            self._entries.move_to_end(user_id)
+            CACHE_HITS.inc()
+            return embedding
+    
+    def put(self, user_id: str, embedding: np.ndarray, generation: Optional[int] = None) -> bool:
+        """
+        Armazena um embedding já normalizado (o array é marcado como somente leitura)
+        
+        Args:
+            user_id: ID do usuário
+            embedding: Embedding normalizado
+            generation: Geração capturada antes da leitura do banco; se o usuário foi
+                invalidado depois dela, o embedding é descartado
+        
+        Returns:
+            True se o embedding foi armazenado
+        """
+        embedding.setflags(write=False)
+        with self._lock:
+            if generation is not None and self._invalidated.get(user_id, self._horizon) > generation:
+                CACHE_STALE_PUTS.inc()
+                return False
+            
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc(reason="lru")
+            CACHE_SIZE.set(len(self._entries))
+            return True
+    
+    def invalidate(self, user_id: str) -> None:
+        """Remove a entrada de um usuário (chamado em toda escrita do perfil)"""
+        with self._lock:
+            self._generation += 1
+            self._invalidated[user_id] = self._generation
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self.max_entries:
+                _, self._horizon = self._invalidated.popitem(last=False)
+            
+            if self._entries.pop(user_id, None) is not None:
+                CACHE_EVICTIONS.inc(reason="invalidation")
+                CACHE_SIZE.set(len(self._entries))
+    
+    def clear(self) -> None:
+        """Remove todas as entradas (leituras em andamento também são descartadas)"""
+        with self._lock:
+            self._generation += 1
+            self._horizon = self._generation
+            self._invalidated.clear()
+            self._entries.clear()
+            CACHE_SIZE.set(0)
+
+
+def serves_from_single_process(settings: Settings) -> bool:
+    """
+    Indica se todas as leituras e escritas de perfis do nó passam por um único processo
+    
+    A invalidação só alcança o cache do processo que escreveu: com vários workers
+    do servidor web, ou com o executor de inferência em processos (enrollment e
+    verificação nos workers, exclusão no processo da API), os outros caches
+    continuariam servindo o perfil antigo até o TTL
+    """
+    return settings.web_concurrency <= 1 and settings.inference_executor == "thread"
+
+
+@lru_cache()
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    settings = get_settings()
+    if not settings.profile_cache_enabled:
+        return None
+    if not settings.profile_cache_multiprocess and not serves_from_single_process(settings):
+        logger.info(
+            "Cache de perfis desativado: vários processos no nó "
+            "(use PROFILE_CACHE_MULTIPROCESS=True para aceitar até o TTL de atraso)"
+        )
+        return None
+    return EmbeddingCache(
+        max_entries=settings.profile_cache_max_entries,
+        ttl_seconds=settings.profile_cache_ttl_seconds
+    )
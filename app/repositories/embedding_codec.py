@@ -0,0 +1,85 @@
+"""
+Codec binário para armazenamento compacto de embeddings
+"""
+import struct
+from typing import Tuple, Union
+import numpy as np
+
+MAGIC = b"VEMB"
+FORMAT_VERSION = 1
+
+# magic, versão do formato, código do dtype, dimensão, versão do modelo
+HEADER = struct.Struct("<4sBBHH")
+
+DTYPE_CODES = {
+    "float32": 1,
+    "float16": 2,
+}
+_CODE_TO_DTYPE = {
+    1: np.dtype("<f4"),
+    2: np.dtype("<f2"),
+}
+
+
+class EmbeddingHeader:
+    """Metadados lidos do cabeçalho de um embedding serializado"""
+    
+    def __init__(self, dtype: np.dtype, dim: int, model_version: int):
+        self.dtype = dtype
+        self.dim = dim
+        self.model_version = model_version
+
+
+def encode_embedding(
+    embedding: Union[list, np.ndarray],
+    dtype: str = "float32",
+    model_version: int = 1
+) -> bytes:
+    """
+    Serializa um embedding em BLOB binário com cabeçalho
+    
+    Args:
+        embedding: Vetor de embedding
+        dtype: "float32" ou "float16"
+        model_version: Versão do modelo que gerou o embedding
+        
+    Returns:
+        Bytes do cabeçalho seguido dos valores em little-endian
+    """
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"dtype de armazenamento inválido: {dtype} (use 'float32' ou 'float16')")
+    
+    code = DTYPE_CODES[dtype]
+    values = np.asarray(embedding, dtype=_CODE_TO_DTYPE[code]).reshape(-1)
+    
+    return HEADER.pack(MAGIC, FORMAT_VERSION, code, values.shape[0], model_version) + values.tobytes()
+
+
+def decode_embedding(blob: bytes) -> Tuple[np.ndarray, EmbeddingHeader]:
+    """
+    Desserializa um embedding gravado por encode_embedding
+    
+    Args:
+        blob: Bytes lidos do banco de dados
+        
+    Returns:
+        Tupla com (embedding float32, cabeçalho)
+    """
+    if len(blob) < HEADER.size:
+        raise ValueError("BLOB de embedding truncado")
+    
+    magic, version, code, dim, model_version = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("BLOB não é um embedding serializado")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versão de formato de embedding não suportada: {version}")
+    if code not in _CODE_TO_DTYPE:
+        raise ValueError(f"Código de dtype desconhecido: {code}")
+    
+    dtype = _CODE_TO_DTYPE[code]
+    expected = HEADER.size + dim * dtype.itemsize
+    if len(blob) != expected:
+        raise ValueError(f"Tamanho de BLOB inválido: {len(blob)} bytes (esperado {expected})")
+    
+    values = np.frombuffer(blob, dtype=dtype, count=dim, offset=HEADER.size)
+    return values.astype(np.float32), EmbeddingHeader(dtype, dim, model_version)
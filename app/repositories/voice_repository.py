@@ -2,11 +2,23 @@
 Repository para acesso aos dados de perfis de voz
 """
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.config import get_settings
 from app.models.user_voice_profile import UserVoiceProfile
+from app.repositories.embedding_cache import get_embedding_cache
+from app.repositories.embedding_codec import decode_embedding, encode_embedding
+from app.utils.metrics import timed_stage, track_stage
+from app.utils.scoring import l2_normalize
+from app.utils.speaker_index import apply_profile_change
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class VoiceRepository:
@@ -14,7 +26,208 @@ class VoiceRepository:
     
     def __init__(self, db: Session):
         self.db = db
+        self.cache = get_embedding_cache()
+    
+    def release_connection(self) -> None:
+        """
+        Encerra a transação de leitura e devolve a conexão ao pool
+        
+        Chamado antes da inferência, para que a conexão não fique presa durante
+        segundos de Vosk e SpeechBrain; a sessão continua utilizável e obtém outra
+        conexão na próxima consulta
+        """
+        self.db.close()
     
+    def _on_profile_changed(self, user_id: str, embedding: Optional[Union[list, np.ndarray]] = None) -> None:
+        """
+        Propaga uma escrita para o cache e para o índice de identificação
+        
+        Args:
+            user_id: ID do usuário alterado
+            embedding: Novo embedding, ou None se o perfil foi removido
+        """
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+        
+        apply_profile_change(user_id, None if embedding is None else l2_normalize(embedding))
+    
+    @staticmethod
+    def _encode(embedding: Union[list, np.ndarray]) -> bytes:
+        return encode_embedding(
+            embedding,
+            dtype=settings.embedding_storage_dtype,
+            model_version=settings.embedding_model_version
+        )
+    
+    @staticmethod
+    def _encode_sum(embedding_sum: np.ndarray) -> bytes:
+        # A soma é sempre gravada em float32 para não acumular erro de arredondamento
+        return encode_embedding(
+            embedding_sum,
+            dtype="float32",
+            model_version=settings.embedding_model_version
+        )
+    
+    def _set_running_stats(self, profile: UserVoiceProfile, embedding_sum: np.ndarray, count: int) -> np.ndarray:
+        """
+        Grava a soma/contagem no perfil e atualiza o embedding armazenado com o centróide
+        
+        Returns:
+            Centróide normalizado gravado em embedding_blob
+        """
+        centroid = l2_normalize(embedding_sum)
+        profile.embedding_sum = self._encode_sum(embedding_sum)
+        profile.sample_count = count
+        profile.embedding_blob = self._encode(centroid)
+        profile.embedding = None
+        return centroid
+    
+    def get_running_stats(self, profile: UserVoiceProfile) -> Tuple[Optional[np.ndarray], int]:
+        """
+        Retorna a soma dos embeddings normalizados e o número de amostras do perfil
+        
+        Perfis gravados antes do enrollment incremental contam como uma única amostra
+        
+        Args:
+            profile: Perfil de voz
+            
+        Returns:
+            Tupla com (soma float32 ou None, número de amostras)
+        """
+        if profile.embedding_sum is not None and profile.sample_count:
+            try:
+                embedding_sum, _ = decode_embedding(profile.embedding_sum)
+                return embedding_sum, profile.sample_count
+            except Exception as e:
+                logger.error(f"Erro ao decodificar soma de embeddings do usuário {profile.user_id}: {e}")
+        
+        embedding = self.get_embedding(profile)
+        if embedding is None:
+            return None, 0
+        return l2_normalize(embedding), 1
+    
+    def get_embedding(self, profile: UserVoiceProfile) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding de um perfil como array float32
+        
+        Lê o formato binário e, para registros ainda não migrados, o JSON legado
+        
+        Args:
+            profile: Perfil de voz
+            
+        Returns:
+            Embedding float32 ou None se o perfil não tiver embedding válido
+        """
+        try:
+            if profile.embedding_blob is not None:
+                embedding, header = decode_embedding(profile.embedding_blob)
+                if header.model_version != settings.embedding_model_version:
+                    logger.warning(
+                        f"Embedding do usuário {profile.user_id} gerado pela versão "
+                        f"{header.model_version} do modelo (atual: {settings.embedding_model_version})"
+                    )
+                return embedding
+            if profile.embedding is not None:
+                return np.asarray(profile.embedding, dtype=np.float32)
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao decodificar embedding do usuário {profile.user_id}: {e}")
+            return None
+    
+    @timed_stage("db")
+    def get_embedding_by_user_id(self, user_id: str) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding normalizado (norma unitária) do usuário
+        
+        Consulta o cache em memória antes do banco de dados. Uma leitura que cruzar
+        com uma escrita do perfil (update_profile, add_samples) não volta para o cache
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            Embedding float32 normalizado ou None se o usuário não tiver perfil
+        """
+        generation = None
+        if self.cache is not None:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                return cached
+            # Capturada antes da consulta: invalidações posteriores descartam o put
+            generation = self.cache.generation()
+        
+        profile = self.get_profile_by_user_id(user_id)
+        if not profile:
+            return None
+        
+        embedding = self.get_embedding(profile)
+        if embedding is None:
+            return None
+        
+        embedding = l2_normalize(embedding)
+        
+        if self.cache is not None:
+            self.cache.put(user_id, embedding, generation)
+        return embedding
+    
+    @timed_stage("db")
+    def get_embeddings_by_user_ids(self, user_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Lê do banco, em uma consulta, os embeddings normalizados atuais dos usuários
+        
+        Não usa o cache: confere os candidatos do índice de identificação, que
+        podem ter sido alterados ou excluídos por outro processo
+        
+        Args:
+            user_ids: IDs dos usuários
+            
+        Returns:
+            Dicionário user_id -> embedding; usuários sem perfil ficam de fora
+        """
+        if not user_ids:
+            return {}
+        
+        profiles = self.db.query(UserVoiceProfile).filter(UserVoiceProfile.user_id.in_(user_ids)).all()
+        embeddings = {}
+        for profile in profiles:
+            embedding = self.get_embedding(profile)
+            if embedding is not None:
+                embeddings[profile.user_id] = l2_normalize(embedding)
+        return embeddings
+    
+    def iter_embeddings(self, batch_size: int = 1000) -> Iterator[Tuple[str, np.ndarray]]:
+        """
+        Percorre todos os perfis em lotes, retornando embeddings normalizados
+        
+        Usado para construir o índice de identificação sem carregar a tabela de uma vez
+        
+        Args:
+            batch_size: Perfis lidos por consulta
+            
+        Yields:
+            Pares (user_id, embedding float32 normalizado)
+        """
+        last_id = 0
+        while True:
+            # Só a consulta é medida: o consumidor roda entre um yield e outro
+            with track_stage("db"):
+                profiles = self.db.query(UserVoiceProfile).filter(
+                    UserVoiceProfile.id > last_id
+                ).order_by(UserVoiceProfile.id).limit(batch_size).all()
+            
+            if not profiles:
+                break
+            
+            for profile in profiles:
+                embedding = self.get_embedding(profile)
+                if embedding is not None:
+                    yield profile.user_id, l2_normalize(embedding)
+            
+            last_id = profiles[-1].id
+            # Libera os objetos já processados da sessão
+            self.db.expunge_all()
+    
+    @timed_stage("db")
     def get_profile_by_user_id(self, user_id: str) -> Optional[UserVoiceProfile]:
         """
         Busca perfil de voz por user_id
@@ -34,7 +247,8 @@ class VoiceRepository:
             logger.error(f"Erro ao buscar perfil do usuário {user_id}: {e}")
             return None
     
-    def create_profile(self, user_id: str, embedding: list) -> Optional[UserVoiceProfile]:
+    @timed_stage("db")
+    def create_profile(self, user_id: str, embedding: Union[list, np.ndarray]) -> Optional[UserVoiceProfile]:
         """
         Cria um novo perfil de voz
         
@@ -46,12 +260,11 @@ class VoiceRepository:
             UserVoiceProfile criado ou None se falhar
         """
         try:
-            profile = UserVoiceProfile(
-                user_id=user_id,
-                embedding=embedding
-            )
+            profile = UserVoiceProfile(user_id=user_id)
+            self._set_running_stats(profile, l2_normalize(embedding), 1)
             self.db.add(profile)
             self.db.commit()
+            self._on_profile_changed(user_id, embedding)
             self.db.refresh(profile)
             logger.info(f"Perfil de voz criado para usuário {user_id}")
             return profile
@@ -60,7 +273,8 @@ class VoiceRepository:
             self.db.rollback()
             return None
     
-    def update_profile(self, user_id: str, embedding: list) -> Optional[UserVoiceProfile]:
+    @timed_stage("db")
+    def update_profile(self, user_id: str, embedding: Union[list, np.ndarray]) -> Optional[UserVoiceProfile]:
         """
         Atualiza perfil de voz existente
         
@@ -74,8 +288,9 @@ class VoiceRepository:
         try:
             profile = self.get_profile_by_user_id(user_id)
             if profile:
-                profile.embedding = embedding
+                self._set_running_stats(profile, l2_normalize(embedding), 1)
                 self.db.commit()
+                self._on_profile_changed(user_id, embedding)
                 self.db.refresh(profile)
                 logger.info(f"Perfil de voz atualizado para usuário {user_id}")
                 return profile
@@ -85,6 +300,59 @@ class VoiceRepository:
             self.db.rollback()
             return None
     
+    @timed_stage("db")
+    def add_samples(
+        self,
+        user_id: str,
+        embeddings: List[Union[list, np.ndarray]],
+        reset: bool = False
+    ) -> Optional[UserVoiceProfile]:
+        """
+        Acrescenta amostras ao perfil atualizando o centróide em O(dim)
+        
+        Apenas a soma dos embeddings normalizados e a contagem são mantidas;
+        as amostras anteriores não precisam ser reprocessadas. Cria o perfil
+        se ele ainda não existir
+        
+        Args:
+            user_id: ID do usuário
+            embeddings: Embeddings das novas amostras
+            reset: Se True, descarta as amostras anteriores
+            
+        Returns:
+            UserVoiceProfile atualizado ou None se falhar
+        """
+        try:
+            samples = l2_normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+            embedding_sum = samples.sum(axis=0)
+            count = samples.shape[0]
+            
+            # Bloqueia a linha para que atualizações concorrentes não percam amostras
+            profile = self.db.query(UserVoiceProfile).filter(
+                UserVoiceProfile.user_id == user_id
+            ).with_for_update().first()
+            
+            if profile is None:
+                profile = UserVoiceProfile(user_id=user_id)
+                self.db.add(profile)
+            elif not reset:
+                previous_sum, previous_count = self.get_running_stats(profile)
+                if previous_sum is not None and previous_sum.shape == embedding_sum.shape:
+                    embedding_sum = embedding_sum + previous_sum
+                    count += previous_count
+            
+            centroid = self._set_running_stats(profile, embedding_sum, count)
+            self.db.commit()
+            self._on_profile_changed(user_id, centroid)
+            self.db.refresh(profile)
+            logger.info(f"{samples.shape[0]} amostra(s) adicionada(s) ao perfil do usuário {user_id} (total: {count})")
+            return profile
+        except Exception as e:
+            logger.error(f"Erro ao adicionar amostras ao perfil do usuário {user_id}: {e}")
+            self.db.rollback()
+            return None
+    
+    @timed_stage("db")
     def delete_profile(self, user_id: str) -> bool:
         """
         Remove perfil de voz
@@ -100,6 +368,7 @@ class VoiceRepository:
             if profile:
                 self.db.delete(profile)
                 self.db.commit()
+                self._on_profile_changed(user_id)
                 logger.info(f"Perfil de voz removido para usuário {user_id}")
                 return True
             return False
@@ -108,6 +377,7 @@ class VoiceRepository:
             self.db.rollback()
             return False
     
+    @timed_stage("db")
     def user_exists(self, user_id: str) -> bool:
         """
         Verifica se existe um perfil de voz cadastrado para o user_id
@@ -126,3 +396,30 @@ class VoiceRepository:
         except Exception as e:
             logger.error(f"Erro ao verificar existência do usuário {user_id}: {e}")
             return False
+
+
+class AsyncVoiceRepository:
+    """Consultas de perfis de voz feitas direto no event loop (engine assíncrona, db_async)"""
+    
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+    
+    async def user_exists(self, user_id: str) -> bool:
+        """
+        Verifica se existe um perfil de voz cadastrado para o user_id
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            True se o usuário existe, False caso contrário
+        """
+        try:
+            with track_stage("db"):
+                profile_id = await self.db.scalar(
+                    select(UserVoiceProfile.id).where(UserVoiceProfile.user_id == user_id).limit(1)
+                )
+            return profile_id is not None
+        except Exception as e:
+            logger.error(f"Erro ao verificar existência do usuário {user_id}: {e}")
+            return False
@@ -1,18 +1,42 @@
 """
 Rotas da API de autenticação por voz
 """
+import asyncio
 import logging
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import SessionLocal, get_async_sessionmaker
 from app.services.voice_service import VoiceService
-from app.repositories.voice_repository import VoiceRepository
+from app.services.voice_stream import VerificationStream
+from app.services.inference_executor import (
+    InferenceQueueFullError,
+    get_inference_executor,
+    run_enroll_job,
+    run_enroll_samples_job,
+    run_identify_job,
+    run_verify_job,
+    run_verify_speech_job
+)
+from app.repositories.voice_repository import AsyncVoiceRepository, VoiceRepository
+from app.utils.audio_validation import AudioValidationError, validate_upload
+from app.utils.metrics import REGISTRY, annotate_request
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
 router = APIRouter(prefix="/voice", tags=["voice"])
 
+# Sessões de streaming abertas neste processo (acessado apenas pelo event loop)
+_active_streams = 0
+
+DECISIONS = REGISTRY.counter(
+    "voice_decisions_total",
+    "Decisões por operação: accepted, rejected, busy (fila cheia) ou error"
+)
+
 
 class ChallengeResponse(BaseModel):
     """Response para endpoint de desafio"""
@@ -25,6 +49,17 @@ class EnrollResponse(BaseModel):
     message: str
     user_id: str = None
     transcription: str = None
+    sample_count: int = None
+
+
+class EnrollSamplesResponse(BaseModel):
+    """Response para endpoint de enrollment com múltiplas amostras"""
+    success: bool
+    message: str
+    user_id: str = None
+    samples_added: int = None
+    sample_count: int = None
+    transcriptions: List[str] = None
 
 
 class VerifyResponse(BaseModel):
@@ -36,22 +71,85 @@ class VerifyResponse(BaseModel):
     transcription: str = None
 
 
+class IdentifyCandidate(BaseModel):
+    """Candidato retornado pela identificação"""
+    user_id: str
+    similarity: float
+
+
+class IdentifyResponse(BaseModel):
+    """Response para endpoint de identificação (1:N)"""
+    identified: bool
+    user_id: str = None
+    similarity: float = None
+    threshold: float = None
+    candidates: List[IdentifyCandidate] = []
+    message: str
+    transcription: str = None
+
+
 class UserExistsResponse(BaseModel):
     """Response para endpoint de verificação de existência de usuário"""
     exists: bool
     user_id: str
 
 
+async def _read_audio_upload(audio_file: UploadFile) -> bytes:
+    """
+    Lê e valida um upload de áudio antes de qualquer decodificação
+    
+    Verifica content type, tamanho, container (pelo cabeçalho) e a duração
+    declarada no cabeçalho, quando o formato permite
+    
+    Raises:
+        HTTPException: Se o upload for inválido
+    """
+    if not audio_file.content_type or 'audio' not in audio_file.content_type:
+        raise HTTPException(
+            status_code=400,
+            detail="Formato de arquivo inválido. Envie um arquivo de áudio."
+        )
+    
+    # O tamanho já foi verificado no upload (UploadSizeLimitMiddleware); o arquivo
+    # está em memória ou em disco e não precisa ser lido se exceder o limite
+    if audio_file.size is not None and audio_file.size > settings.max_upload_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Arquivo de áudio muito grande (máximo de {settings.max_upload_bytes / (1024 * 1024):.1f} MB)"
+        )
+    
+    audio_bytes = await audio_file.read()
+    annotate_request("audio_bytes", len(audio_bytes))
+    
+    if len(audio_bytes) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Arquivo de áudio vazio"
+        )
+    
+    try:
+        validate_upload(
+            audio_bytes,
+            max_bytes=settings.max_upload_bytes,
+            min_seconds=settings.audio_min_seconds,
+            max_seconds=settings.audio_max_seconds
+        )
+    except AudioValidationError as e:
+        logger.warning(f"Upload rejeitado na validação ({audio_file.filename}): {e.message}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    return audio_bytes
+
+
 @router.get("/challenge", response_model=ChallengeResponse)
-async def get_challenge(db: Session = Depends(get_db)):
+async def get_challenge():
     """
     GET /voice/challenge
     
-    Retorna uma frase aleatória para o usuário pronunciar
+    Retorna uma frase aleatória para o usuário pronunciar (sem acessar o banco)
     """
     try:
-        service = VoiceService(db)
-        phrase = service.get_challenge_phrase()
+        phrase = VoiceService.get_challenge_phrase()
         
         logger.info(f"Frase de desafio gerada: {phrase}")
         
@@ -67,7 +165,7 @@ async def enroll_voice(
     user_id: str = Form(...),
     phrase_expected: str = Form(...),
     audio_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    append: bool = Form(False)
 ):
     """
     POST /voice/enroll
@@ -78,44 +176,96 @@ async def enroll_voice(
         user_id: ID único do usuário
         phrase_expected: Frase que deveria ter sido pronunciada
         audio_file: Arquivo de áudio (WAV recomendado)
+        append: Se True, acrescenta a amostra ao perfil em vez de substituí-lo
     """
     try:
-        # Validar formato do arquivo
-        if not audio_file.content_type or 'audio' not in audio_file.content_type:
+        audio_bytes = await _read_audio_upload(audio_file)
+        
+        executor = get_inference_executor()
+        result = await executor.run(run_enroll_job, user_id, audio_bytes, phrase_expected, append)
+        DECISIONS.inc(operation="enroll", result="accepted" if result["success"] else "rejected")
+        
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["message"])
+        
+        return EnrollResponse(**result)
+    
+    except HTTPException:
+        raise
+    except InferenceQueueFullError as e:
+        DECISIONS.inc(operation="enroll", result="busy")
+        logger.warning(f"Enrollment rejeitado: {e}")
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes")
+    except Exception as e:
+        DECISIONS.inc(operation="enroll", result="error")
+        logger.error(f"Erro no enrollment: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar enrollment: {str(e)}")
+
+
+@router.post("/enroll/samples", response_model=EnrollSamplesResponse)
+async def enroll_voice_samples(
+    user_id: str = Form(...),
+    phrase_expected: List[str] = Form(...),
+    audio_files: List[UploadFile] = File(...),
+    append: bool = Form(True)
+):
+    """
+    POST /voice/enroll/samples
+    
+    Realiza o enrollment com várias amostras de voz em uma única requisição
+    
+    Args:
+        user_id: ID único do usuário
+        phrase_expected: Frase de cada amostra, na mesma ordem dos arquivos (ou uma única para todas)
+        audio_files: Arquivos de áudio (WAV recomendado)
+        append: Se False, descarta as amostras cadastradas anteriormente
+    """
+    try:
+        if len(audio_files) > settings.enrollment_max_samples:
             raise HTTPException(
                 status_code=400,
-                detail="Formato de arquivo inválido. Envie um arquivo de áudio."
+                detail=f"Envie no máximo {settings.enrollment_max_samples} arquivos por requisição"
             )
         
-        # Ler bytes do arquivo
-        audio_bytes = await audio_file.read()
-        
-        if len(audio_bytes) == 0:
+        if len(phrase_expected) not in (1, len(audio_files)):
             raise HTTPException(
                 status_code=400,
-                detail="Arquivo de áudio vazio"
+                detail="Informe uma frase esperada para cada arquivo ou uma única frase para todos"
             )
         
-        service = VoiceService(db)
-        result = service.enroll_user(user_id, audio_bytes, phrase_expected)
+        audio_list = [await _read_audio_upload(audio_file) for audio_file in audio_files]
+        
+        executor = get_inference_executor()
+        result = await executor.run(run_enroll_samples_job, user_id, audio_list, phrase_expected, append)
+        DECISIONS.inc(operation="enroll_samples", result="accepted" if result["success"] else "rejected")
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
         
-        return EnrollResponse(**result)
+        return EnrollSamplesResponse(**result)
     
     except HTTPException:
         raise
+    except InferenceQueueFullError as e:
+        DECISIONS.inc(operation="enroll_samples", result="busy")
+        logger.warning(f"Enrollment rejeitado: {e}")
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes")
     except Exception as e:
+        DECISIONS.inc(operation="enroll_samples", result="error")
         logger.error(f"Erro no enrollment: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar enrollment: {str(e)}")
 
 
+def _user_exists(user_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return VoiceRepository(db).user_exists(user_id)
+    finally:
+        db.close()
+
+
 @router.get("/user/{user_id}/exists", response_model=UserExistsResponse)
-async def check_user_exists(
-    user_id: str,
-    db: Session = Depends(get_db)
-):
+async def check_user_exists(user_id: str):
     """
     GET /voice/user/{user_id}/exists
     
@@ -128,8 +278,12 @@ async def check_user_exists(
         UserExistsResponse com exists=True se o usuário existe, False caso contrário
     """
     try:
-        repository = VoiceRepository(db)
-        exists = repository.user_exists(user_id)
+        if settings.db_async:
+            async with get_async_sessionmaker()() as db:
+                exists = await AsyncVoiceRepository(db).user_exists(user_id)
+        else:
+            # Consulta síncrona fora do event loop
+            exists = await asyncio.to_thread(_user_exists, user_id)
         
         logger.info(f"Verificação de existência para user_id {user_id}: {exists}")
         
@@ -147,8 +301,7 @@ async def check_user_exists(
 async def verify_voice(
     user_id: str = Form(...),
     phrase_expected: str = Form(...),
-    audio_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    audio_file: UploadFile = File(...)
 ):
     """
     POST /voice/verify
@@ -161,27 +314,171 @@ async def verify_voice(
         audio_file: Arquivo de áudio (WAV recomendado)
     """
     try:
-        if not audio_file.content_type or 'audio' not in audio_file.content_type:
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de arquivo inválido. Envie um arquivo de áudio."
-            )
+        audio_bytes = await _read_audio_upload(audio_file)
         
-        audio_bytes = await audio_file.read()
-        
-        if len(audio_bytes) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Arquivo de áudio vazio"
-            )
-        
-        service = VoiceService(db)
-        result = service.verify_user(user_id, audio_bytes, phrase_expected)
+        executor = get_inference_executor()
+        result = await executor.run(run_verify_job, user_id, audio_bytes, phrase_expected)
+        DECISIONS.inc(operation="verify", result="accepted" if result["authenticated"] else "rejected")
         
         return VerifyResponse(**result)
     
     except HTTPException:
         raise
+    except InferenceQueueFullError as e:
+        DECISIONS.inc(operation="verify", result="busy")
+        logger.warning(f"Verificação rejeitada: {e}")
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes")
     except Exception as e:
+        DECISIONS.inc(operation="verify", result="error")
         logger.error(f"Erro na verificação: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar verificação: {str(e)}")
+
+
+@router.websocket("/verify/stream")
+async def verify_voice_stream(websocket: WebSocket):
+    """
+    WS /voice/verify/stream
+    
+    Verifica a identidade enquanto o usuário fala
+    
+    Protocolo:
+        1. Cliente envia JSON {"user_id": "...", "phrase_expected": "..."}
+        2. Cliente envia frames binários com PCM 16-bit mono 16kHz
+        3. Servidor envia {"type": "partial", "text": "..."} conforme reconhece a fala
+        4. Ao detectar o fim da fala (ou ao receber {"event": "end"}, ou se o cliente
+           parar de enviar áudio), o servidor envia {"type": "result", ...} com os
+           mesmos campos de POST /voice/verify e fecha
+    """
+    global _active_streams
+    
+    await websocket.accept()
+    
+    if _active_streams >= settings.stream_max_sessions:
+        await websocket.send_json({"type": "error", "message": "Servidor ocupado, tente novamente em instantes"})
+        await websocket.close(code=1013)
+        return
+    
+    _active_streams += 1
+    db = None
+    stream = None
+    try:
+        start = await asyncio.wait_for(websocket.receive_json(), timeout=settings.stream_idle_timeout_seconds)
+        user_id = start.get("user_id")
+        phrase_expected = start.get("phrase_expected")
+        if not user_id or not phrase_expected:
+            await websocket.send_json({"type": "error", "message": "Informe user_id e phrase_expected"})
+            await websocket.close(code=1008)
+            return
+        
+        # A sessão de banco só é aberta para um pedido válido
+        db = SessionLocal()
+        stream = VerificationStream(db, user_id, phrase_expected)
+        error = await asyncio.to_thread(stream.start)
+        if error is not None:
+            DECISIONS.inc(operation="verify_stream", result="rejected")
+            await websocket.send_json({"type": "result", **error})
+            await websocket.close()
+            return
+        
+        last_partial = ""
+        while stream.duration < settings.stream_max_seconds:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=settings.stream_idle_timeout_seconds)
+            except asyncio.TimeoutError:
+                # O cliente parou de enviar áudio: decide com o que já foi recebido
+                break
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            chunk = message.get("bytes")
+            if chunk is None:
+                # Mensagem de texto: o cliente sinaliza o fim da fala
+                break
+            if len(chunk) % 2:
+                await websocket.send_json({"type": "error", "message": "Frames devem conter PCM 16-bit (tamanho par)"})
+                await websocket.close(code=1003)
+                return
+            
+            done, partial = await asyncio.to_thread(stream.accept, chunk)
+            if done:
+                break
+            if partial != last_partial:
+                last_partial = partial
+                await websocket.send_json({"type": "partial", "text": partial})
+        
+        result = await asyncio.to_thread(stream.finish)
+        # O reconhecedor volta ao pool antes do embedding
+        stream.close()
+        if result is None:
+            # Embedding e decisão no executor, como em POST /voice/verify
+            result = await get_inference_executor().run(
+                run_verify_speech_job, user_id, stream.speech_pcm, stream.transcription
+            )
+        DECISIONS.inc(operation="verify_stream", result="accepted" if result["authenticated"] else "rejected")
+        logger.info(
+            f"Verificação em streaming para usuário {user_id}: "
+            f"autenticado={result['authenticated']}, áudio={stream.duration:.2f}s"
+        )
+        await websocket.send_json({"type": "result", **result})
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        logger.info("Cliente desconectou durante a verificação em streaming")
+    except InferenceQueueFullError as e:
+        DECISIONS.inc(operation="verify_stream", result="busy")
+        logger.warning(f"Verificação em streaming rejeitada: {e}")
+        await websocket.send_json({"type": "error", "message": "Servidor ocupado, tente novamente em instantes"})
+        await websocket.close(code=1013)
+    except asyncio.TimeoutError:
+        logger.warning("Verificação em streaming encerrada: mensagem inicial não recebida")
+        await websocket.close(code=1001)
+    except Exception as e:
+        DECISIONS.inc(operation="verify_stream", result="error")
+        logger.error(f"Erro na verificação em streaming: {e}")
+        await websocket.close(code=1011)
+    finally:
+        _active_streams -= 1
+        if stream is not None:
+            stream.close()
+        if db is not None:
+            db.close()
+
+
+@router.post("/identify", response_model=IdentifyResponse)
+async def identify_voice(
+    audio_file: UploadFile = File(...),
+    top_k: int = Form(5),
+    phrase_expected: Optional[str] = Form(None)
+):
+    """
+    POST /voice/identify
+    
+    Identifica quem está falando comparando a voz com todos os perfis cadastrados
+    
+    Args:
+        audio_file: Arquivo de áudio (WAV recomendado)
+        top_k: Número de candidatos retornados (1-50)
+        phrase_expected: Frase esperada (opcional, valida a transcrição)
+    """
+    try:
+        if top_k < 1 or top_k > 50:
+            raise HTTPException(status_code=400, detail="top_k deve estar entre 1 e 50")
+        
+        audio_bytes = await _read_audio_upload(audio_file)
+        
+        executor = get_inference_executor()
+        result = await executor.run(run_identify_job, audio_bytes, top_k, phrase_expected)
+        DECISIONS.inc(operation="identify", result="accepted" if result["identified"] else "rejected")
+        
+        return IdentifyResponse(**result)
+    
+    except HTTPException:
+        raise
+    except InferenceQueueFullError as e:
+        DECISIONS.inc(operation="identify", result="busy")
+        logger.warning(f"Identificação rejeitada: {e}")
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes")
+    except Exception as e:
+        DECISIONS.inc(operation="identify", result="error")
+        logger.error(f"Erro na identificação: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar identificação: {str(e)}")
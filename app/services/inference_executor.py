@@ -0,0 +1,407 @@
+"""
+Executor de inferência para tirar FFmpeg, Vosk e SpeechBrain do event loop
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from app.config import get_settings
+from app.database import SessionLocal
+from app.middleware.request_timing import current_request_id, request_id_context
+from app.services.voice_service import VoiceService, load_challenge_phrases
+from app.utils.audio_processing import preload_models, warm_up_models
+from app.utils.metrics import REGISTRY, StageTrace, collect_stages, record_stage, replay_stages
+from app.utils.runtime_profile import apply_runtime_profile
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_PENDING = REGISTRY.gauge(
+    "voice_inference_pending",
+    "Jobs de inferência em execução ou aguardando na fila"
+)
+INFERENCE_QUEUE_DEPTH = REGISTRY.gauge(
+    "voice_inference_queue_depth",
+    "Jobs de inferência aguardando um worker livre"
+)
+INFERENCE_REJECTED = REGISTRY.counter(
+    "voice_inference_rejected_total",
+    "Jobs recusados com a fila de inferência cheia"
+)
+
+
+class InferenceQueueFullError(Exception):
+    """Lançada quando o executor já atingiu o limite de jobs em execução + fila"""
+
+
+class SharedAudioBuffer:
+    """
+    Referência serializável para bytes de áudio em memória compartilhada
+    
+    No modo "prefork" apenas o nome do segmento trafega pelo pipe do pool;
+    o worker lê o áudio diretamente da memória compartilhada
+    """
+    
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+    
+    @classmethod
+    def create(cls, data: bytes) -> "tuple[SharedAudioBuffer, SharedMemory]":
+        """
+        Copia os bytes para um novo segmento de memória compartilhada
+        
+        Returns:
+            Tupla com (referência serializável, segmento que o processo pai deve liberar)
+        """
+        shm = SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        return cls(shm.name, len(data)), shm
+    
+    def read(self) -> bytes:
+        """Lê o áudio do segmento (executado no processo worker)"""
+        shm = SharedMemory(name=self.name)
+        try:
+            # O processo pai é o dono do segmento e faz o unlink
+            resource_tracker.unregister(shm._name, "shared_memory")
+            return bytes(shm.buf[:self.size])
+        finally:
+            shm.close()
+
+
+def _resolve_audio(audio: Union[bytes, SharedAudioBuffer]) -> bytes:
+    if isinstance(audio, SharedAudioBuffer):
+        return audio.read()
+    return audio
+
+
+# Tempo máximo para todos os processos de inferência concluírem a inicialização
+WORKER_STARTUP_TIMEOUT = 600.0
+
+_startup_barrier = None
+_warm_up_error: Optional[str] = None
+
+
+def _init_worker(barrier) -> None:
+    """
+    Inicializa um processo de inferência: perfil de execução, frases de desafio e
+    aquecimento dos modelos
+    
+    No modo "prefork" os pesos já vêm do processo pai, mas a primeira inferência
+    (e as threads do PyTorch e do agendador) precisa acontecer depois do fork
+    """
+    global _startup_barrier, _warm_up_error
+    
+    _startup_barrier = barrier
+    apply_runtime_profile()
+    load_challenge_phrases()
+    
+    settings = get_settings()
+    try:
+        warm_up_models(settings.vosk_model_path, settings.speechbrain_model)
+    except Exception as e:
+        _warm_up_error = str(e)
+        logger.error(f"❌ Erro no aquecimento do processo de inferência {os.getpid()}: {e}")
+
+
+def _run_job(fn: Callable[..., Any], submitted_at: float, *args: Any) -> Any:
+    """Executa o job registrando o tempo que ele aguardou na fila (estágio queue)"""
+    # Relógio de parede: o job pode ter sido submetido por outro processo
+    record_stage("queue", max(0.0, time.time() - submitted_at))
+    return fn(*args)
+
+
+def _run_collecting_stages(
+    fn: Callable[..., Any],
+    submitted_at: float,
+    request_id: Optional[str],
+    *args: Any
+) -> Tuple[Any, StageTrace]:
+    """
+    Executa o job em um processo de inferência devolvendo também os tempos de cada estágio
+    
+    As métricas do processo filho não aparecem em /metrics; o processo da API
+    registra os estágios devolvidos (replay_stages). Os logs do job carregam o
+    ID da requisição que o submeteu
+    """
+    with request_id_context(request_id), collect_stages() as trace:
+        result = _run_job(fn, submitted_at, *args)
+    return result, trace
+
+
+def _worker_ready() -> int:
+    """
+    Job de inicialização: aguarda todos os processos do pool na barreira
+    
+    Cada job fica preso em um processo diferente até a barreira abrir, então
+    max_workers jobs concluídos garantem que todos os processos foram aquecidos
+    """
+    _startup_barrier.wait(WORKER_STARTUP_TIMEOUT)
+    if _warm_up_error:
+        raise RuntimeError(_warm_up_error)
+    return os.getpid()
+
+
+class InferenceExecutor:
+    """
+    Pool (threads ou processos) com concorrência máxima e fila limitada
+    
+    Até max_workers jobs executam ao mesmo tempo e até queue_size aguardam na fila;
+    acima disso novos jobs são rejeitados imediatamente com InferenceQueueFullError
+    
+    Modos:
+        thread: threads no próprio processo da API
+        process: processos independentes, cada um carrega seus modelos
+        prefork: os modelos são carregados uma vez no processo pai e os workers
+            são criados por fork, compartilhando os pesos (copy-on-write); o áudio
+            é entregue aos workers por memória compartilhada
+    """
+    
+    def __init__(self, mode: str, max_workers: int, queue_size: int):
+        self._startup_barrier = None
+        self._startup: List[Future] = []
+        
+        if mode in ("prefork", "process"):
+            if mode == "prefork":
+                settings = get_settings()
+                preload_models(settings.vosk_model_path, settings.speechbrain_model)
+                context = multiprocessing.get_context("fork")
+            else:
+                context = multiprocessing.get_context()
+            self._startup_barrier = context.Barrier(max_workers)
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._startup_barrier,)
+            )
+        elif mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        else:
+            raise ValueError(f"Modo de executor inválido: {mode} (use 'thread', 'process' ou 'prefork')")
+        
+        self.mode = mode
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def pending(self) -> int:
+        """Número de jobs em execução ou aguardando na fila"""
+        return self._pending
+    
+    @property
+    def queue_depth(self) -> int:
+        """Número de jobs aguardando um worker livre"""
+        return max(0, self._pending - self.max_workers)
+    
+    def _update_gauges(self) -> None:
+        INFERENCE_PENDING.set(self._pending)
+        INFERENCE_QUEUE_DEPTH.set(self.queue_depth)
+    
+    def _release(self, _future: Optional[Future], segments: List[SharedMemory]) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._update_gauges()
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+    
+    def start(self) -> None:
+        """
+        Cria os processos do pool imediatamente, sem aguardar o aquecimento
+        
+        No modo "prefork" o fork acontece aqui, durante o startup, com os modelos já
+        carregados e antes que o servidor crie outras threads
+        """
+        if self._startup_barrier is not None:
+            self._startup = [self._pool.submit(_worker_ready) for _ in range(self.max_workers)]
+            logger.info(f"✅ {self.max_workers} workers de inferência criados ({self.mode})")
+    
+    def wait_ready(self) -> None:
+        """
+        Bloqueia até todos os processos do pool concluírem o aquecimento
+        
+        Raises:
+            RuntimeError: Se o aquecimento falhou em algum processo
+        """
+        for future in self._startup:
+            future.result()
+        if self._startup:
+            logger.info(f"🔥 {self.max_workers} workers de inferência aquecidos")
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa fn(*args) no pool e aguarda o resultado sem bloquear o event loop
+        
+        Args:
+            fn: Função a executar (precisa ser serializável no modo "process")
+            *args: Argumentos da função
+        
+        Returns:
+            Resultado de fn
+        
+        Raises:
+            InferenceQueueFullError: Se a fila de inferência estiver cheia
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.queue_size:
+                INFERENCE_REJECTED.inc()
+                logger.warning(f"⚠️  Job {getattr(fn, '__name__', fn)} recusado: fila de inferência cheia")
+                raise InferenceQueueFullError(
+                    f"Fila de inferência cheia ({self._pending} jobs pendentes)"
+                )
+            self._pending += 1
+            self._update_gauges()
+        
+        segments: List[SharedMemory] = []
+        try:
+            if self.mode == "prefork":
+                shared_args = []
+                for arg in args:
+                    if isinstance(arg, bytes):
+                        arg, shm = SharedAudioBuffer.create(arg)
+                        segments.append(shm)
+                    elif isinstance(arg, list) and arg and all(isinstance(item, bytes) for item in arg):
+                        shared_items = []
+                        for item in arg:
+                            item, shm = SharedAudioBuffer.create(item)
+                            segments.append(shm)
+                            shared_items.append(item)
+                        arg = shared_items
+                    shared_args.append(arg)
+                args = tuple(shared_args)
+            
+            if self.mode == "thread":
+                # O contexto copiado leva ao worker o trace e o ID da requisição
+                future = self._pool.submit(
+                    contextvars.copy_context().run, partial(_run_job, fn, time.time(), *args)
+                )
+            else:
+                future = self._pool.submit(
+                    partial(_run_collecting_stages, fn, time.time(), current_request_id(), *args)
+                )
+        except Exception:
+            self._release(None, segments)
+            raise
+        
+        # O slot só é liberado quando o job termina de fato, mesmo que o cliente desconecte
+        future.add_done_callback(partial(self._release, segments=segments))
+        result = await asyncio.wrap_future(future)
+        
+        if self.mode != "thread":
+            result, trace = result
+            replay_stages(trace)
+        return result
+    
+    def shutdown(self) -> None:
+        """Encerra o pool aguardando os jobs em andamento"""
+        if self._startup_barrier is not None:
+            # Libera jobs de inicialização ainda presos na barreira
+            self._startup_barrier.abort()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+@lru_cache()
+def get_inference_executor() -> InferenceExecutor:
+    settings = get_settings()
+    executor = InferenceExecutor(
+        mode=settings.inference_executor,
+        max_workers=settings.inference_max_workers,
+        queue_size=settings.inference_queue_size
+    )
+    logger.info(
+        f"Executor de inferência iniciado: modo={executor.mode}, "
+        f"workers={executor.max_workers}, fila={executor.queue_size}"
+    )
+    return executor
+
+
+def run_enroll_job(
+    user_id: str,
+    audio: Union[bytes, SharedAudioBuffer],
+    expected_phrase: str,
+    append: bool = False
+) -> Dict[str, Any]:
+    """
+    Job de enrollment executado no pool (abre a própria sessão de banco de dados)
+    """
+    audio_bytes = _resolve_audio(audio)
+    db = SessionLocal()
+    try:
+        return VoiceService(db).enroll_user(user_id, audio_bytes, expected_phrase, append)
+    finally:
+        db.close()
+
+
+def run_enroll_samples_job(
+    user_id: str,
+    audios: List[Union[bytes, SharedAudioBuffer]],
+    expected_phrases: List[str],
+    append: bool = True
+) -> Dict[str, Any]:
+    """
+    Job de enrollment com múltiplas amostras executado no pool
+    """
+    audio_list = [_resolve_audio(audio) for audio in audios]
+    db = SessionLocal()
+    try:
+        return VoiceService(db).enroll_user_samples(user_id, audio_list, expected_phrases, append)
+    finally:
+        db.close()
+
+
+def run_verify_job(
+    user_id: str,
+    audio: Union[bytes, SharedAudioBuffer],
+    expected_phrase: str
+) -> Dict[str, Any]:
+    """
+    Job de verificação executado no pool (abre a própria sessão de banco de dados)
+    """
+    audio_bytes = _resolve_audio(audio)
+    db = SessionLocal()
+    try:
+        return VoiceService(db).verify_user(user_id, audio_bytes, expected_phrase)
+    finally:
+        db.close()
+
+
+def run_verify_speech_job(
+    user_id: str,
+    pcm: Union[bytes, SharedAudioBuffer],
+    transcription: str
+) -> Dict[str, Any]:
+    """
+    Etapa final da verificação em streaming (embedding e decisão) executada no pool
+    """
+    pcm_bytes = _resolve_audio(pcm)
+    db = SessionLocal()
+    try:
+        return VoiceService(db).verify_speech(user_id, pcm_bytes, transcription)
+    finally:
+        db.close()
+
+
+def run_identify_job(
+    audio: Union[bytes, SharedAudioBuffer],
+    top_k: int,
+    expected_phrase: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Job de identificação (1:N) executado no pool (abre a própria sessão de banco de dados)
+    """
+    audio_bytes = _resolve_audio(audio)
+    db = SessionLocal()
+    try:
+        return VoiceService(db).identify_speaker(audio_bytes, top_k, expected_phrase)
+    finally:
+        db.close()
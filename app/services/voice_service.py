@@ -1,22 +1,53 @@
 """
 Serviço de autenticação por voz
 """
+import contextvars
 import logging
+import os
 import random
-from typing import Optional, Dict, Any, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
 from app.repositories.voice_repository import VoiceRepository
 from app.utils.audio_processing import (
+    DecodedAudio,
+    apply_vad,
+    build_grammar,
+    decode_audio,
     transcribe_audio,
     extract_voice_embedding,
+    extract_voice_embeddings,
     validate_transcription
 )
-from app.utils.similarity import calculate_cosine_similarity
+from app.utils.audio_validation import AudioValidationError, check_audio_quality, check_duration
+from app.utils.metrics import REGISTRY, annotate_request, track_stage
+from app.utils.scoring import l2_normalize, score_one
+from app.utils.speaker_index import (
+    apply_profile_change,
+    begin_index_build,
+    build_index,
+    discard_index_build,
+    get_speaker_index,
+    set_speaker_index
+)
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_stage_executor: Optional[ThreadPoolExecutor] = None
+_stage_executor_lock = threading.Lock()
+_speaker_index_build_lock = threading.Lock()
+
+VAD_REJECTIONS = REGISTRY.counter(
+    "voice_vad_rejections_total",
+    "Áudios rejeitados antes dos modelos por conter pouca fala"
+)
+
 CHALLENGE_PHRASES = [
     "Eu autorizo o acesso ao sistema através da minha biometria vocal única e intransferível para garantir a máxima segurança",
     "Confirmo minha identidade utilizando as características únicas da minha voz para autenticação segura no sistema de proteção avançada",
@@ -30,6 +61,93 @@ CHALLENGE_PHRASES = [
     "Esta declaração vocal confirma minha identidade e autoriza o acesso utilizando tecnologia de reconhecimento de locutor avançada"
 ]
 
+# Substitui CHALLENGE_PHRASES quando existe (ver load_challenge_phrases)
+CHALLENGE_PHRASES_FILE = "phrases.txt"
+
+
+def load_challenge_phrases(filepath: str = CHALLENGE_PHRASES_FILE) -> bool:
+    """
+    Carrega as frases de desafio de um arquivo (uma por linha)
+    
+    Chamado pelo processo da API antes de iniciar o executor de inferência e pelo
+    inicializador de cada processo de inferência: a gramática do Vosk é montada
+    no processo que transcreve e precisa ver as mesmas frases
+    
+    Args:
+        filepath: Caminho para arquivo de frases
+        
+    Returns:
+        True se as frases foram carregadas
+    """
+    global CHALLENGE_PHRASES
+    if not os.path.exists(filepath):
+        return False
+    
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            phrases = [line.strip() for line in f if line.strip()]
+        if phrases:
+            CHALLENGE_PHRASES = phrases
+            logger.info(f"{len(phrases)} frases carregadas de {filepath}")
+            return True
+        return False
+    except Exception as e:
+        logger.error(f"Erro ao carregar frases de {filepath}: {e}")
+        return False
+
+
+@lru_cache(maxsize=1024)
+def _phrase_grammar(phrase: str) -> Tuple[str, ...]:
+    return build_grammar([phrase])
+
+
+@lru_cache(maxsize=4)
+def _vocabulary_grammar(phrases: Tuple[str, ...]) -> Tuple[str, ...]:
+    return build_grammar(phrases)
+
+
+def get_asr_grammar(expected_phrase: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Gramática do Vosk para a frase esperada, conforme asr_grammar_mode
+    
+    Só frases de desafio conhecidas (CHALLENGE_PHRASES) são restringidas; para
+    qualquer outra frase a decodificação usa o modelo de linguagem completo
+    
+    Args:
+        expected_phrase: Frase que o usuário deveria pronunciar
+        
+    Returns:
+        Entradas da gramática (cacheadas por frase) ou None para decodificação livre
+    """
+    if settings.asr_grammar_mode == "off" or not expected_phrase:
+        return None
+    
+    expected_phrase = expected_phrase.strip()
+    if expected_phrase not in CHALLENGE_PHRASES:
+        return None
+    
+    if settings.asr_grammar_mode == "phrase":
+        return _phrase_grammar(expected_phrase)
+    return _vocabulary_grammar(tuple(CHALLENGE_PHRASES))
+
+
+def _get_stage_executor() -> ThreadPoolExecutor:
+    """
+    Retorna o pool de threads usado para paralelizar estágios dentro de uma requisição
+    
+    Criado sob demanda para que cada processo do executor de inferência tenha o seu
+    """
+    global _stage_executor
+    
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(
+                max_workers=settings.inference_max_workers,
+                thread_name_prefix="stage"
+            )
+    
+    return _stage_executor
+
 
 class VoiceService:
     """Serviço para lógica de negócio de autenticação por voz"""
@@ -38,7 +156,8 @@ class VoiceService:
         self.db = db
         self.repository = VoiceRepository(db)
     
-    def get_challenge_phrase(self) -> str:
+    @staticmethod
+    def get_challenge_phrase() -> str:
         """
         Retorna uma frase aleatória para desafio de voz
         
@@ -47,11 +166,133 @@ class VoiceService:
         """
         return random.choice(CHALLENGE_PHRASES)
     
+    def _prepare_audio(self, audio_bytes: bytes) -> Tuple[Optional[DecodedAudio], Optional[str]]:
+        """
+        Decodifica o áudio, valida duração e qualidade e remove o silêncio antes
+        de qualquer modelo rodar
+        
+        Áudios fora dos limites, saturados, mudos ou com menos fala que
+        vad_min_speech_seconds são rejeitados aqui, sem gastar Vosk nem SpeechBrain
+        
+        Args:
+            audio_bytes: Bytes do arquivo de áudio
+            
+        Returns:
+            Tupla com (áudio pronto para os modelos, mensagem de erro); um dos dois é None
+        """
+        audio = decode_audio(audio_bytes)
+        if audio is None:
+            return None, "Não foi possível processar o arquivo de áudio"
+        annotate_request("audio_seconds", audio.duration)
+        
+        return self.check_audio(audio)
+    
+    def check_audio(self, audio: DecodedAudio) -> Tuple[Optional[DecodedAudio], Optional[str]]:
+        """
+        Valida duração e qualidade do áudio já decodificado e remove o silêncio
+        
+        Usado por _prepare_audio e pela verificação em streaming, que recebe PCM
+        cru e não passa pela decodificação
+        
+        Args:
+            audio: Áudio decodificado
+            
+        Returns:
+            Tupla com (áudio pronto para os modelos, mensagem de erro); um dos dois é None
+        """
+        try:
+            # Nem todo container declara a duração no cabeçalho (ex.: MP3, WebM)
+            check_duration(audio.duration, settings.audio_min_seconds, settings.audio_max_seconds)
+            check_audio_quality(audio, settings.audio_max_clipping_ratio, settings.audio_min_rms_dbfs)
+        except AudioValidationError as e:
+            logger.warning(f"Áudio rejeitado na validação: {e.message}")
+            return None, e.message
+        
+        if not settings.vad_enabled:
+            return audio, None
+        
+        audio, speech_seconds = apply_vad(audio, settings.vad_max_pause_ms)
+        if audio.num_samples == 0 or speech_seconds < settings.vad_min_speech_seconds:
+            VAD_REJECTIONS.inc()
+            return None, (
+                f"Fala insuficiente no áudio ({speech_seconds:.1f}s detectados, "
+                f"mínimo de {settings.vad_min_speech_seconds:.1f}s)"
+            )
+        
+        return audio, None
+    
+    def _analyze_audio(
+        self,
+        audio: DecodedAudio,
+        expected_phrase: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[list]]:
+        """
+        Executa a transcrição (Vosk) e a extração de embedding (SpeechBrain)
+        
+        Os dois estágios são independentes depois da decodificação e liberam a GIL,
+        então rodam em paralelo: a latência fica próxima à do estágio mais lento
+        
+        Args:
+            audio: Áudio já decodificado
+            expected_phrase: Frase esperada (define a gramática do Vosk, se ativa)
+            
+        Returns:
+            Tupla com (transcrição ou None, embedding ou None)
+        """
+        grammar = get_asr_grammar(expected_phrase)
+        
+        if not settings.parallel_stages:
+            return (
+                transcribe_audio(audio, settings.vosk_model_path, grammar),
+                extract_voice_embedding(audio, settings.speechbrain_model)
+            )
+        
+        # O contexto copiado leva à thread do estágio a coleta de tempos da requisição
+        embedding_future = _get_stage_executor().submit(
+            contextvars.copy_context().run, extract_voice_embedding, audio, settings.speechbrain_model
+        )
+        transcription = transcribe_audio(audio, settings.vosk_model_path, grammar)
+        embedding = embedding_future.result()
+        
+        return transcription, embedding
+    
+    def _analyze_samples(
+        self,
+        audios: List[DecodedAudio],
+        expected_phrases: List[str]
+    ) -> Tuple[List[Optional[str]], Optional[List[list]]]:
+        """
+        Transcreve cada amostra e extrai todos os embeddings em um único forward pass
+        
+        Args:
+            audios: Áudios já decodificados
+            expected_phrases: Frase esperada de cada amostra
+            
+        Returns:
+            Tupla com (transcrições, embeddings ou None)
+        """
+        def transcribe_all() -> List[Optional[str]]:
+            return [
+                transcribe_audio(audio, settings.vosk_model_path, get_asr_grammar(phrase))
+                for audio, phrase in zip(audios, expected_phrases)
+            ]
+        
+        if not settings.parallel_stages:
+            return transcribe_all(), extract_voice_embeddings(audios, settings.speechbrain_model)
+        
+        embeddings_future = _get_stage_executor().submit(
+            contextvars.copy_context().run, extract_voice_embeddings, audios, settings.speechbrain_model
+        )
+        transcriptions = transcribe_all()
+        
+        return transcriptions, embeddings_future.result()
+    
     def enroll_user(
         self,
         user_id: str,
         audio_bytes: bytes,
-        expected_phrase: str
+        expected_phrase: str,
+        append: bool = False
     ) -> Dict[str, Any]:
         """
         Realiza o enrollment (cadastro) de voz de um usuário
@@ -60,13 +301,21 @@ class VoiceService:
             user_id: ID do usuário
             audio_bytes: Bytes do arquivo de áudio
             expected_phrase: Frase esperada
+            append: Se True, soma a amostra às já cadastradas em vez de substituí-las
             
         Returns:
             Dicionário com resultado do enrollment
         """
         logger.info(f"Iniciando enrollment para usuário {user_id}")
         
-        transcription = transcribe_audio(audio_bytes, settings.vosk_model_path)
+        audio, error = self._prepare_audio(audio_bytes)
+        if audio is None:
+            return {
+                "success": False,
+                "message": error
+            }
+        
+        transcription, embedding = self._analyze_audio(audio, expected_phrase)
         if not transcription:
             return {
                 "success": False,
@@ -82,19 +331,13 @@ class VoiceService:
                 "expected": expected_phrase
             }
         
-        embedding = extract_voice_embedding(audio_bytes, settings.speechbrain_model)
         if not embedding:
             return {
                 "success": False,
                 "message": "Não foi possível extrair características da voz"
             }
         
-        existing_profile = self.repository.get_profile_by_user_id(user_id)
-        
-        if existing_profile:
-            profile = self.repository.update_profile(user_id, embedding)
-        else:
-            profile = self.repository.create_profile(user_id, embedding)
+        profile = self.repository.add_samples(user_id, [embedding], reset=not append)
         
         if not profile:
             return {
@@ -107,7 +350,88 @@ class VoiceService:
             "success": True,
             "message": "Perfil de voz cadastrado com sucesso",
             "user_id": user_id,
-            "transcription": transcription
+            "transcription": transcription,
+            "sample_count": profile.sample_count
+        }
+    
+    def enroll_user_samples(
+        self,
+        user_id: str,
+        audio_list: List[bytes],
+        expected_phrases: List[str],
+        append: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Realiza o enrollment com várias amostras de voz de uma vez
+        
+        Os embeddings de todas as amostras são extraídos em um único forward pass
+        e somados às estatísticas do perfil (soma e contagem)
+        
+        Args:
+            user_id: ID do usuário
+            audio_list: Bytes de cada arquivo de áudio
+            expected_phrases: Frase esperada de cada amostra (ou uma única para todas)
+            append: Se False, descarta as amostras cadastradas anteriormente
+            
+        Returns:
+            Dicionário com resultado do enrollment
+        """
+        logger.info(f"Iniciando enrollment de {len(audio_list)} amostra(s) para usuário {user_id}")
+        
+        if len(expected_phrases) == 1:
+            expected_phrases = expected_phrases * len(audio_list)
+        
+        audios = []
+        for i, audio_bytes in enumerate(audio_list):
+            audio, error = self._prepare_audio(audio_bytes)
+            if audio is None:
+                return {
+                    "success": False,
+                    "message": f"Áudio {i + 1}: {error}"
+                }
+            audios.append(audio)
+        
+        transcriptions, embeddings = self._analyze_samples(audios, expected_phrases)
+        
+        for i, (transcription, expected_phrase) in enumerate(zip(transcriptions, expected_phrases)):
+            if not transcription:
+                return {
+                    "success": False,
+                    "message": f"Não foi possível transcrever o áudio {i + 1}"
+                }
+            if not validate_transcription(transcription, expected_phrase):
+                return {
+                    "success": False,
+                    "message": f"A frase pronunciada no áudio {i + 1} não corresponde à esperada",
+                    "transcription": transcription,
+                    "expected": expected_phrase
+                }
+        
+        if not embeddings:
+            return {
+                "success": False,
+                "message": "Não foi possível extrair características da voz"
+            }
+        
+        profile = self.repository.add_samples(user_id, embeddings, reset=not append)
+        
+        if not profile:
+            return {
+                "success": False,
+                "message": "Erro ao salvar perfil de voz no banco de dados"
+            }
+        
+        logger.info(
+            f"Enrollment de {len(audios)} amostra(s) concluído para usuário {user_id} "
+            f"(total: {profile.sample_count})"
+        )
+        return {
+            "success": True,
+            "message": "Amostras de voz cadastradas com sucesso",
+            "user_id": user_id,
+            "samples_added": len(audios),
+            "sample_count": profile.sample_count,
+            "transcriptions": transcriptions
         }
     
     def verify_user(
@@ -129,14 +453,22 @@ class VoiceService:
         """
         logger.info(f"Iniciando verificação para usuário {user_id}")
         
-        profile = self.repository.get_profile_by_user_id(user_id)
-        if not profile:
+        stored_embedding = self.repository.get_embedding_by_user_id(user_id)
+        self.repository.release_connection()
+        if stored_embedding is None:
             return {
                 "authenticated": False,
                 "message": "Usuário não possui perfil de voz cadastrado"
             }
         
-        transcription = transcribe_audio(audio_bytes, settings.vosk_model_path)
+        audio, error = self._prepare_audio(audio_bytes)
+        if audio is None:
+            return {
+                "authenticated": False,
+                "message": error
+            }
+        
+        transcription, current_embedding = self._analyze_audio(audio, expected_phrase)
         if not transcription:
             return {
                 "authenticated": False,
@@ -152,15 +484,62 @@ class VoiceService:
                 "expected": expected_phrase
             }
         
-        current_embedding = extract_voice_embedding(audio_bytes, settings.speechbrain_model)
+        return self.decide_verification(user_id, transcription, current_embedding, stored_embedding)
+    
+    def verify_speech(self, user_id: str, pcm: bytes, transcription: str) -> Dict[str, Any]:
+        """
+        Extrai o embedding de fala já transcrita e validada e decide a verificação
+        
+        Etapa final da verificação em streaming, executada no executor de inferência
+        
+        Args:
+            user_id: ID do usuário
+            pcm: Fala PCM 16-bit mono 16kHz, já validada e sem silêncio (check_audio)
+            transcription: Transcrição já validada
+            
+        Returns:
+            Dicionário com resultado da verificação
+        """
+        stored_embedding = self.repository.get_embedding_by_user_id(user_id)
+        self.repository.release_connection()
+        if stored_embedding is None:
+            return {
+                "authenticated": False,
+                "message": "Usuário não possui perfil de voz cadastrado"
+            }
+        
+        audio = DecodedAudio(np.frombuffer(pcm, dtype='<i2'))
+        embedding = extract_voice_embedding(audio, settings.speechbrain_model)
+        return self.decide_verification(user_id, transcription, embedding, stored_embedding)
+    
+    def decide_verification(
+        self,
+        user_id: str,
+        transcription: str,
+        current_embedding: Optional[list],
+        stored_embedding: np.ndarray
+    ) -> Dict[str, Any]:
+        """
+        Compara o embedding da amostra com o perfil e monta o resultado da verificação
+        
+        Args:
+            user_id: ID do usuário
+            transcription: Transcrição já validada
+            current_embedding: Embedding extraído da amostra (None se a extração falhou)
+            stored_embedding: Embedding normalizado do perfil
+            
+        Returns:
+            Dicionário com resultado da verificação
+        """
         if not current_embedding:
             return {
                 "authenticated": False,
                 "message": "Não foi possível extrair características da voz"
             }
         
-        stored_embedding = profile.embedding
-        similarity = calculate_cosine_similarity(current_embedding, stored_embedding)
+        # O embedding armazenado já vem normalizado do repositório
+        with track_stage("scoring"):
+            similarity = score_one(l2_normalize(current_embedding), stored_embedding)
         
         authenticated = similarity >= settings.similarity_threshold
         
@@ -178,6 +557,146 @@ class VoiceService:
             "transcription": transcription
         }
     
+    def _get_speaker_index(self):
+        """
+        Retorna o índice de identificação, construindo-o a partir do banco se necessário
+        
+        O índice é reconstruído após speaker_index_refresh_seconds para incorporar
+        perfis gravados por outros processos. Escritas deste processo feitas durante
+        a reconstrução são reaplicadas no índice novo antes de publicá-lo
+        """
+        index = get_speaker_index()
+        if index is not None and time.monotonic() - index.built_at < settings.speaker_index_refresh_seconds:
+            return index
+        
+        with _speaker_index_build_lock:
+            index = get_speaker_index()
+            if index is not None and time.monotonic() - index.built_at < settings.speaker_index_refresh_seconds:
+                return index
+            
+            started = time.perf_counter()
+            begin_index_build()
+            try:
+                index = build_index(
+                    self.repository.iter_embeddings(),
+                    ivf_threshold=settings.speaker_index_ivf_threshold,
+                    nlist=settings.speaker_index_nlist,
+                    nprobe=settings.speaker_index_nprobe
+                )
+            except Exception:
+                discard_index_build()
+                raise
+            set_speaker_index(index)
+            logger.info(
+                f"Índice de identificação ({index.kind}) construído com {len(index)} perfis "
+                f"em {time.perf_counter() - started:.2f}s"
+            )
+            return index
+    
+    def _confirm_candidates(self, query: np.ndarray, candidates: list, top_k: int) -> list:
+        """
+        Confere os candidatos do índice com o banco e repontua com os perfis atuais
+        
+        O índice só recebe as escritas do próprio processo: exclusões e
+        re-enrollments feitos em outros processos chegariam apenas na próxima
+        reconstrução. Uma consulta pelos poucos candidatos garante que um perfil
+        excluído não é devolvido e que a similaridade é a do perfil atual
+        
+        Args:
+            query: Embedding normalizado da amostra
+            candidates: Candidatos do índice (user_id, similaridade)
+            top_k: Número de candidatos retornados
+            
+        Returns:
+            Até top_k candidatos (user_id, similaridade) em ordem decrescente
+        """
+        current = self.repository.get_embeddings_by_user_ids([user_id for user_id, _ in candidates])
+        self.repository.release_connection()
+        
+        confirmed = []
+        for user_id, _ in candidates:
+            embedding = current.get(user_id)
+            if embedding is None:
+                # Excluído por outro processo: sai também do índice local
+                apply_profile_change(user_id, None)
+                continue
+            confirmed.append((user_id, float(score_one(query, embedding))))
+        
+        confirmed.sort(key=lambda candidate: candidate[1], reverse=True)
+        return confirmed[:top_k]
+    
+    def identify_speaker(
+        self,
+        audio_bytes: bytes,
+        top_k: int = 5,
+        expected_phrase: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Identifica o locutor (1:N) comparando a voz com todos os perfis cadastrados
+        
+        Args:
+            audio_bytes: Bytes do arquivo de áudio
+            top_k: Número de candidatos retornados
+            expected_phrase: Frase esperada (opcional; se informada, a transcrição é validada)
+            
+        Returns:
+            Dicionário com o resultado da identificação e os candidatos
+        """
+        logger.info("Iniciando identificação de locutor")
+        
+        audio, error = self._prepare_audio(audio_bytes)
+        if audio is None:
+            return {
+                "identified": False,
+                "message": error
+            }
+        
+        transcription = None
+        if expected_phrase:
+            transcription, embedding = self._analyze_audio(audio, expected_phrase)
+            if not transcription or not validate_transcription(transcription, expected_phrase):
+                return {
+                    "identified": False,
+                    "message": "A frase pronunciada não corresponde à esperada",
+                    "transcription": transcription
+                }
+        else:
+            embedding = extract_voice_embedding(audio, settings.speechbrain_model)
+        
+        if not embedding:
+            return {
+                "identified": False,
+                "message": "Não foi possível extrair características da voz"
+            }
+        
+        index = self._get_speaker_index()
+        query = l2_normalize(embedding)
+        with track_stage("scoring"):
+            # Folga para candidatos descartados na conferência com o banco
+            candidates = index.search(query, 2 * top_k)
+        candidates = self._confirm_candidates(query, candidates, top_k)
+        
+        identified = bool(candidates) and candidates[0][1] >= settings.similarity_threshold
+        best_user, best_similarity = candidates[0] if candidates else (None, None)
+        
+        logger.info(
+            f"Identificação: melhor candidato={best_user}, "
+            f"similaridade={best_similarity}, identificado={identified}"
+        )
+        
+        return {
+            "identified": identified,
+            "user_id": best_user if identified else None,
+            "similarity": best_similarity,
+            "threshold": settings.similarity_threshold,
+            "candidates": [
+                {"user_id": user_id, "similarity": similarity}
+                for user_id, similarity in candidates
+            ],
+            "message": "Locutor identificado" if identified else "Nenhum perfil corresponde à voz",
+            "transcription": transcription
+        }
+    
     def load_phrases_from_file(self, filepath: str) -> bool:
         """
         Carrega frases de desafio de um arquivo
@@ -188,15 +707,4 @@ class VoiceService:
         Returns:
             True se carregado com sucesso
         """
-        global CHALLENGE_PHRASES
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                phrases = [line.strip() for line in f if line.strip()]
-                if phrases:
-                    CHALLENGE_PHRASES = phrases
-                    logger.info(f"{len(phrases)} frases carregadas de {filepath}")
-                    return True
-            return False
-        except Exception as e:
-            logger.error(f"Erro ao carregar frases de {filepath}: {e}")
-            return False
+        return load_challenge_phrases(filepath)
@@ -0,0 +1,175 @@
+"""
+Sessão de verificação por voz em streaming (áudio recebido em pedaços)
+"""
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.utils.recognizer_pool import RecognizerPool
+from app.utils.runtime_profile import asr_slot
+from app.config import get_settings
+from app.services.voice_service import VoiceService, get_asr_grammar
+from app.utils.audio_processing import (
+    TARGET_SAMPLE_RATE,
+    DecodedAudio,
+    clean_transcription,
+    get_asr_pool,
+    validate_transcription
+)
+
+if TYPE_CHECKING:
+    from vosk import KaldiRecognizer
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Fração das palavras da frase esperada que precisa ter sido reconhecida para
+# encerrar a sessão no fim de um segmento de fala (mais estrita que a validação
+# final, para não cortar o usuário em uma pausa no meio da frase)
+END_OF_PHRASE_COVERAGE = 0.8
+
+
+class VerificationStream:
+    """
+    Verificação incremental: o Vosk reconhece cada pedaço de PCM assim que chega
+    e o áudio é acumulado para o encoder
+    
+    Quando o Vosk detecta fim de fala e a frase esperada já foi reconhecida, só
+    resta extrair o embedding e pontuar; a decisão sai logo após o usuário parar
+    de falar, sem esperar upload nem decodificação do arquivo inteiro
+    
+    O reconhecedor guarda o estado da sessão entre os pedaços e fica no processo
+    da API; o embedding (run_verify_speech_job) roda no executor de inferência
+    
+    O áudio deve ser PCM 16-bit little-endian, mono, 16kHz
+    """
+    
+    def __init__(self, db: Session, user_id: str, expected_phrase: str):
+        self.service = VoiceService(db)
+        self.user_id = user_id
+        self.expected_phrase = expected_phrase
+        self.stored_embedding: Optional[np.ndarray] = None
+        self._pool: Optional[RecognizerPool] = None
+        self._recognizer: Optional["KaldiRecognizer"] = None
+        self._pcm = bytearray()
+        self.speech_pcm: Optional[bytes] = None
+        self._segments: List[str] = []
+        self._expected_words = set(expected_phrase.lower().split())
+    
+    @property
+    def duration(self) -> float:
+        """Duração do áudio recebido até agora, em segundos"""
+        return len(self._pcm) / 2 / TARGET_SAMPLE_RATE
+    
+    @property
+    def transcription(self) -> str:
+        """Texto dos segmentos de fala já finalizados pelo Vosk"""
+        return " ".join(self._segments)
+    
+    def _phrase_coverage(self) -> float:
+        """Fração das palavras da frase esperada presentes na transcrição"""
+        if not self._expected_words:
+            return 0.0
+        recognized = set(self.transcription.lower().split())
+        return len(recognized & self._expected_words) / len(self._expected_words)
+    
+    def start(self) -> Optional[Dict[str, Any]]:
+        """
+        Carrega o perfil do usuário e cria o reconhecedor da sessão
+        
+        Returns:
+            None se a sessão pode começar, ou o resultado de erro da verificação
+        """
+        logger.info(f"Iniciando verificação em streaming para usuário {self.user_id}")
+        
+        self.stored_embedding = self.service.repository.get_embedding_by_user_id(self.user_id)
+        # A sessão dura toda a fala; a conexão volta ao pool logo após a leitura do perfil
+        self.service.repository.release_connection()
+        if self.stored_embedding is None:
+            return {
+                "authenticated": False,
+                "message": "Usuário não possui perfil de voz cadastrado"
+            }
+        
+        self._pool = get_asr_pool(
+            settings.vosk_model_path, TARGET_SAMPLE_RATE, get_asr_grammar(self.expected_phrase)
+        )
+        self._recognizer = self._pool.acquire()
+        return None
+    
+    def accept(self, chunk: bytes) -> Tuple[bool, str]:
+        """
+        Alimenta o reconhecedor com um pedaço de PCM
+        
+        Args:
+            chunk: Bytes PCM 16-bit (tamanho par)
+        
+        Returns:
+            Tupla com (fim de fala com a frase esperada reconhecida, transcrição parcial)
+        """
+        self._pcm.extend(chunk)
+        
+        with asr_slot():
+            end_of_segment = self._recognizer.AcceptWaveform(chunk)
+            result = self._recognizer.Result() if end_of_segment else self._recognizer.PartialResult()
+        
+        if end_of_segment:
+            text = json.loads(result).get("text", "").strip()
+            if text:
+                self._segments.append(text)
+            # Fim de um segmento de fala: encerra se a frase já foi dita por completo
+            return self._phrase_coverage() >= END_OF_PHRASE_COVERAGE, clean_transcription(self.transcription)
+        
+        # A parcial é só exibição: os [unk] dos segmentos fechados também saem
+        partial = clean_transcription(" ".join(self._segments + [json.loads(result).get("partial", "")]))
+        return False, partial
+    
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """
+        Fecha o reconhecimento, valida a transcrição e o áudio acumulado
+        
+        Aplica as mesmas verificações do upload (duração, qualidade e fala mínima
+        após o VAD); se passarem, a fala sem silêncio fica em speech_pcm para o
+        embedding no executor de inferência (run_verify_speech_job)
+        
+        Returns:
+            None se a fala está pronta para o embedding, ou o resultado de rejeição
+            (mesmo formato de verify_user)
+        """
+        with asr_slot():
+            final_result = self._recognizer.FinalResult()
+        text = json.loads(final_result).get("text", "").strip()
+        if text:
+            self._segments.append(text)
+        
+        transcription = self.transcription
+        if not transcription:
+            return {
+                "authenticated": False,
+                "message": "Não foi possível transcrever o áudio"
+            }
+        
+        if not validate_transcription(transcription, self.expected_phrase):
+            return {
+                "authenticated": False,
+                "message": "A frase pronunciada não corresponde à esperada",
+                "transcription": transcription,
+                "expected": self.expected_phrase
+            }
+        
+        audio, error = self.service.check_audio(DecodedAudio(np.frombuffer(bytes(self._pcm), dtype='<i2')))
+        if audio is None:
+            return {
+                "authenticated": False,
+                "message": error
+            }
+        
+        self.speech_pcm = audio.pcm.tobytes()
+        return None
+    
+    def close(self) -> None:
+        """Devolve o reconhecedor ao pool (chamar sempre ao fim da sessão)"""
+        if self._recognizer is not None:
+            self._pool.release(self._recognizer)
+            self._recognizer = None
@@ -1,36 +1,54 @@
 """
 Utilidades para processamento de áudio
 """
+import io
 import os
 import json
+import hashlib
+import re
 import logging
-import tempfile
-import wave
+import struct
+import subprocess
+import threading
+import time
 import warnings
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import numpy as np
-from typing import Tuple, Optional
-from vosk import Model, KaldiRecognizer
-from pydub import AudioSegment
-import librosa
-import soundfile as sf
 
 # Suprimir warnings do torchaudio
 warnings.filterwarnings("ignore", message="torchaudio._backend.set_audio_backend has been deprecated")
 warnings.filterwarnings("ignore", message="torchvision is not available")
 
-import torch
-import torchaudio
-from speechbrain.inference.speaker import EncoderClassifier
+from app.config import get_settings
+from app.utils.embedding_scheduler import EmbeddingScheduler, pad_batch
+from app.utils.metrics import REGISTRY, timed_stage
+from app.utils.recognizer_pool import RecognizerPool, get_recognizer_pool
+from app.utils.runtime_profile import asr_slot, configure_torch, inference_context
+
+# torch, SpeechBrain, Vosk, pydub e librosa são importados no primeiro uso (ou no
+# aquecimento): importar este módulo não pode custar segundos a cada worker e script
+if TYPE_CHECKING:
+    import torch
+    from speechbrain.inference.speaker import EncoderClassifier
+    from vosk import KaldiRecognizer, Model
+    from app.utils.speaker_encoder import SpeakerEncoder
 
 logger = logging.getLogger(__name__)
 
 _vosk_model = None
 _speechbrain_model = None
+_embedding_scheduler = None
 _symlink_patched = False
 
+# Requisições simultâneas logo após o startup não podem carregar o mesmo modelo duas vezes
+_vosk_lock = threading.Lock()
+_speechbrain_lock = threading.Lock()
+_scheduler_lock = threading.Lock()
+
 
-def get_vosk_model(model_path: str) -> Model:
+def get_vosk_model(model_path: str) -> "Model":
     """
     Retorna o modelo Vosk (cached)
     
@@ -42,15 +60,21 @@ def get_vosk_model(model_path: str) -> Model:
     """
     global _vosk_model
     
-    if _vosk_model is None:
-        logger.info(f"Carregando modelo Vosk de {model_path}")
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(
-                f"Modelo Vosk não encontrado em {model_path}. "
-                "Baixe o modelo de https://alphacephei.com/vosk/models"
-            )
-        _vosk_model = Model(model_path)
-        logger.info("Modelo Vosk carregado com sucesso")
+    if _vosk_model is not None:
+        return _vosk_model
+    
+    with _vosk_lock:
+        if _vosk_model is None:
+            logger.info(f"Carregando modelo Vosk de {model_path}")
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(
+                    f"Modelo Vosk não encontrado em {model_path}. "
+                    "Baixe o modelo de https://alphacephei.com/vosk/models"
+                )
+            from vosk import Model
+            
+            _vosk_model = Model(model_path)
+            logger.info("Modelo Vosk carregado com sucesso")
     
     return _vosk_model
 
@@ -140,235 +164,726 @@ def _patch_symlink_for_windows():
     logger.info("Patch de symlink aplicado com sucesso")
 
 
-def get_speechbrain_model(model_name: str) -> EncoderClassifier:
+def load_speechbrain_classifier(model_name: str) -> "EncoderClassifier":
     """
-    Retorna o modelo SpeechBrain (cached)
+    Carrega o EncoderClassifier do SpeechBrain (float32, CPU), sem cache
     
     Args:
         model_name: Nome do modelo SpeechBrain
         
     Returns:
-        Modelo SpeechBrain carregado
+        EncoderClassifier carregado
     """
-    global _speechbrain_model
+    logger.info(f"Carregando modelo SpeechBrain: {model_name}")
     
-    if _speechbrain_model is None:
-        logger.info(f"Carregando modelo SpeechBrain: {model_name}")
-        
-        _patch_symlink_for_windows()
+    # Threads do PyTorch precisam ser definidas antes do primeiro trabalho paralelo
+    configure_torch()
+    from speechbrain.inference.speaker import EncoderClassifier
+    
+    _patch_symlink_for_windows()
+    
+    classifier = EncoderClassifier.from_hparams(
+        source=model_name,
+        savedir="./models/speechbrain",
+        run_opts={"device": "cpu"},
+        use_auth_token=False
+    )
+    logger.info("Modelo SpeechBrain carregado com sucesso")
+    return classifier
+
+
+def encoder_export_dir(model_name: str) -> str:
+    """Diretório dos modelos exportados (TorchScript/ONNX) de um modelo SpeechBrain"""
+    return os.path.join(get_settings().encoder_export_dir, model_name.replace("/", "--"))
+
+
+def get_speechbrain_model(model_name: str) -> Union["EncoderClassifier", "SpeakerEncoder"]:
+    """
+    Retorna o encoder SpeechBrain (cached) no backend configurado (encoder_backend)
+    
+    Se o backend não puder ser preparado (ex.: onnxruntime ausente), usa o modelo eager
+    
+    Args:
+        model_name: Nome do modelo SpeechBrain
         
-        _speechbrain_model = EncoderClassifier.from_hparams(
-            source=model_name,
-            savedir="./models/speechbrain",
-            run_opts={"device": "cpu"},
-            use_auth_token=False
-        )
-        logger.info("Modelo SpeechBrain carregado com sucesso")
+    Returns:
+        Encoder com encode_batch(wavs, wav_lens)
+    """
+    global _speechbrain_model
+    
+    if _speechbrain_model is not None:
+        return _speechbrain_model
+    
+    with _speechbrain_lock:
+        if _speechbrain_model is None:
+            from app.utils.speaker_encoder import load_speaker_encoder
+            
+            classifier = load_speechbrain_classifier(model_name)
+            backend = get_settings().encoder_backend
+            try:
+                _speechbrain_model = load_speaker_encoder(classifier, backend, encoder_export_dir(model_name))
+            except Exception as e:
+                logger.error(f"❌ Erro ao preparar o encoder no backend {backend}, usando eager: {e}", exc_info=True)
+                _speechbrain_model = classifier
     
     return _speechbrain_model
 
 
-def convert_to_wav(audio_bytes: bytes) -> Tuple[str, int]:
+def preload_models(vosk_model_path: str, speechbrain_model_name: str) -> None:
     """
-    Converte bytes de áudio para arquivo WAV temporário normalizado
-    Aceita qualquer formato (MP3, M4A, OGG, AAC, AMR, 3GP, etc.) e converte para WAV 16kHz mono
-    Usa pydub+FFmpeg como primeiro método (mais compatível), depois torchaudio, depois librosa
+    Carrega os modelos Vosk e SpeechBrain no processo atual
+    
+    Usado antes de criar processos de inferência por fork, para que os pesos
+    sejam compartilhados (copy-on-write) em vez de carregados por processo
     
     Args:
-        audio_bytes: Bytes do arquivo de áudio em qualquer formato
+        vosk_model_path: Caminho para o modelo Vosk
+        speechbrain_model_name: Nome do modelo SpeechBrain
+    """
+    get_vosk_model(vosk_model_path)
+    get_speechbrain_model(speechbrain_model_name)
+
+
+TARGET_SAMPLE_RATE = 16000
+
+# Token que a gramática do Vosk emite para fala fora do vocabulário permitido
+GRAMMAR_UNKNOWN = "[unk]"
+
+
+def build_grammar(phrases: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Monta a gramática do Vosk com o vocabulário das frases
+    
+    Cada palavra é uma entrada independente (qualquer sequência é aceita) e
+    [unk] absorve o que estiver fora do vocabulário, em vez de forçar uma palavra
+    
+    Args:
+        phrases: Frases cujo vocabulário deve ser reconhecido
         
     Returns:
-        Tupla com (caminho do arquivo WAV normalizado, sample rate=16000)
+        Tupla ordenada de entradas da gramática
+    """
+    words = set()
+    for phrase in phrases:
+        words.update(re.findall(r"\w+", phrase.lower()))
+    return tuple(sorted(words)) + (GRAMMAR_UNKNOWN,)
+
+
+def get_asr_pool(
+    vosk_model_path: str,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+    grammar: Optional[Sequence[str]] = None
+) -> RecognizerPool:
     """
-    # Salvar bytes de entrada em arquivo temporário
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.input') as input_file:
-        input_file.write(audio_bytes)
-        input_path = input_file.name
+    Retorna o pool de KaldiRecognizers (SetWords ativo) para a configuração
     
-    output_path = None
+    Reconhecedores com gramática compilam o grafo de decodificação na criação;
+    como ficam no pool da gramática, a compilação acontece uma vez por frase
     
-    try:
-        target_sr = 16000
+    Args:
+        vosk_model_path: Caminho para o modelo Vosk
+        sample_rate: Taxa de amostragem do áudio
+        grammar: Entradas da gramática (build_grammar) ou None para o modelo de linguagem completo
         
-        # MÉTODO 1: Tentar com pydub+FFmpeg (mais compatível com Android)
-        try:
-            logger.info("Tentando carregar áudio com pydub+FFmpeg...")
-            
-            # pydub aceita praticamente todos os formatos via FFmpeg
-            audio = AudioSegment.from_file(input_path)
-            
-            # Converter para mono
-            if audio.channels > 1:
-                audio = audio.set_channels(1)
-            
-            # Resample para 16kHz
-            if audio.frame_rate != target_sr:
-                audio = audio.set_frame_rate(target_sr)
-            
-            # Salvar como WAV
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as output_file:
-                output_path = output_file.name
-            
-            audio.export(output_path, format='wav')
+    Returns:
+        RecognizerPool compartilhado pelas requisições do processo
+    """
+    settings = get_settings()
+    grammar_json = json.dumps(list(grammar), ensure_ascii=False) if grammar else None
+    
+    def create() -> "KaldiRecognizer":
+        from vosk import KaldiRecognizer
+        
+        model = get_vosk_model(vosk_model_path)
+        if grammar_json:
+            recognizer = KaldiRecognizer(model, sample_rate, grammar_json)
+        else:
+            recognizer = KaldiRecognizer(model, sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+    
+    if grammar_json:
+        key = (sample_rate, "grammar", hashlib.sha1(grammar_json.encode("utf-8")).hexdigest()[:12])
+    else:
+        key = (sample_rate, "words")
+    
+    max_size = settings.asr_pool_size or settings.inference_max_workers + settings.stream_max_sessions
+    return get_recognizer_pool(key, create, max_size)
+
+
+def clean_transcription(text: str) -> str:
+    """
+    Remove os tokens [unk] emitidos pela gramática, para exibição
+    
+    A transcrição validada mantém os [unk]: cada um é uma palavra dita fora da
+    frase e conta como divergência em validate_transcription
+    """
+    return " ".join(word for word in text.split() if word != GRAMMAR_UNKNOWN)
+
+
+def get_embedding_scheduler(model_name: str) -> Optional[EmbeddingScheduler]:
+    """
+    Retorna o agendador de micro-batches do encoder (cached)
+    
+    Args:
+        model_name: Nome do modelo SpeechBrain
+        
+    Returns:
+        EmbeddingScheduler ou None se o micro-batching estiver desabilitado
+    """
+    global _embedding_scheduler
+    
+    settings = get_settings()
+    if not settings.embedding_batching:
+        return None
+    
+    if _embedding_scheduler is not None:
+        return _embedding_scheduler
+    
+    with _scheduler_lock:
+        if _embedding_scheduler is None:
+            def encode(batch: np.ndarray, wav_lens: np.ndarray) -> np.ndarray:
+                import torch
+                
+                model = get_speechbrain_model(model_name)
+                with inference_context():
+                    embeddings = model.encode_batch(torch.from_numpy(batch), torch.from_numpy(wav_lens))
+                    return embeddings.squeeze(1).cpu().numpy()
             
-            logger.info(f"✅ Áudio convertido com pydub: {audio.frame_rate}Hz -> {target_sr}Hz, canais: mono")
+            _embedding_scheduler = EmbeddingScheduler(
+                encode,
+                max_batch_size=settings.embedding_max_batch_size,
+                max_wait_ms=settings.embedding_max_wait_ms,
+                max_padding_ratio=settings.embedding_max_padding_ratio
+            )
+            logger.info(
+                f"Micro-batching de embeddings ativo: batch={settings.embedding_max_batch_size}, "
+                f"espera={settings.embedding_max_wait_ms}ms"
+            )
+    
+    return _embedding_scheduler
+
+
+# Quantidade de bytes PCM entregues ao Vosk por chamada de AcceptWaveform (4000 frames de 16-bit)
+VOSK_CHUNK_BYTES = 8000
+
+# Detecção de atividade de voz (VAD): janelas de 30ms, 150ms de margem em volta da fala
+VAD_FRAME_MS = 30
+VAD_HANGOVER_FRAMES = 5
+VAD_MARGIN_DB = 10.0  # acima do ruído de fundo estimado
+VAD_FLOOR_DBFS = -55.0  # abaixo disso nunca é fala
+VAD_ZCR_UNVOICED = 0.25  # fricativas: energia baixa com muitas passagens por zero
+VAD_NOISE_WINDOW_FRAMES = 5  # ruído de fundo: trecho de 150ms mais silencioso do áudio
+VAD_MIN_SPREAD_DB = 12.0  # pico a menos disso acima do ruído: não há silêncio para separar
+VAD_STATIONARY_DB = 3.0  # nível praticamente constante (tom ou ruído)
+VAD_ZCR_NOISE = 0.35  # ruído branco: metade das amostras troca de sinal
+
+VAD_SPEECH_RATIO = REGISTRY.histogram(
+    "voice_vad_speech_ratio",
+    "Fração do áudio recebido mantida após a remoção de silêncio",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+
+class DecodedAudio:
+    """
+    Áudio decodificado e normalizado (16kHz mono, PCM 16-bit) mantido em memória
+    
+    Produzido uma única vez por requisição e compartilhado entre os estágios:
+    o Vosk recebe fatias (memoryview) do buffer PCM e o SpeechBrain recebe um
+    tensor que é uma view sobre o buffer float32 correspondente
+    """
+    
+    def __init__(self, pcm: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self._samples = None
+    
+    @property
+    def num_samples(self) -> int:
+        """Número de amostras do áudio"""
+        return int(self.pcm.shape[0])
+    
+    @property
+    def duration(self) -> float:
+        """Duração do áudio em segundos"""
+        return self.num_samples / float(self.sample_rate)
+    
+    def pcm_chunks(self, chunk_bytes: int = VOSK_CHUNK_BYTES) -> Iterator[memoryview]:
+        """
+        Itera sobre o buffer PCM 16-bit em fatias sem cópia
+        
+        Args:
+            chunk_bytes: Tamanho de cada fatia em bytes
             
-            return output_path, target_sr
+        Yields:
+            memoryview de cada fatia do buffer PCM
+        """
+        view = memoryview(self.pcm).cast('B')
+        for start in range(0, len(view), chunk_bytes):
+            yield view[start:start + chunk_bytes]
+    
+    def samples(self) -> np.ndarray:
+        """
+        Retorna as amostras como float32 em [-1, 1]
+        
+        A conversão é feita uma única vez e reaproveitada nas chamadas seguintes
+        """
+        if self._samples is None:
+            self._samples = self.pcm.astype(np.float32) * (1.0 / 32768.0)
+        return self._samples
+    
+    def waveform(self) -> "torch.Tensor":
+        """
+        Retorna o áudio como tensor [1, amostras] (formato do SpeechBrain)
+        
+        O tensor compartilha memória com samples(), sem cópia adicional
+        """
+        import torch
+        
+        return torch.from_numpy(self.samples()).unsqueeze(0)
+
+
+def _parse_wav_header(audio_bytes: bytes) -> Optional[Dict[str, int]]:
+    """
+    Lê o cabeçalho RIFF/WAVE diretamente dos bytes, sem decodificar o áudio
+    
+    Args:
+        audio_bytes: Bytes do arquivo de áudio
+        
+    Returns:
+        Dicionário com format_tag, channels, sample_rate, bits_per_sample,
+        data_offset e data_size, ou None se não for um WAV válido
+    """
+    if len(audio_bytes) < 12 or audio_bytes[0:4] != b'RIFF' or audio_bytes[8:12] != b'WAVE':
+        return None
+    
+    header = {}
+    offset = 12
+    while offset + 8 <= len(audio_bytes):
+        chunk_id = audio_bytes[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', audio_bytes, offset + 4)[0]
+        body = offset + 8
+        
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', audio_bytes, body)
+            header.update(
+                format_tag=format_tag,
+                channels=channels,
+                sample_rate=sample_rate,
+                bits_per_sample=bits
+            )
+        elif chunk_id == b'data':
+            # Gravadores em streaming às vezes deixam o tamanho zerado/incorreto
+            available = len(audio_bytes) - body
+            header.update(data_offset=body, data_size=min(chunk_size, available) if chunk_size else available)
+            break
+        
+        # Chunks RIFF são alinhados em 2 bytes
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    if 'sample_rate' not in header or 'data_offset' not in header:
+        return None
+    return header
+
+
+def _decode_wav_in_memory(audio_bytes: bytes) -> Optional[np.ndarray]:
+    """
+    Caminho rápido para WAV que já está no formato alvo (PCM 16-bit, mono, 16kHz)
+    
+    O array retornado é uma view sobre os próprios bytes do upload (sem cópia)
+    
+    Returns:
+        Array int16 ou None se o WAV precisar de conversão
+    """
+    header = _parse_wav_header(audio_bytes)
+    if header is None:
+        return None
+    
+    # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE
+    is_pcm16 = header['format_tag'] in (1, 0xFFFE) and header['bits_per_sample'] == 16
+    if not is_pcm16 or header['channels'] != 1 or header['sample_rate'] != TARGET_SAMPLE_RATE:
+        return None
+    
+    count = header['data_size'] // 2
+    return np.frombuffer(audio_bytes, dtype='<i2', count=count, offset=header['data_offset'])
+
+
+def _decode_with_ffmpeg(audio_bytes: bytes) -> np.ndarray:
+    """
+    Decodifica qualquer formato via FFmpeg usando pipes (stdin -> stdout), sem arquivos temporários
+    
+    O FFmpeg já entrega PCM 16-bit mono em 16kHz, então não há resample em Python
+    """
+    from pydub import AudioSegment
+    
+    command = [
+        AudioSegment.converter,
+        "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ac", "1",
+        "-ar", str(TARGET_SAMPLE_RATE),
+        "-f", "s16le",
+        "pipe:1"
+    ]
+    process = subprocess.run(command, input=audio_bytes, capture_output=True)
+    if process.returncode != 0 or not process.stdout:
+        raise RuntimeError(process.stderr.decode('utf-8', errors='ignore').strip() or "FFmpeg não retornou áudio")
+    
+    return np.frombuffer(process.stdout, dtype='<i2')
+
+
+def _decode_with_pydub(audio_bytes: bytes) -> np.ndarray:
+    """
+    Decodifica via pydub a partir de um buffer em memória
+    
+    Necessário para containers que não podem ser lidos de um pipe sequencial
+    (ex.: M4A/3GP gravados no Android com o átomo moov no final do arquivo)
+    """
+    from pydub import AudioSegment
+    
+    audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+    
+    if audio.channels > 1:
+        audio = audio.set_channels(1)
+    if audio.frame_rate != TARGET_SAMPLE_RATE:
+        audio = audio.set_frame_rate(TARGET_SAMPLE_RATE)
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+    
+    return np.frombuffer(audio.raw_data, dtype='<i2')
+
+
+def _decode_with_librosa(audio_bytes: bytes) -> np.ndarray:
+    """Fallback final: decodifica com librosa/soundfile a partir de um buffer em memória"""
+    import librosa
+    
+    audio_data, _ = librosa.load(io.BytesIO(audio_bytes), sr=TARGET_SAMPLE_RATE, mono=True)
+    return (np.clip(audio_data, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+@timed_stage("decode")
+def decode_audio(audio_bytes: bytes) -> Optional[DecodedAudio]:
+    """
+    Decodifica bytes de áudio em qualquer formato para um DecodedAudio 16kHz mono
+    Aceita qualquer formato (WAV, MP3, M4A, OGG, AAC, AMR, 3GP, etc.)
+    
+    Todo o processo acontece em memória. Este é o único estágio de decodificação
+    da requisição: o resultado deve ser repassado para transcribe_audio e
+    extract_voice_embedding
+    
+    Ordem de tentativa: WAV já normalizado (sem decodificação), FFmpeg via pipe,
+    pydub (containers não sequenciais) e librosa como último recurso
+    
+    Args:
+        audio_bytes: Bytes do arquivo de áudio em qualquer formato
+        
+    Returns:
+        DecodedAudio ou None se falhar
+    """
+    pcm = _decode_wav_in_memory(audio_bytes)
+    if pcm is not None:
+        logger.info("✅ Áudio WAV já normalizado, sem conversão")
+        return DecodedAudio(pcm)
+    
+    decoders = (
+        ("FFmpeg", _decode_with_ffmpeg),
+        ("pydub", _decode_with_pydub),
+        ("librosa", _decode_with_librosa),
+    )
+    for name, decoder in decoders:
+        try:
+            pcm = decoder(audio_bytes)
+            if pcm.size == 0:
+                raise ValueError("Áudio decodificado vazio")
             
+            audio = DecodedAudio(pcm)
+            logger.info(f"✅ Áudio decodificado com {name}: {audio.duration:.2f}s @ {TARGET_SAMPLE_RATE}Hz mono")
+            return audio
         except Exception as e:
-            logger.warning(f"pydub falhou, tentando torchaudio: {e}")
-            
-            # MÉTODO 2: Tentar com torchaudio (mais rápido para WAV/MP3)
-            try:
-                waveform, original_sr = torchaudio.load(input_path)
-                logger.info(f"Áudio carregado com torchaudio: {original_sr}Hz")
-                
-                # Converter para mono se necessário
-                if waveform.shape[0] > 1:
-                    waveform = torch.mean(waveform, dim=0, keepdim=True)
-                
-                # Resample para 16kHz se necessário
-                if original_sr != target_sr:
-                    resampler = torchaudio.transforms.Resample(original_sr, target_sr)
-                    waveform = resampler(waveform)
-                
-                # Salvar como WAV normalizado
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as output_file:
-                    output_path = output_file.name
-                
-                torchaudio.save(output_path, waveform, target_sr)
-                
-                logger.info(f"✅ Áudio convertido com torchaudio: {original_sr}Hz -> {target_sr}Hz, canais: mono")
-                
-                return output_path, target_sr
-                
-            except Exception as e2:
-                logger.warning(f"torchaudio falhou, tentando librosa: {e2}")
-                
-                # MÉTODO 3: Fallback para librosa (último recurso)
-                audio_data, original_sr = librosa.load(input_path, sr=None, mono=False)
-                
-                # Converter numpy array para tensor torch
-                if audio_data.ndim == 1:
-                    waveform = torch.from_numpy(audio_data).unsqueeze(0)
-                else:
-                    waveform = torch.from_numpy(audio_data)
-                
-                logger.info(f"Áudio carregado com librosa: {original_sr}Hz")
-                
-                # Converter para mono se necessário
-                if waveform.shape[0] > 1:
-                    waveform = torch.mean(waveform, dim=0, keepdim=True)
-                
-                # Resample para 16kHz se necessário
-                if original_sr != target_sr:
-                    resampler = torchaudio.transforms.Resample(original_sr, target_sr)
-                    waveform = resampler(waveform)
-                
-                # Salvar como WAV normalizado
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as output_file:
-                    output_path = output_file.name
-                
-                torchaudio.save(output_path, waveform, target_sr)
-                
-                logger.info(f"✅ Áudio convertido com librosa: {original_sr}Hz -> {target_sr}Hz, canais: mono")
-                
-                return output_path, target_sr
+            logger.warning(f"{name} falhou ao decodificar áudio: {e}")
+    
+    logger.error("❌ Erro ao decodificar áudio com todos os métodos")
+    return None
+
+
+def _ensure_decoded(audio: Union[bytes, DecodedAudio]) -> Optional[DecodedAudio]:
+    """Aceita bytes brutos (compatibilidade) ou um DecodedAudio já decodificado"""
+    if isinstance(audio, DecodedAudio):
+        return audio
+    return decode_audio(audio)
+
+
+def _speech_frames(pcm: np.ndarray, frame_len: int) -> np.ndarray:
+    """
+    Classifica cada janela como fala ou não-fala por energia e taxa de passagem por zero
+    
+    Todo o cálculo é vetorizado sobre a matriz [janelas, amostras]
+    
+    O ruído de fundo é o trecho curto mais silencioso do áudio e o limiar nunca passa
+    da metade do caminho entre ele e o pico, então gravações com pouco silêncio ou SNR
+    baixo não perdem a fala. Sem diferença de nível suficiente (fala contínua, SNR
+    muito baixo) o áudio inteiro é fala, exceto ruído estacionário
+    
+    Returns:
+        Máscara booleana [janelas]
+    """
+    n_frames = pcm.shape[0] // frame_len
+    frames = pcm[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32) * (1.0 / 32768.0)
+    
+    power = np.mean(frames * frames, axis=1) + 1e-12
+    energy_db = 10.0 * np.log10(power)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    audible = energy_db > VAD_FLOOR_DBFS
+    
+    window = min(VAD_NOISE_WINDOW_FRAMES, n_frames)
+    noise_floor = 10.0 * np.log10(np.convolve(power, np.ones(window) / window, mode="valid").min())
+    peak = np.percentile(energy_db, 95)
+    spread = peak - noise_floor
+    
+    if spread < VAD_MIN_SPREAD_DB:
+        if spread < VAD_STATIONARY_DB and np.median(zcr) > VAD_ZCR_NOISE:
+            return np.zeros(n_frames, dtype=bool)
+        return audible
+    
+    # Limiar adaptativo: acima do ruído de fundo, limitado à metade da faixa até o pico
+    margin = min(VAD_MARGIN_DB, spread / 2)
+    threshold = max(noise_floor + margin, VAD_FLOOR_DBFS)
+    
+    voiced = energy_db > threshold
+    unvoiced = (energy_db > threshold - margin / 2) & (zcr > VAD_ZCR_UNVOICED) & audible
+    return voiced | unvoiced
+
+
+def trim_silence(audio: DecodedAudio, max_pause_ms: float) -> Tuple[DecodedAudio, float]:
+    """
+    Remove o silêncio inicial e final e encurta pausas internas longas
+    
+    Args:
+        audio: Áudio decodificado
+        max_pause_ms: Duração máxima mantida de cada pausa entre trechos de fala
         
-    except Exception as e:
-        logger.error(f"❌ Erro ao converter áudio com todos os métodos: {e}", exc_info=True)
-        raise
-    finally:
-        # Limpar arquivo temporário de entrada
-        try:
-            os.unlink(input_path)
-        except:
-            pass
+    Returns:
+        Tupla com (áudio apenas com a fala, segundos de fala detectados)
+    """
+    frame_len = audio.sample_rate * VAD_FRAME_MS // 1000
+    if audio.num_samples < frame_len:
+        return audio, 0.0
+    
+    speech = _speech_frames(audio.pcm, frame_len)
+    speech_seconds = float(speech.sum()) * VAD_FRAME_MS / 1000
+    if not speech.any():
+        return DecodedAudio(audio.pcm[:0], audio.sample_rate), 0.0
+    
+    # Margem em volta da fala para não cortar o início/fim das palavras
+    window = np.ones(2 * VAD_HANGOVER_FRAMES + 1)
+    keep = np.convolve(speech, window, mode="same") > 0
+    
+    # Pausas internas: mantém no máximo max_pause_ms de cada uma (metade em cada ponta)
+    max_pause_frames = int(max_pause_ms // VAD_FRAME_MS)
+    first = int(np.argmax(keep))
+    last = keep.shape[0] - int(np.argmax(keep[::-1]))
+    transitions = np.diff(keep[first:last].astype(np.int8))
+    starts = np.flatnonzero(transitions == -1) + 1 + first
+    ends = np.flatnonzero(transitions == 1) + 1 + first
+    for start, end in zip(starts, ends):
+        if end - start > max_pause_frames:
+            half = max_pause_frames // 2
+            keep[start:start + half] = True
+            keep[start + half:end - (max_pause_frames - half)] = False
+            keep[end - (max_pause_frames - half):end] = True
+    
+    n_frames = keep.shape[0]
+    if keep.all():
+        return audio, speech_seconds
+    
+    mask = np.repeat(keep, frame_len)
+    trimmed = DecodedAudio(audio.pcm[:n_frames * frame_len][mask], audio.sample_rate)
+    return trimmed, speech_seconds
 
 
-def transcribe_audio(audio_bytes: bytes, vosk_model_path: str) -> Optional[str]:
+@timed_stage("vad")
+def apply_vad(audio: DecodedAudio, max_pause_ms: float) -> Tuple[DecodedAudio, float]:
+    """
+    Aplica a remoção de silêncio registrando quanto da gravação foi mantido
+    
+    Args:
+        audio: Áudio decodificado
+        max_pause_ms: Duração máxima mantida de cada pausa entre trechos de fala
+        
+    Returns:
+        Tupla com (áudio apenas com a fala, segundos de fala detectados)
+    """
+    trimmed, speech_seconds = trim_silence(audio, max_pause_ms)
+    kept_ratio = trimmed.duration / audio.duration if audio.duration else 0.0
+    VAD_SPEECH_RATIO.observe(kept_ratio)
+    
+    logger.info(
+        f"VAD: {speech_seconds:.2f}s de fala em {audio.duration:.2f}s de áudio "
+        f"(mantidos {trimmed.duration:.2f}s, {kept_ratio:.0%})"
+    )
+    return trimmed, speech_seconds
+
+
+@timed_stage("asr")
+def transcribe_audio(
+    audio: Union[bytes, DecodedAudio],
+    vosk_model_path: str,
+    grammar: Optional[Sequence[str]] = None
+) -> Optional[str]:
     """
     Transcreve áudio usando Vosk
     
     Args:
-        audio_bytes: Bytes do arquivo de áudio (WAV)
+        audio: DecodedAudio (preferencial) ou bytes do arquivo de áudio
         vosk_model_path: Caminho para o modelo Vosk
+        grammar: Gramática que restringe o vocabulário (opcional, ver build_grammar)
         
     Returns:
         Texto transcrito ou None se falhar
     """
     try:
-        wav_path, sample_rate = convert_to_wav(audio_bytes)
-        
-        model = get_vosk_model(vosk_model_path)
-        
-        recognizer = KaldiRecognizer(model, sample_rate)
-        recognizer.SetWords(True)
+        decoded = _ensure_decoded(audio)
+        if decoded is None:
+            return None
         
-        with wave.open(wav_path, 'rb') as wf:
-            while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
-                    break
-                recognizer.AcceptWaveform(data)
+        # Reconhecedor reaproveitado: sem custo de criação/configuração por requisição;
+        # a vaga limita as decodificações simultâneas do processo (asr_max_concurrency)
+        from vosk import _ffi as vosk_ffi
         
-        result = json.loads(recognizer.FinalResult())
+        with asr_slot(), get_asr_pool(vosk_model_path, decoded.sample_rate, grammar).lease() as recognizer:
+            # from_buffer expõe cada fatia do buffer PCM ao C sem copiar os bytes
+            for chunk in decoded.pcm_chunks():
+                recognizer.AcceptWaveform(vosk_ffi.from_buffer(chunk))
+            
+            result = json.loads(recognizer.FinalResult())
+        # Os [unk] ficam na transcrição: descartá-los faria outra frase com
+        # palavras em comum passar na validação com a gramática da frase esperada
         transcription = result.get('text', '').strip()
         
-        os.unlink(wav_path)
-        
         logger.info(f"Transcrição: {transcription}")
         return transcription if transcription else None
         
     except Exception as e:
         logger.error(f"Erro ao transcrever áudio: {e}")
-        if 'wav_path' in locals():
-            try:
-                os.unlink(wav_path)
-            except:
-                pass
         return None
 
 
-def extract_voice_embedding(audio_bytes: bytes, speechbrain_model_name: str) -> Optional[list]:
+@timed_stage("embedding")
+def extract_voice_embedding(audio: Union[bytes, DecodedAudio], speechbrain_model_name: str) -> Optional[list]:
     """
     Extrai embedding de voz usando SpeechBrain
     
     Args:
-        audio_bytes: Bytes do arquivo de áudio
+        audio: DecodedAudio (preferencial) ou bytes do arquivo de áudio
         speechbrain_model_name: Nome do modelo SpeechBrain
         
     Returns:
         Lista com o embedding ou None se falhar
     """
     try:
-        # convert_to_wav já retorna áudio normalizado em 16kHz mono
-        wav_path, sample_rate = convert_to_wav(audio_bytes)
-        
-        model = get_speechbrain_model(speechbrain_model_name)
-        
-        # Carregar áudio já normalizado
-        waveform, sr = torchaudio.load(wav_path)
+        decoded = _ensure_decoded(audio)
+        if decoded is None:
+            return None
         
-        # Extrair embedding
-        embedding = model.encode_batch(waveform)
-        embedding_array = embedding.squeeze().cpu().numpy()
-        
-        os.unlink(wav_path)
+        scheduler = get_embedding_scheduler(speechbrain_model_name)
+        if scheduler is not None:
+            # Agrupado com requisições concorrentes em um único forward pass
+            embedding_array = scheduler.encode(decoded.samples())
+        else:
+            model = get_speechbrain_model(speechbrain_model_name)
+            with inference_context():
+                embedding = model.encode_batch(decoded.waveform())
+                embedding_array = embedding.squeeze().cpu().numpy()
         
         logger.info(f"Embedding extraído com dimensão: {embedding_array.shape}")
         return embedding_array.tolist()
         
     except Exception as e:
         logger.error(f"Erro ao extrair embedding: {e}", exc_info=True)
-        if 'wav_path' in locals():
-            try:
-                os.unlink(wav_path)
-            except:
-                pass
         return None
 
 
+@timed_stage("embedding")
+def extract_voice_embeddings(
+    audios: List[DecodedAudio],
+    speechbrain_model_name: str
+) -> Optional[List[list]]:
+    """
+    Extrai os embeddings de várias amostras do mesmo locutor em um único forward pass
+    
+    Não passa pelo agendador de micro-batches: as amostras já formam um batch
+    
+    Args:
+        audios: Áudios já decodificados
+        speechbrain_model_name: Nome do modelo SpeechBrain
+        
+    Returns:
+        Lista de embeddings (na ordem de entrada) ou None se falhar
+    """
+    try:
+        import torch
+        
+        model = get_speechbrain_model(speechbrain_model_name)
+        batch, wav_lens = pad_batch([audio.samples() for audio in audios])
+        with inference_context():
+            embeddings = model.encode_batch(torch.from_numpy(batch), torch.from_numpy(wav_lens))
+            embeddings_array = embeddings.squeeze(1).cpu().numpy()
+        
+        logger.info(f"{len(audios)} embeddings extraídos em um único batch: {embeddings_array.shape}")
+        return embeddings_array.tolist()
+        
+    except Exception as e:
+        logger.error(f"Erro ao extrair embeddings em batch: {e}", exc_info=True)
+        return None
+
+
+def _warm_up_audio(seconds: float = 2.0) -> DecodedAudio:
+    """Voz sintética (harmônicos com pitch variável) usada no aquecimento dos modelos"""
+    t = np.arange(int(seconds * TARGET_SAMPLE_RATE)) / TARGET_SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / TARGET_SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 6))
+    pcm = (0.3 * 32767 * signal / np.abs(signal).max()).astype('<i2')
+    return DecodedAudio(pcm)
+
+
+def warm_up_models(vosk_model_path: str, speechbrain_model_name: str) -> float:
+    """
+    Carrega os modelos em paralelo e executa uma inferência com áudio sintético
+    
+    A primeira inferência aloca os buffers do encoder, cria o primeiro reconhecedor
+    do pool e inicia o agendador de micro-batches; sem o aquecimento esse custo
+    cairia na primeira requisição
+    
+    Args:
+        vosk_model_path: Caminho para o modelo Vosk
+        speechbrain_model_name: Nome do modelo SpeechBrain
+        
+    Returns:
+        Duração do aquecimento em segundos
+        
+    Raises:
+        RuntimeError: Se o encoder não produzir um embedding
+    """
+    started = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="vosk-loader") as loader:
+        vosk_loaded = loader.submit(get_vosk_model, vosk_model_path)
+        get_speechbrain_model(speechbrain_model_name)
+        vosk_loaded.result()
+    
+    audio = _warm_up_audio()
+    transcribe_audio(audio, vosk_model_path)
+    if extract_voice_embedding(audio, speechbrain_model_name) is None:
+        raise RuntimeError("O encoder SpeechBrain não produziu embedding no aquecimento")
+    
+    elapsed = time.perf_counter() - started
+    logger.info(f"🔥 Modelos aquecidos em {elapsed:.1f}s")
+    return elapsed
+
+
 def validate_transcription(transcription: str, expected_phrase: str, threshold: float = 0.5) -> bool:
     """
     Valida se a transcrição corresponde à frase esperada
@@ -391,14 +906,18 @@ def validate_transcription(transcription: str, expected_phrase: str, threshold:
         logger.info(f"Similaridade de transcrição: 1.00 (correspondência exata)")
         return True
     
-    trans_words = set(trans_normalized.split())
+    # Cada [unk] da gramática é uma palavra fora do vocabulário esperado: entra
+    # na união como divergência própria (em conjunto, vários [unk] virariam um só)
+    trans_tokens = trans_normalized.split()
+    unknown = trans_tokens.count(GRAMMAR_UNKNOWN)
+    trans_words = set(trans_tokens) - {GRAMMAR_UNKNOWN}
     expected_words = set(expected_normalized.split())
     
     if len(expected_words) == 0:
         return False
     
     intersection = len(trans_words.intersection(expected_words))
-    union = len(trans_words.union(expected_words))
+    union = len(trans_words.union(expected_words)) + unknown
     
     similarity = intersection / union if union > 0 else 0
     
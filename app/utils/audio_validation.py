@@ -0,0 +1,233 @@
+"""
+Validação barata de uploads de áudio (antes e logo após a decodificação)
+
+As verificações daqui leem apenas o cabeçalho do arquivo ou fazem uma única
+passada vetorizada sobre o PCM, para que entradas inválidas sejam descartadas
+sem FFmpeg, Vosk ou SpeechBrain
+"""
+import struct
+from typing import Optional
+import numpy as np
+from app.utils.audio_processing import DecodedAudio, _parse_wav_header
+
+
+class AudioValidationError(Exception):
+    """Upload rejeitado pela validação; status_code indica a resposta HTTP adequada"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# Marcas (brand) do átomo ftyp dos containers ISO/MP4
+_FTYP_3GP = (b"3gp", b"3g2")
+
+
+def sniff_container(data: bytes) -> Optional[str]:
+    """
+    Identifica o container pelos primeiros bytes do arquivo
+    
+    Args:
+        data: Bytes do arquivo (apenas o início é lido)
+    
+    Returns:
+        Nome do container ("wav", "mp4", "3gp", "mp3", "ogg", "flac", "webm",
+        "aac", "amr", "caf") ou None se não for um formato de áudio conhecido
+    """
+    head = data[:16]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[4:8] == b"ftyp":
+        return "3gp" if head[8:11] in _FTYP_3GP else "mp4"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[:5] == b"#!AMR":
+        return "amr"
+    if head[:4] == b"caff":
+        return "caf"
+    if len(head) >= 2 and head[0] == 0xFF:
+        # Sincronismo de frame: ADTS (AAC) tem layer 00, MPEG áudio (MP3) não
+        if head[1] & 0xF6 == 0xF0:
+            return "aac"
+        if head[1] & 0xE0 == 0xE0:
+            return "mp3"
+    return None
+
+
+def _wav_duration(data: bytes) -> Optional[float]:
+    header = _parse_wav_header(data)
+    if header is None or not header['sample_rate'] or not header['channels'] or not header['bits_per_sample']:
+        return None
+    frame_bytes = header['channels'] * header['bits_per_sample'] // 8
+    return header['data_size'] / frame_bytes / header['sample_rate']
+
+
+def _mp4_duration(data: bytes) -> Optional[float]:
+    """Lê timescale/duration do átomo moov/mvhd (o moov pode estar no fim do arquivo)"""
+    offset, end = 0, len(data)
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1 and offset + 16 <= end:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return None
+        
+        if kind == b"moov":
+            # Desce para dentro do moov e procura o mvhd
+            end = offset + size
+            offset += header_size
+            continue
+        if kind == b"mvhd":
+            body = offset + header_size
+            version = data[body]
+            if version == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, body + 12)
+            return duration / timescale if timescale else None
+        
+        offset += size
+    return None
+
+
+def _flac_duration(data: bytes) -> Optional[float]:
+    """Lê sample rate e total de amostras do bloco STREAMINFO"""
+    if len(data) < 26:
+        return None
+    info = int.from_bytes(data[18:26], "big")
+    sample_rate = info >> 44
+    total_samples = info & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def _ogg_duration(data: bytes) -> Optional[float]:
+    """Granule position da última página dividida pela taxa do codec (Opus ou Vorbis)"""
+    if len(data) < 28:
+        return None
+    packet = 27 + data[26]
+    if data[packet:packet + 8] == b"OpusHead":
+        sample_rate = 48000
+    elif data[packet:packet + 7] == b"\x01vorbis":
+        sample_rate = struct.unpack_from("<I", data, packet + 12)[0]
+    else:
+        return None
+    
+    last_page = data.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(data) or not sample_rate:
+        return None
+    granule = struct.unpack_from("<q", data, last_page + 6)[0]
+    return granule / sample_rate if granule > 0 else None
+
+
+_DURATION_READERS = {
+    "wav": _wav_duration,
+    "mp4": _mp4_duration,
+    "3gp": _mp4_duration,
+    "flac": _flac_duration,
+    "ogg": _ogg_duration,
+}
+
+
+def header_duration(data: bytes, container: str) -> Optional[float]:
+    """
+    Duração declarada no cabeçalho do container, sem decodificar o áudio
+    
+    Args:
+        data: Bytes do arquivo
+        container: Resultado de sniff_container
+    
+    Returns:
+        Duração em segundos ou None se o formato não declara a duração de forma barata
+    """
+    reader = _DURATION_READERS.get(container)
+    if reader is None:
+        return None
+    try:
+        return reader(data)
+    except (struct.error, IndexError):
+        return None
+
+
+def validate_upload(data: bytes, max_bytes: int, min_seconds: float, max_seconds: float) -> str:
+    """
+    Validação pré-decodificação: tamanho, container e duração declarada
+    
+    Args:
+        data: Bytes do upload
+        max_bytes: Tamanho máximo aceito
+        min_seconds: Duração mínima
+        max_seconds: Duração máxima
+    
+    Returns:
+        Nome do container detectado
+    
+    Raises:
+        AudioValidationError: Se o upload deve ser rejeitado
+    """
+    if len(data) > max_bytes:
+        raise AudioValidationError(
+            f"Arquivo de áudio muito grande (máximo de {max_bytes / (1024 * 1024):.1f} MB)",
+            status_code=413
+        )
+    
+    container = sniff_container(data)
+    if container is None:
+        raise AudioValidationError("Formato de áudio não reconhecido", status_code=415)
+    
+    duration = header_duration(data, container)
+    if duration is not None:
+        check_duration(duration, min_seconds, max_seconds)
+    return container
+
+
+def check_duration(duration: float, min_seconds: float, max_seconds: float) -> None:
+    """
+    Verifica se a duração do áudio está dentro dos limites
+    
+    Raises:
+        AudioValidationError: Se a duração estiver fora dos limites
+    """
+    if duration < min_seconds:
+        raise AudioValidationError(f"Áudio muito curto ({duration:.1f}s, mínimo de {min_seconds:.1f}s)")
+    if duration > max_seconds:
+        raise AudioValidationError(f"Áudio muito longo ({duration:.1f}s, máximo de {max_seconds:.0f}s)")
+
+
+def check_audio_quality(audio: DecodedAudio, max_clipping_ratio: float, min_rms_dbfs: float) -> None:
+    """
+    Verificação pós-decodificação em uma passada vetorizada: saturação e volume
+    
+    Args:
+        audio: Áudio decodificado
+        max_clipping_ratio: Fração máxima de amostras no limite da escala
+        min_rms_dbfs: Volume RMS mínimo (dBFS)
+    
+    Raises:
+        AudioValidationError: Se o áudio estiver saturado ou praticamente mudo
+    """
+    pcm = audio.pcm
+    if pcm.size == 0:
+        raise AudioValidationError("Áudio decodificado vazio")
+    
+    clipped = np.count_nonzero((pcm >= 32767) | (pcm <= -32768)) / pcm.size
+    if clipped > max_clipping_ratio:
+        raise AudioValidationError(f"Áudio saturado ({clipped:.1%} das amostras no limite)")
+    
+    samples = audio.samples()
+    rms = float(np.sqrt(np.dot(samples, samples) / samples.size))
+    rms_dbfs = 20.0 * np.log10(rms + 1e-12)
+    if rms_dbfs < min_rms_dbfs:
+        raise AudioValidationError(f"Volume do áudio muito baixo ({rms_dbfs:.0f} dBFS)")
@@ -0,0 +1,176 @@
+"""
+Agendador de micro-batches para extração de embeddings com SpeechBrain
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence, Tuple
+import numpy as np
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = REGISTRY.histogram(
+    "voice_embedding_batch_size",
+    "Número de áudios por forward pass do encoder",
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+BATCH_WAIT = REGISTRY.histogram(
+    "voice_embedding_batch_wait_seconds",
+    "Tempo que cada áudio aguardou na fila do agendador antes do forward pass"
+)
+BATCH_PADDING = REGISTRY.histogram(
+    "voice_embedding_batch_padding_ratio",
+    "Fração do batch composta por padding (amostras desperdiçadas)",
+    buckets=(0.0, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75)
+)
+
+
+def pad_batch(samples: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Monta um batch [B, T] com zero-padding à direita
+    
+    Args:
+        samples: Áudios float32 mono de comprimentos variados
+        
+    Returns:
+        Tupla com (batch float32 [B, T], comprimentos relativos [B] no formato wav_lens)
+    """
+    lengths = np.array([s.shape[0] for s in samples], dtype=np.int64)
+    max_len = int(lengths.max())
+    
+    if len(samples) == 1:
+        batch = samples[0][np.newaxis, :]
+    else:
+        batch = np.zeros((len(samples), max_len), dtype=np.float32)
+        for i, s in enumerate(samples):
+            batch[i, :lengths[i]] = s
+    
+    return batch, (lengths / max_len).astype(np.float32)
+
+
+class _EmbeddingRequest:
+    """Áudio aguardando na fila do agendador"""
+    
+    __slots__ = ("samples", "future", "enqueued_at")
+    
+    def __init__(self, samples: np.ndarray):
+        self.samples = samples
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingScheduler:
+    """
+    Agrupa requisições concorrentes de embedding em batches com padding
+    
+    Uma thread dedicada coleta requisições até max_batch_size ou até max_wait_ms
+    após a primeira chegar, agrupa por comprimento semelhante (limitando o padding
+    a max_padding_ratio) e executa um único forward pass por grupo
+    """
+    
+    def __init__(
+        self,
+        encode_fn: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_padding_ratio: float = 0.3
+    ):
+        """
+        Args:
+            encode_fn: Recebe (batch float32 [B, T], comprimentos relativos [B])
+                e retorna os embeddings [B, D]
+            max_batch_size: Máximo de áudios por forward pass
+            max_wait_ms: Tempo máximo de espera para completar um batch
+            max_padding_ratio: Fração máxima de padding tolerada em um grupo
+        """
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_padding_ratio = max_padding_ratio
+        self._queue: "queue.Queue[_EmbeddingRequest]" = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="embedding-scheduler", daemon=True)
+        self._thread.start()
+    
+    def submit(self, samples: np.ndarray) -> Future:
+        """
+        Enfileira um áudio (float32 mono) para extração de embedding
+        
+        Returns:
+            Future que resolve para o embedding (np.ndarray [D])
+        """
+        request = _EmbeddingRequest(samples)
+        self._queue.put(request)
+        return request.future
+    
+    def encode(self, samples: np.ndarray) -> np.ndarray:
+        """Extrai o embedding de um áudio aguardando o batch correspondente"""
+        return self.submit(samples).result()
+    
+    def _collect(self) -> List[_EmbeddingRequest]:
+        """Bloqueia até a primeira requisição e coleta as demais até o limite de tempo/tamanho"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _group_by_length(self, requests: List[_EmbeddingRequest]) -> List[List[_EmbeddingRequest]]:
+        """
+        Ordena por comprimento e divide em grupos cujo padding não excede max_padding_ratio
+        """
+        ordered = sorted(requests, key=lambda r: r.samples.shape[0])
+        groups: List[List[_EmbeddingRequest]] = []
+        current: List[_EmbeddingRequest] = []
+        total = 0
+        
+        for request in ordered:
+            length = request.samples.shape[0]
+            # Em ordem crescente, o novo áudio define o comprimento máximo do grupo
+            padded = length * (len(current) + 1)
+            if current and 1.0 - (total + length) / padded > self.max_padding_ratio:
+                groups.append(current)
+                current, total = [], 0
+            current.append(request)
+            total += length
+        
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _run_group(self, group: List[_EmbeddingRequest]) -> None:
+        batch, wav_lens = pad_batch([r.samples for r in group])
+        padding_ratio = 1.0 - float(wav_lens.mean())
+        
+        now = time.perf_counter()
+        for request in group:
+            BATCH_WAIT.observe(now - request.enqueued_at)
+        BATCH_SIZE.observe(len(group))
+        BATCH_PADDING.observe(padding_ratio)
+        
+        try:
+            embeddings = self._encode_fn(batch, wav_lens)
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        
+        for i, request in enumerate(group):
+            request.future.set_result(embeddings[i])
+    
+    def _worker(self) -> None:
+        while True:
+            requests = self._collect()
+            groups = self._group_by_length(requests)
+            if len(requests) > 1:
+                logger.debug(f"Micro-batch: {len(requests)} áudios em {len(groups)} grupo(s)")
+            for group in groups:
+                self._run_group(group)
@@ -0,0 +1,284 @@
+"""
+Métricas em memória (contadores, gauges e histogramas) no formato texto do Prometheus
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Contador monotônico, opcionalmente com labels"""
+    
+    type_name = "counter"
+    
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, value: float = 1.0, **labels: str) -> None:
+        """Incrementa a série identificada pelos labels"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+    
+    def value(self, **labels: str) -> float:
+        """Retorna o valor atual da série"""
+        return self._values.get(_label_key(labels), 0.0)
+    
+    def render(self) -> List[str]:
+        """Linhas de exposição de todas as séries"""
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Valor instantâneo que pode subir e descer"""
+    
+    type_name = "gauge"
+    
+    def set(self, value: float, **labels: str) -> None:
+        """Define o valor da série"""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+    
+    def dec(self, value: float = 1.0, **labels: str) -> None:
+        """Decrementa a série identificada pelos labels"""
+        self.inc(-value, **labels)
+
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem"""
+    
+    type_name = "histogram"
+    
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: str) -> None:
+        """Registra uma observação na série identificada pelos labels"""
+        key = _label_key(labels)
+        with self._lock:
+            # [contagem por bucket..., soma, contagem total]
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def snapshot(self, **labels: str) -> Tuple[float, float]:
+        """Retorna (soma, contagem) da série"""
+        series = self._series.get(_label_key(labels))
+        if series is None:
+            return 0.0, 0.0
+        return series[-2], series[-1]
+    
+    def render(self) -> List[str]:
+        """Linhas de exposição (buckets, soma e contagem) de todas as séries"""
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas do processo"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name: str, documentation: str) -> Counter:
+        """Registra (ou retorna o existente) um contador"""
+        return self._register(Counter(name, documentation))
+    
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        """Registra (ou retorna o existente) um gauge"""
+        return self._register(Gauge(name, documentation))
+    
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """Registra (ou retorna o existente) um histograma"""
+        return self._register(Histogram(name, documentation, buckets))
+    
+    def render(self) -> str:
+        """Renderiza todas as métricas no formato de exposição texto do Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# Estágios do pipeline de uma requisição (queue, decode, vad, asr, embedding, db, scoring)
+STAGE_DURATION = REGISTRY.histogram(
+    "voice_stage_duration_seconds",
+    "Duração de cada estágio do pipeline de voz"
+)
+STAGE_IN_FLIGHT = REGISTRY.gauge(
+    "voice_stage_in_flight",
+    "Execuções de cada estágio em andamento neste processo"
+)
+
+
+class StageTrace:
+    """
+    Estágios executados e atributos (ex.: duração do áudio) de uma requisição
+    
+    Serializável: os processos de inferência devolvem o trace junto com o resultado do job
+    """
+    
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, float] = {}
+    
+    def durations(self) -> Dict[str, float]:
+        """Duração total de cada estágio, na ordem da primeira execução"""
+        totals: Dict[str, float] = {}
+        for stage, elapsed in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + elapsed
+        return totals
+    
+    def merge(self, other: "StageTrace") -> None:
+        """Acrescenta os estágios e soma os atributos de outro trace"""
+        self.stages.extend(other.stages)
+        for key, value in other.attributes.items():
+            self.attributes[key] = self.attributes.get(key, 0.0) + value
+
+
+_current_stage: ContextVar[Optional[str]] = ContextVar("voice_current_stage", default=None)
+_stage_trace: ContextVar[Optional[StageTrace]] = ContextVar("voice_stage_trace", default=None)
+
+
+def record_stage(stage: str, elapsed: float) -> None:
+    """Registra a duração de um estágio no histograma e no trace da requisição, se houver"""
+    STAGE_DURATION.observe(elapsed, stage=stage)
+    trace = _stage_trace.get()
+    if trace is not None:
+        trace.stages.append((stage, elapsed))
+
+
+def annotate_request(key: str, value: float) -> None:
+    """Soma value ao atributo key do trace da requisição (sem trace, não faz nada)"""
+    trace = _stage_trace.get()
+    if trace is not None:
+        trace.attributes[key] = trace.attributes.get(key, 0.0) + value
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """
+    Mede a duração do bloco with como um estágio do pipeline
+    
+    Chamadas aninhadas do mesmo estágio (ex.: um método do repositório que chama
+    outro) são contadas uma única vez, pelo bloco mais externo
+    
+    Args:
+        stage: Nome do estágio (label stage das métricas)
+    """
+    if _current_stage.get() == stage:
+        yield
+        return
+    
+    token = _current_stage.set(stage)
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        record_stage(stage, time.perf_counter() - started)
+        _current_stage.reset(token)
+
+
+def timed_stage(stage: str) -> Callable:
+    """Decorador equivalente a envolver a função em track_stage(stage)"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTrace]:
+    """
+    Registra, além das métricas, os estágios executados no bloco with
+    
+    Usado por requisição (Server-Timing) e pelos processos de inferência, cujo
+    REGISTRY não é o exposto em /metrics: o job devolve o trace e o processo da API
+    o repassa a replay_stages. Tarefas submetidas a outras threads só entram no
+    trace se rodarem com o contexto copiado (contextvars.copy_context)
+    
+    Yields:
+        Trace preenchido durante o bloco
+    """
+    trace = StageTrace()
+    token = _stage_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _stage_trace.reset(token)
+
+
+def replay_stages(trace: StageTrace) -> None:
+    """Registra neste processo (e no trace atual) estágios medidos em outro processo"""
+    for stage, elapsed in trace.stages:
+        STAGE_DURATION.observe(elapsed, stage=stage)
+    current = _stage_trace.get()
+    if current is not None:
+        current.merge(trace)
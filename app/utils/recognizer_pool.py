@@ -0,0 +1,129 @@
+"""
+Pool de reconhecedores Vosk (KaldiRecognizer) reaproveitados entre requisições
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Tuple
+from app.utils.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from vosk import KaldiRecognizer
+
+logger = logging.getLogger(__name__)
+
+ACQUIRE_WAIT = REGISTRY.histogram(
+    "voice_asr_recognizer_acquire_seconds",
+    "Tempo para obter um KaldiRecognizer do pool (inclui a criação quando o pool ainda não está cheio)",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+RECOGNIZERS = REGISTRY.gauge(
+    "voice_asr_recognizers",
+    "KaldiRecognizers criados por pool"
+)
+RECOGNIZERS_IN_USE = REGISTRY.gauge(
+    "voice_asr_recognizers_in_use",
+    "KaldiRecognizers emprestados no momento"
+)
+
+
+class RecognizerPool:
+    """
+    Pool limitado de reconhecedores com a mesma configuração
+    
+    Os reconhecedores são criados sob demanda até max_size; acima disso, acquire
+    espera um ser devolvido. Na devolução o reconhecedor é reiniciado (Reset),
+    então a próxima requisição não paga a criação nem a configuração do decoder
+    """
+    
+    def __init__(self, name: str, factory: Callable[[], "KaldiRecognizer"], max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self._factory = factory
+        # LIFO: o reconhecedor usado mais recentemente tem mais chance de estar em cache
+        self._idle: "queue.LifoQueue[KaldiRecognizer]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> "KaldiRecognizer":
+        """Empresta um reconhecedor, criando-o se o pool ainda não estiver cheio"""
+        started = time.perf_counter()
+        try:
+            recognizer = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.max_size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    recognizer = self._factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                RECOGNIZERS.inc(pool=self.name)
+            else:
+                recognizer = self._idle.get()
+        
+        ACQUIRE_WAIT.observe(time.perf_counter() - started, pool=self.name)
+        RECOGNIZERS_IN_USE.inc(pool=self.name)
+        return recognizer
+    
+    def release(self, recognizer: "KaldiRecognizer") -> None:
+        """Reinicia o reconhecedor e o devolve ao pool"""
+        RECOGNIZERS_IN_USE.dec(pool=self.name)
+        try:
+            recognizer.Reset()
+        except Exception as e:
+            # Reconhecedor em estado inválido: descarta e libera a vaga
+            logger.warning(f"Descartando KaldiRecognizer do pool {self.name}: {e}")
+            with self._lock:
+                self._created -= 1
+            RECOGNIZERS.dec(pool=self.name)
+            return
+        self._idle.put(recognizer)
+    
+    @contextmanager
+    def lease(self) -> Iterator["KaldiRecognizer"]:
+        """Empresta um reconhecedor pelo tempo do bloco with"""
+        recognizer = self.acquire()
+        try:
+            yield recognizer
+        finally:
+            self.release(recognizer)
+
+
+_pools: Dict[Tuple, RecognizerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_recognizer_pool(
+    key: Tuple,
+    factory: Callable[[], "KaldiRecognizer"],
+    max_size: int
+) -> RecognizerPool:
+    """
+    Retorna o pool associado à configuração (cria na primeira chamada)
+    
+    Args:
+        key: Configuração dos reconhecedores (ex.: taxa de amostragem, palavras)
+        factory: Cria um reconhecedor já configurado
+        max_size: Número máximo de reconhecedores do pool
+    
+    Returns:
+        RecognizerPool da configuração
+    """
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            name = "-".join(str(part) for part in key)
+            pool = _pools[key] = RecognizerPool(name, factory, max_size)
+            logger.info(f"Pool de reconhecedores Vosk criado: {name} (máximo {max_size})")
+    return pool
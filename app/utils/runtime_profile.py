@@ -0,0 +1,110 @@
+"""
+Aplicação do perfil de execução em CPU (app.config.RuntimeProfile) no processo atual
+
+O torch só é importado quando o encoder é carregado (configure_torch); aplicar o
+perfil no startup não pode custar a importação do PyTorch
+"""
+import contextlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from app.config import RuntimeProfile, get_runtime_profile, get_settings
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ASR_SLOT_WAIT = REGISTRY.histogram(
+    "voice_asr_slot_wait_seconds",
+    "Tempo aguardando uma vaga de decodificação Vosk (asr_max_concurrency)",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+_profile: Optional[RuntimeProfile] = None
+_asr_slots: Optional[threading.BoundedSemaphore] = None
+_asr_slots_lock = threading.Lock()
+_torch_lock = threading.Lock()
+_interop_configured = False
+
+
+def configure_asr_concurrency(limit: int) -> None:
+    """Define quantas decodificações Vosk podem rodar ao mesmo tempo no processo"""
+    global _asr_slots
+    with _asr_slots_lock:
+        _asr_slots = threading.BoundedSemaphore(max(1, limit))
+
+
+def apply_runtime_profile(profile: Optional[RuntimeProfile] = None) -> RuntimeProfile:
+    """
+    Ajusta as threads do PyTorch e o limite de decodificações Vosk do processo
+    
+    Chamado no startup da API e na inicialização de cada processo de inferência
+    
+    Args:
+        profile: Perfil a aplicar (padrão: get_runtime_profile())
+    
+    Returns:
+        Perfil aplicado
+    """
+    global _profile
+    
+    profile = _profile = profile or get_runtime_profile()
+    configure_asr_concurrency(profile.asr_max_concurrency)
+    if "torch" in sys.modules:
+        configure_torch()
+    
+    logger.info(
+        f"Perfil de execução ({profile.source}): torch={profile.torch_num_threads} threads, "
+        f"inter-op={profile.torch_interop_threads}, Vosk simultâneos={profile.asr_max_concurrency}"
+    )
+    return profile
+
+
+def configure_torch() -> None:
+    """
+    Importa o torch e aplica as threads do perfil
+    
+    Chamado antes de carregar o encoder; as threads inter-op só podem ser definidas
+    uma vez por processo, antes do primeiro trabalho paralelo
+    """
+    global _interop_configured
+    
+    import torch
+    
+    profile = _profile or get_runtime_profile()
+    with _torch_lock:
+        torch.set_num_threads(profile.torch_num_threads)
+        if not _interop_configured:
+            try:
+                torch.set_num_interop_threads(profile.torch_interop_threads)
+            except RuntimeError as e:
+                logger.warning(f"⚠️  Não foi possível definir as threads inter-op do PyTorch: {e}")
+            _interop_configured = True
+
+
+@contextmanager
+def asr_slot() -> Iterator[None]:
+    """Reserva uma vaga de decodificação Vosk pelo tempo do bloco with"""
+    slots = _asr_slots
+    if slots is None:
+        configure_asr_concurrency(get_runtime_profile().asr_max_concurrency)
+        slots = _asr_slots
+    
+    started = time.perf_counter()
+    slots.acquire()
+    ASR_SLOT_WAIT.observe(time.perf_counter() - started)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def inference_context():
+    """torch.inference_mode() se torch_inference_mode estiver ativo"""
+    if get_settings().torch_inference_mode:
+        import torch
+        
+        return torch.inference_mode()
+    return contextlib.nullcontext()
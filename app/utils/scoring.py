@@ -0,0 +1,68 @@
+"""
+Núcleo vetorizado de pontuação entre embeddings (similaridade de cosseno)
+
+Todas as funções de pontuação assumem vetores float32 já normalizados (norma
+unitária), de modo que a similaridade de cosseno se reduz a um produto escalar
+"""
+from typing import Union
+import numpy as np
+
+ArrayLike = Union[list, np.ndarray]
+
+
+def l2_normalize(vectors: ArrayLike) -> np.ndarray:
+    """
+    Normaliza um vetor (1D) ou cada linha de uma matriz (2D) para norma unitária
+    
+    Args:
+        vectors: Vetor [D] ou matriz [N, D]
+        
+    Returns:
+        Array float32 normalizado (vetores nulos permanecem nulos)
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    np.maximum(norms, np.finfo(np.float32).tiny, out=norms)
+    return array / norms
+
+
+def score_one(query: np.ndarray, reference: np.ndarray) -> float:
+    """
+    Similaridade entre dois embeddings normalizados (1:1)
+    
+    Args:
+        query: Embedding normalizado [D]
+        reference: Embedding normalizado [D]
+        
+    Returns:
+        Similaridade de cosseno (entre -1 e 1)
+    """
+    return float(np.dot(query, reference))
+
+
+def score_one_to_many(query: np.ndarray, references: np.ndarray) -> np.ndarray:
+    """
+    Similaridade de um embedding contra vários (1:N)
+    
+    Args:
+        query: Embedding normalizado [D]
+        references: Matriz de embeddings normalizados [N, D]
+        
+    Returns:
+        Similaridades [N]
+    """
+    return references @ query
+
+
+def score_many_to_many(queries: np.ndarray, references: np.ndarray) -> np.ndarray:
+    """
+    Matriz de similaridades entre dois conjuntos de embeddings (M:N)
+    
+    Args:
+        queries: Matriz de embeddings normalizados [M, D]
+        references: Matriz de embeddings normalizados [N, D]
+        
+    Returns:
+        Similaridades [M, N]
+    """
+    return queries @ references.T
@@ -1,14 +1,16 @@
 """
 Utilidades para cálculo de similaridade entre embeddings
 """
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from app.utils.scoring import ArrayLike, l2_normalize, score_one
 
 
-def calculate_cosine_similarity(embedding1: list, embedding2: list) -> float:
+def calculate_cosine_similarity(embedding1: ArrayLike, embedding2: ArrayLike) -> float:
     """
     Calcula a similaridade de cosseno entre dois embeddings
     
+    Aceita embeddings não normalizados; para o caminho rápido com vetores
+    já normalizados use app.utils.scoring.score_one
+    
     Args:
         embedding1: Primeiro vetor de embedding
         embedding2: Segundo vetor de embedding
@@ -16,12 +18,7 @@ def calculate_cosine_similarity(embedding1: list, embedding2: list) -> float:
     Returns:
         Similaridade de cosseno (valor entre -1 e 1)
     """
-    emb1 = np.array(embedding1).reshape(1, -1)
-    emb2 = np.array(embedding2).reshape(1, -1)
-    
-    similarity = cosine_similarity(emb1, emb2)[0][0]
-    
-    return float(similarity)
+    return score_one(l2_normalize(embedding1), l2_normalize(embedding2))
 
 
 def normalize_embedding(embedding: list) -> list:
@@ -34,10 +31,4 @@ def normalize_embedding(embedding: list) -> list:
     Returns:
         Embedding normalizado
     """
-    emb = np.array(embedding)
-    norm = np.linalg.norm(emb)
-    
-    if norm > 0:
-        emb = emb / norm
-    
-    return emb.tolist()
+    return l2_normalize(embedding).tolist()
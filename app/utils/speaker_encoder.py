@@ -0,0 +1,193 @@
+"""
+Backends do encoder de locutor (SpeechBrain) para inferência em CPU
+
+Todos os backends mantêm o frontend do SpeechBrain (Fbank e normalização) no
+PyTorch e trocam apenas a execução do embedding_model. A interface é a mesma do
+EncoderClassifier: encode_batch(wavs, wav_lens) retorna um tensor [B, 1, D]
+"""
+import logging
+import os
+from typing import Callable, Optional, Tuple, Union
+import torch
+from speechbrain.inference.speaker import EncoderClassifier
+
+logger = logging.getLogger(__name__)
+
+ENCODER_BACKENDS = ("eager", "int8", "torchscript", "onnx")
+
+# Camadas suportadas pela quantização dinâmica do PyTorch
+_DYNAMIC_QUANT_LAYERS = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+
+
+def _frontend(
+    classifier: EncoderClassifier,
+    wavs: torch.Tensor,
+    wav_lens: Optional[torch.Tensor] = None
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Fbank normalizado, exatamente como em EncoderClassifier.encode_batch"""
+    if wavs.dim() == 1:
+        wavs = wavs.unsqueeze(0)
+    if wav_lens is None:
+        wav_lens = torch.ones(wavs.shape[0])
+    wav_lens = wav_lens.float()
+    
+    feats = classifier.mods.compute_features(wavs.float())
+    feats = classifier.mods.mean_var_norm(feats, wav_lens)
+    return feats, wav_lens
+
+
+class SpeakerEncoder:
+    """
+    Frontend do EncoderClassifier seguido do embedding_model executado pelo backend
+    """
+    
+    def __init__(
+        self,
+        classifier: EncoderClassifier,
+        backend: str,
+        run_embedding: Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+    ):
+        self.classifier = classifier
+        self.backend = backend
+        self._run_embedding = run_embedding
+    
+    def encode_batch(self, wavs: torch.Tensor, wav_lens: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Extrai os embeddings de um batch de áudios
+        
+        Args:
+            wavs: Áudios float32 [B, T] (ou [T])
+            wav_lens: Comprimentos relativos [B] (None = sem padding)
+        
+        Returns:
+            Embeddings [B, 1, D]
+        """
+        with torch.inference_mode():
+            feats, wav_lens = _frontend(self.classifier, wavs, wav_lens)
+            return self._run_embedding(feats, wav_lens)
+
+
+def _example_inputs(classifier: EncoderClassifier) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Batch 2 com padding: evita que o trace fixe o tamanho do batch ou os comprimentos
+    wavs = torch.randn(2, 3 * 16000) * 0.1
+    with torch.inference_mode():
+        feats, wav_lens = _frontend(classifier, wavs, torch.tensor([1.0, 0.8]))
+    return feats.clone(), wav_lens.clone()
+
+
+def _save_atomic(path: str, save: Callable[[str], None]) -> None:
+    """Grava em arquivo temporário e renomeia (processos de inferência podem exportar juntos)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _int8_backend(classifier: EncoderClassifier) -> Callable:
+    """
+    Raises:
+        ValueError: Se nenhuma camada for quantizada (o backend seria o eager com outro nome)
+    """
+    embedding_model = classifier.mods.embedding_model.eval()
+    quantized = torch.ao.quantization.quantize_dynamic(embedding_model, _DYNAMIC_QUANT_LAYERS, dtype=torch.qint8)
+    
+    layers = sum(1 for module in quantized.modules() if type(module).__module__.startswith("torch.ao.nn.quantized"))
+    if layers == 0:
+        raise ValueError(
+            "nenhuma camada quantizada: o modelo não tem Linear/LSTM/GRU "
+            "(o ECAPA-TDNN usa apenas Conv1d)"
+        )
+    
+    logger.info(f"Encoder int8: {layers} camadas quantizadas dinamicamente")
+    return lambda feats, wav_lens: quantized(feats, wav_lens)
+
+
+def _torchscript_backend(classifier: EncoderClassifier, export_dir: str) -> Callable:
+    path = os.path.join(export_dir, "embedding_model.ts")
+    
+    if os.path.exists(path):
+        module = torch.jit.load(path, map_location="cpu")
+    else:
+        logger.info(f"Exportando embedding_model para TorchScript: {path}")
+        embedding_model = classifier.mods.embedding_model.eval()
+        with torch.no_grad():
+            traced = torch.jit.trace(embedding_model, _example_inputs(classifier), check_trace=False)
+        module = torch.jit.freeze(traced)
+        _save_atomic(path, lambda tmp_path: torch.jit.save(module, tmp_path))
+    
+    return lambda feats, wav_lens: module(feats, wav_lens)
+
+
+def _onnx_backend(classifier: EncoderClassifier, export_dir: str) -> Callable:
+    import onnxruntime
+    
+    path = os.path.join(export_dir, "embedding_model.onnx")
+    
+    if not os.path.exists(path):
+        logger.info(f"Exportando embedding_model para ONNX: {path}")
+        embedding_model = classifier.mods.embedding_model.eval()
+        
+        def export(tmp_path: str) -> None:
+            with torch.no_grad():
+                torch.onnx.export(
+                    embedding_model,
+                    _example_inputs(classifier),
+                    tmp_path,
+                    input_names=["feats", "wav_lens"],
+                    output_names=["embeddings"],
+                    dynamic_axes={
+                        "feats": {0: "batch", 1: "frames"},
+                        "wav_lens": {0: "batch"},
+                        "embeddings": {0: "batch"}
+                    },
+                    opset_version=17
+                )
+        
+        _save_atomic(path, export)
+    
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    
+    def run(feats: torch.Tensor, wav_lens: torch.Tensor) -> torch.Tensor:
+        outputs = session.run(None, {"feats": feats.numpy(), "wav_lens": wav_lens.numpy()})
+        return torch.from_numpy(outputs[0])
+    
+    return run
+
+
+def load_speaker_encoder(
+    classifier: EncoderClassifier,
+    backend: str,
+    export_dir: str
+) -> Union[EncoderClassifier, SpeakerEncoder]:
+    """
+    Prepara o encoder no backend escolhido
+    
+    Args:
+        classifier: EncoderClassifier carregado (float32)
+        backend: "eager", "int8", "torchscript" ou "onnx"
+        export_dir: Diretório dos modelos exportados (TorchScript/ONNX), reaproveitados entre execuções
+    
+    Returns:
+        O próprio EncoderClassifier (eager) ou um SpeakerEncoder com a mesma interface
+    
+    Raises:
+        ValueError: Se o backend não existir ou não se aplicar ao modelo (int8 sem
+            camadas quantizáveis); get_speechbrain_model volta para o eager
+    """
+    if backend == "eager":
+        return classifier
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Backend de encoder desconhecido: {backend} (opções: {', '.join(ENCODER_BACKENDS)})")
+    
+    os.makedirs(export_dir, exist_ok=True)
+    if backend == "int8":
+        run_embedding = _int8_backend(classifier)
+    elif backend == "torchscript":
+        run_embedding = _torchscript_backend(classifier, export_dir)
+    else:
+        run_embedding = _onnx_backend(classifier, export_dir)
+    
+    logger.info(f"Encoder de locutor no backend {backend}")
+    return SpeakerEncoder(classifier, backend, run_embedding)
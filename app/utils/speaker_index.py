@@ -0,0 +1,335 @@
+"""
+Índices vetoriais em memória para identificação de locutor (1:N)
+
+Os embeddings armazenados devem estar normalizados (ver app/utils/scoring.py):
+a pontuação é um produto escalar calculado com matmul
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.utils.scoring import score_one_to_many
+
+Candidate = Tuple[str, float]
+
+
+def _top_k(ids: List[str], scores: np.ndarray, k: int) -> List[Candidate]:
+    """Seleciona os k maiores scores sem ordenar o vetor inteiro"""
+    if scores.shape[0] == 0:
+        return []
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(ids[i], float(scores[i])) for i in top]
+
+
+class _VectorStore:
+    """
+    Matriz float32 com crescimento amortizado e remoção O(1) (troca com a última linha)
+    
+    Se dim não for informado, a matriz é alocada no primeiro upsert
+    """
+    
+    def __init__(self, dim: Optional[int], capacity: int = 1024):
+        self.dim = dim
+        self.capacity = capacity
+        self.matrix = np.empty((capacity, dim), dtype=np.float32) if dim else None
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def upsert(self, user_id: str, embedding: np.ndarray) -> None:
+        if self.matrix is None:
+            self.dim = embedding.shape[0]
+            self.matrix = np.empty((self.capacity, self.dim), dtype=np.float32)
+        
+        row = self.rows.get(user_id)
+        if row is None:
+            row = len(self.ids)
+            if row == self.matrix.shape[0]:
+                grown = np.empty((row * 2, self.dim), dtype=np.float32)
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+            self.ids.append(user_id)
+            self.rows[user_id] = row
+        self.matrix[row] = embedding
+    
+    def remove(self, user_id: str) -> bool:
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+        return True
+    
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self.matrix is None:
+            return np.empty(0, dtype=np.float32)
+        return score_one_to_many(query, self.matrix[:len(self.ids)])
+
+
+class BruteForceIndex:
+    """
+    Índice exato: compara a consulta com todos os embeddings em um único matmul
+    
+    Indicado para populações pequenas e médias (até dezenas de milhares)
+    """
+    
+    kind = "exact"
+    
+    def __init__(self, dim: Optional[int] = None):
+        self._store = _VectorStore(dim)
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+    
+    def __len__(self) -> int:
+        return len(self._store)
+    
+    def add(self, user_id: str, embedding: np.ndarray) -> None:
+        """Insere ou atualiza o embedding (normalizado) de um usuário"""
+        with self._lock:
+            self._store.upsert(user_id, embedding)
+    
+    def remove(self, user_id: str) -> bool:
+        """Remove um usuário do índice"""
+        with self._lock:
+            return self._store.remove(user_id)
+    
+    def search(self, query: np.ndarray, k: int) -> List[Candidate]:
+        """
+        Retorna os k usuários mais similares à consulta
+        
+        Args:
+            query: Embedding normalizado [D]
+            k: Número de candidatos
+        
+        Returns:
+            Lista de (user_id, similaridade) em ordem decrescente
+        """
+        with self._lock:
+            return _top_k(self._store.ids, self._store.scores(query), k)
+
+
+class IVFIndex:
+    """
+    Índice aproximado IVF (inverted file) com k-means esférico
+    
+    Os embeddings são distribuídos em nlist listas pelo centróide mais próximo;
+    a busca examina apenas as nprobe listas mais próximas da consulta
+    """
+    
+    kind = "ivf"
+    
+    def __init__(self, centroids: np.ndarray, nprobe: int):
+        self.centroids = centroids
+        self.nprobe = min(nprobe, centroids.shape[0])
+        dim = centroids.shape[1]
+        self._lists = [_VectorStore(dim, capacity=64) for _ in range(centroids.shape[0])]
+        self._assignment: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+    
+    @classmethod
+    def train(
+        cls,
+        matrix: np.ndarray,
+        nlist: int,
+        nprobe: int,
+        iterations: int = 10,
+        sample_size: int = 0,
+        seed: int = 0
+    ) -> "IVFIndex":
+        """
+        Treina os centróides com k-means esférico sobre uma amostra dos embeddings
+        
+        Args:
+            matrix: Embeddings normalizados [N, D]
+            nlist: Número de listas (centróides)
+            nprobe: Listas examinadas por consulta
+            iterations: Iterações do k-means
+            sample_size: Máximo de embeddings usados no treino (0 = 32 por lista)
+            seed: Semente do gerador aleatório
+        """
+        rng = np.random.default_rng(seed)
+        n = matrix.shape[0]
+        nlist = max(1, min(nlist, n))
+        sample_size = sample_size or 32 * nlist
+        sample = matrix[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            # Centróides vazios são reposicionados em pontos aleatórios da amostra
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+        
+        return cls(centroids.astype(np.float32), nprobe)
+    
+    def __len__(self) -> int:
+        return len(self._assignment)
+    
+    def add(self, user_id: str, embedding: np.ndarray) -> None:
+        """Insere ou atualiza o embedding (normalizado) de um usuário"""
+        target = int(np.argmax(self.centroids @ embedding))
+        with self._lock:
+            current = self._assignment.get(user_id)
+            if current is not None and current != target:
+                self._lists[current].remove(user_id)
+            self._lists[target].upsert(user_id, embedding)
+            self._assignment[user_id] = target
+    
+    def add_batch(self, ids: List[str], matrix: np.ndarray) -> None:
+        """Insere vários embeddings atribuindo as listas com um único matmul"""
+        targets = np.argmax(matrix @ self.centroids.T, axis=1)
+        with self._lock:
+            for user_id, embedding, target in zip(ids, matrix, targets):
+                current = self._assignment.get(user_id)
+                if current is not None and current != target:
+                    self._lists[current].remove(user_id)
+                self._lists[int(target)].upsert(user_id, embedding)
+                self._assignment[user_id] = int(target)
+    
+    def remove(self, user_id: str) -> bool:
+        """Remove um usuário do índice"""
+        with self._lock:
+            current = self._assignment.pop(user_id, None)
+            if current is None:
+                return False
+            return self._lists[current].remove(user_id)
+    
+    def search(self, query: np.ndarray, k: int) -> List[Candidate]:
+        """
+        Retorna os k usuários (aproximadamente) mais similares à consulta
+        
+        Args:
+            query: Embedding normalizado [D]
+            k: Número de candidatos
+        
+        Returns:
+            Lista de (user_id, similaridade) em ordem decrescente
+        """
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, self.nprobe - 1)[:self.nprobe]
+        
+        ids: List[str] = []
+        scores: List[np.ndarray] = []
+        with self._lock:
+            for probe in probes:
+                store = self._lists[int(probe)]
+                if len(store):
+                    ids.extend(store.ids)
+                    scores.append(store.scores(query))
+        
+        if not scores:
+            return []
+        return _top_k(ids, np.concatenate(scores), k)
+
+
+def build_index(
+    items: Iterable[Tuple[str, np.ndarray]],
+    ivf_threshold: int,
+    nlist: int = 0,
+    nprobe: int = 8
+):
+    """
+    Constrói o índice adequado ao tamanho da população
+    
+    Args:
+        items: Pares (user_id, embedding normalizado)
+        ivf_threshold: A partir deste número de perfis usa IVF em vez do índice exato
+        nlist: Listas do IVF (0 = automático, ~4*sqrt(N))
+        nprobe: Listas examinadas por consulta no IVF
+    
+    Returns:
+        BruteForceIndex ou IVFIndex
+    """
+    exact = BruteForceIndex()
+    for user_id, embedding in items:
+        exact.add(user_id, embedding)
+    
+    if len(exact) < ivf_threshold:
+        return exact
+    
+    store = exact._store
+    matrix = store.matrix[:len(store)]
+    nlist = nlist or int(4 * np.sqrt(len(store)))
+    index = IVFIndex.train(matrix, nlist=nlist, nprobe=nprobe)
+    index.add_batch(store.ids, matrix)
+    return index
+
+
+_speaker_index = None
+_speaker_index_lock = threading.Lock()
+# Escritas feitas durante uma reconstrução, reaplicadas no índice novo antes de
+# publicá-lo (None quando nenhuma reconstrução está em andamento)
+_pending_writes: Optional[List[Tuple[str, Optional[np.ndarray]]]] = None
+
+
+def get_speaker_index():
+    """Retorna o índice do processo ou None se ainda não foi construído"""
+    return _speaker_index
+
+
+def begin_index_build() -> None:
+    """
+    Passa a registrar as escritas de perfis para o índice que vai ser construído
+    
+    Chamar antes de ler os perfis do banco: uma escrita que a leitura não viu é
+    reaplicada por set_speaker_index
+    """
+    global _pending_writes
+    
+    with _speaker_index_lock:
+        _pending_writes = []
+
+
+def discard_index_build() -> None:
+    """Descarta as escritas registradas após uma reconstrução que falhou"""
+    global _pending_writes
+    
+    with _speaker_index_lock:
+        _pending_writes = None
+
+
+def apply_profile_change(user_id: str, embedding: Optional[np.ndarray]) -> None:
+    """
+    Aplica uma escrita de perfil ao índice publicado e a registra se houver
+    reconstrução em andamento
+    
+    Args:
+        user_id: ID do usuário alterado
+        embedding: Novo embedding normalizado, ou None se o perfil foi removido
+    """
+    with _speaker_index_lock:
+        if _speaker_index is not None:
+            _apply(_speaker_index, user_id, embedding)
+        if _pending_writes is not None:
+            _pending_writes.append((user_id, embedding))
+
+
+def _apply(index, user_id: str, embedding: Optional[np.ndarray]) -> None:
+    if embedding is None:
+        index.remove(user_id)
+    else:
+        index.add(user_id, embedding)
+
+
+def set_speaker_index(index) -> None:
+    """Publica um índice recém-construído, reaplicando as escritas feitas durante a construção"""
+    global _speaker_index, _pending_writes
+    
+    with _speaker_index_lock:
+        for user_id, embedding in _pending_writes or ():
+            _apply(index, user_id, embedding)
+        _pending_writes = None
+        _speaker_index = index
@@ -9,11 +9,20 @@ USE auth_voice_db;
 CREATE TABLE IF NOT EXISTS user_voice_profile (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id VARCHAR(255) NOT NULL UNIQUE,
-    embedding JSON NOT NULL,
+    embedding JSON NULL,              -- formato legado (lista JSON), vazio após a migração
+    embedding_blob BLOB NULL,         -- formato binário: cabeçalho + float32/float16 (embedding_codec.py)
+    embedding_sum BLOB NULL,          -- soma dos embeddings normalizados das amostras (float32)
+    sample_count INT NOT NULL DEFAULT 0,  -- número de amostras somadas em embedding_sum
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_user_id (user_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Migração de bancos existentes (executada por scripts/migrate_embeddings.py):
+-- ALTER TABLE user_voice_profile ADD COLUMN embedding_blob BLOB NULL AFTER embedding;
+-- ALTER TABLE user_voice_profile MODIFY embedding JSON NULL;
+-- ALTER TABLE user_voice_profile ADD COLUMN embedding_sum BLOB NULL AFTER embedding_blob;
+-- ALTER TABLE user_voice_profile ADD COLUMN sample_count INT NOT NULL DEFAULT 0 AFTER embedding_sum;
+
 -- Exemplo de consulta para ver perfis
--- SELECT id, user_id, JSON_LENGTH(embedding) as embedding_dimension, created_at FROM user_voice_profile;
+-- SELECT id, user_id, LENGTH(embedding_blob) as embedding_bytes, sample_count, created_at FROM user_voice_profile;
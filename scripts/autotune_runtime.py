@@ -0,0 +1,165 @@
+"""
+Autoajuste do perfil de execução em CPU (RUNTIME_PROFILE_PATH)
+
+Mede, nesta máquina, a vazão do pipeline de uma requisição (Vosk e SpeechBrain em
+paralelo) sob a carga concorrente de um worker da API, para combinações de threads
+do PyTorch e de decodificações Vosk simultâneas. O processo fica restrito à fatia
+de núcleos de um worker (núcleos / WEB_CONCURRENCY) e o melhor perfil é gravado
+em JSON, carregado pela API quando o número de núcleos e de workers coincide.
+
+Uso (a partir da raiz do projeto):
+    python scripts/autotune_runtime.py --audio test_audio.wav
+    python scripts/autotune_runtime.py --audio test_audio.wav --web-concurrency 2 --seconds 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import RuntimeProfile, available_cores, get_settings
+from app.utils.audio_processing import (
+    decode_audio,
+    extract_voice_embedding,
+    preload_models,
+    transcribe_audio
+)
+from app.utils.runtime_profile import apply_runtime_profile, configure_asr_concurrency
+
+# Perfis com vazão até 3% abaixo da melhor são desempatados pela latência p95
+THROUGHPUT_TOLERANCE = 0.03
+
+
+def candidates(limit: int) -> list:
+    """Potências de 2 até limit, incluindo o próprio limit"""
+    values = {limit}
+    value = 1
+    while value < limit:
+        values.add(value)
+        value *= 2
+    return sorted(values)
+
+
+def measure(audio, settings, concurrency: int, seconds: float) -> dict:
+    """Carga fechada: concurrency clientes repetem a requisição até o fim do tempo"""
+    stage_pool = ThreadPoolExecutor(max_workers=concurrency)
+    latencies = []
+    lock = threading.Lock()
+    
+    def request() -> None:
+        embedding = stage_pool.submit(extract_voice_embedding, audio, settings.speechbrain_model)
+        transcribe_audio(audio, settings.vosk_model_path)
+        embedding.result()
+    
+    def client(deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            request()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+    
+    # Aquecimento com a configuração atual
+    request()
+    
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(started + seconds,)) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stage_pool.shutdown()
+    
+    return {
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000
+    }
+
+
+def main():
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(description="Autoajuste de threads do PyTorch e concorrência do Vosk")
+    parser.add_argument("--audio", default="test_audio.wav", help="Áudio representativo de uma requisição")
+    parser.add_argument("--web-concurrency", type=int, default=settings.web_concurrency,
+                        help="Workers da API na máquina")
+    parser.add_argument("--concurrency", type=int, default=settings.inference_max_workers,
+                        help="Requisições simultâneas por worker")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duração de cada medição")
+    parser.add_argument("--output", default=settings.runtime_profile_path)
+    args = parser.parse_args()
+    
+    import torch
+    
+    cores = available_cores()
+    cores_per_worker = max(1, cores // args.web_concurrency)
+    if hasattr(os, "sched_setaffinity"):
+        # Simula a fatia de um worker: os demais núcleos pertencem aos outros workers
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:cores_per_worker])
+    
+    # Inter-op só pode ser definido uma vez por processo; o pipeline não usa paralelismo inter-op
+    apply_runtime_profile(RuntimeProfile(1, 1, 1, "autotune"))
+    
+    with open(args.audio, 'rb') as f:
+        audio = decode_audio(f.read())
+    if audio is None:
+        print(f"❌ Não foi possível decodificar {args.audio}")
+        sys.exit(1)
+    
+    print("=" * 70)
+    print(f"🔧 AUTOAJUSTE: {cores} núcleos, {args.web_concurrency} workers -> {cores_per_worker} por worker")
+    print(f"   {args.concurrency} requisições simultâneas, {args.seconds:.0f}s por combinação")
+    print("=" * 70)
+    
+    preload_models(settings.vosk_model_path, settings.speechbrain_model)
+    
+    results = []
+    print(f"\n{'torch':>6} {'Vosk':>5} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for torch_threads in candidates(cores_per_worker):
+        for asr_concurrency in candidates(min(cores_per_worker, args.concurrency)):
+            torch.set_num_threads(torch_threads)
+            configure_asr_concurrency(asr_concurrency)
+            stats = measure(audio, settings, args.concurrency, args.seconds)
+            stats.update(torch_num_threads=torch_threads, asr_max_concurrency=asr_concurrency)
+            results.append(stats)
+            print(f"{torch_threads:>6} {asr_concurrency:>5} {stats['throughput_rps']:>8.2f} "
+                  f"{stats['p50_ms']:>9.0f} {stats['p95_ms']:>9.0f}")
+    
+    best_throughput = max(r["throughput_rps"] for r in results)
+    best = min(
+        (r for r in results if r["throughput_rps"] >= best_throughput * (1 - THROUGHPUT_TOLERANCE)),
+        key=lambda r: r["p95_ms"]
+    )
+    
+    profile = {
+        "cores": cores,
+        "web_concurrency": args.web_concurrency,
+        "torch_num_threads": best["torch_num_threads"],
+        "torch_interop_threads": 1,
+        "asr_max_concurrency": best["asr_max_concurrency"],
+        "throughput_rps": best["throughput_rps"],
+        "p95_ms": best["p95_ms"],
+        "concurrency": args.concurrency,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    
+    print(f"\n✅ Melhor perfil: torch={best['torch_num_threads']} threads, "
+          f"Vosk simultâneos={best['asr_max_concurrency']} "
+          f"({best['throughput_rps']:.2f} req/s, p95 {best['p95_ms']:.0f} ms)")
+    print(f"💾 Gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
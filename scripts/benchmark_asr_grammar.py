@@ -0,0 +1,133 @@
+"""
+Benchmark da decodificação Vosk com e sem gramática (ASR_GRAMMAR_MODE)
+
+Transcreve o mesmo áudio com o modelo de linguagem completo, com o vocabulário
+de todas as frases de desafio e apenas com a frase esperada, comparando latência,
+fator de tempo real (RTF), transcrição e o resultado de validate_transcription.
+
+Requer um modelo Vosk com suporte a gramática (os modelos "small" suportam;
+nos modelos grandes, com grafo estático, a gramática é ignorada).
+
+Com --cross-phrases não transcreve áudio: simula a decodificação ideal de cada
+frase de desafio com a gramática de cada outra (palavra fora da gramática vira
+[unk]) e conta quantos pares cruzados passam em validate_transcription.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_asr_grammar.py --audio test_audio.wav --phrase "Meu código de acesso é azul"
+    python scripts/benchmark_asr_grammar.py --audio test_audio.wav --phrase "..." --phrases-file phrases.txt --repeat 10
+    python scripts/benchmark_asr_grammar.py --cross-phrases --phrases-file phrases.txt
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import get_settings
+from app.services.voice_service import CHALLENGE_PHRASES
+from app.utils.audio_processing import (
+    GRAMMAR_UNKNOWN,
+    build_grammar,
+    decode_audio,
+    transcribe_audio,
+    validate_transcription
+)
+
+
+def load_phrases(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_mode(label: str, audio, model_path: str, grammar, phrase: str, repeat: int) -> None:
+    # Primeira chamada cria o reconhecedor (e compila a gramática); fica fora da medição
+    start = time.perf_counter()
+    transcription = transcribe_audio(audio, model_path, grammar)
+    first = time.perf_counter() - start
+    
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transcription = transcribe_audio(audio, model_path, grammar)
+        times.append(time.perf_counter() - start)
+    
+    mean = statistics.mean(times)
+    valid = bool(transcription) and validate_transcription(transcription, phrase)
+    print(f"\n▶ {label}")
+    print(f"   Primeira chamada:  {first * 1000:8.1f} ms")
+    print(f"   Média / p50:       {mean * 1000:8.1f} ms / {statistics.median(times) * 1000:.1f} ms")
+    print(f"   RTF:               {mean / audio.duration:8.3f}")
+    print(f"   Transcrição:       {transcription!r}")
+    print(f"   Frase validada:    {'✅' if valid else '❌'}")
+
+
+def ideal_decode(spoken: str, grammar) -> str:
+    """Transcrição de um decodificador perfeito restrito à gramática"""
+    allowed = set(grammar)
+    return " ".join(word if word in allowed else GRAMMAR_UNKNOWN for word in spoken.lower().split())
+
+
+def run_cross_phrases(phrases: list) -> None:
+    vocabulary = build_grammar(phrases)
+    pairs = [(spoken, expected) for expected in phrases for spoken in phrases if spoken != expected]
+    
+    print("=" * 70)
+    print(f"📊 FRASES CRUZADAS ({len(phrases)} frases, {len(pairs)} pares frase dita / frase esperada)")
+    print("=" * 70)
+    for label, grammar_for in (
+        ("Sem gramática / vocabulário (vocabulary)", lambda expected: vocabulary),
+        ("Somente a frase esperada (phrase)", lambda expected: build_grammar([expected]))
+    ):
+        own = sum(validate_transcription(ideal_decode(p, grammar_for(p)), p) for p in phrases)
+        crossed = sum(
+            validate_transcription(ideal_decode(spoken, grammar_for(expected)), expected)
+            for spoken, expected in pairs
+        )
+        print(f"\n▶ {label}")
+        print(f"   Frase correta aceita:   {own}/{len(phrases)}")
+        print(f"   Outra frase aceita:     {crossed}/{len(pairs)}")
+
+
+def main():
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(description="Benchmark do Vosk com gramática restrita")
+    parser.add_argument("--audio", default="test_audio.wav", help="Arquivo de áudio com a frase pronunciada")
+    parser.add_argument("--phrase", help="Frase esperada")
+    parser.add_argument("--phrases-file", help="Frases de desafio (padrão: frases embutidas)")
+    parser.add_argument("--model", default=settings.vosk_model_path, help="Caminho do modelo Vosk")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cross-phrases", action="store_true",
+                        help="Conta pares de frases cruzadas aceitos, sem áudio nem modelo")
+    args = parser.parse_args()
+    
+    phrases = load_phrases(args.phrases_file) if args.phrases_file else list(CHALLENGE_PHRASES)
+    if args.cross_phrases:
+        run_cross_phrases(phrases)
+        return
+    if not args.phrase:
+        parser.error("--phrase é obrigatório sem --cross-phrases")
+    if args.phrase not in phrases:
+        phrases.append(args.phrase)
+    
+    with open(args.audio, 'rb') as f:
+        audio = decode_audio(f.read())
+    if audio is None:
+        print(f"❌ Não foi possível decodificar {args.audio}")
+        sys.exit(1)
+    
+    vocabulary = build_grammar(phrases)
+    print("=" * 70)
+    print(f"📊 BENCHMARK VOSK COM GRAMÁTICA ({audio.duration:.2f}s de áudio, {args.repeat} repetições)")
+    print(f"   Vocabulário: {len(vocabulary) - 1} palavras de {len(phrases)} frases")
+    print("=" * 70)
+    
+    run_mode("Sem gramática (modelo de linguagem completo)", audio, args.model, None, args.phrase, args.repeat)
+    run_mode("Vocabulário das frases (vocabulary)", audio, args.model, vocabulary, args.phrase, args.repeat)
+    run_mode("Somente a frase esperada (phrase)", audio, args.model, build_grammar([args.phrase]), args.phrase, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Paridade e desempenho dos backends do encoder de locutor (ENCODER_BACKEND)
+
+Cada backend roda em um subprocesso próprio, para que a memória seja medida
+isoladamente: carrega o modelo, extrai os embeddings do corpus e mede a latência
+por áudio. Os embeddings são comparados com os do backend eager (desvio =
+1 - similaridade de cosseno) e o script indica o backend mais rápido cujo desvio
+máximo fica dentro da tolerância.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_encoder.py --corpus ./amostras
+    python scripts/benchmark_encoder.py --corpus ./amostras --backends eager onnx --tolerance 0.005
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import get_settings
+from app.utils.speaker_encoder import ENCODER_BACKENDS
+
+AUDIO_EXTENSIONS = {".wav", ".m4a", ".mp3", ".ogg", ".flac", ".webm", ".3gp", ".aac"}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo (None se indisponível, ex.: Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_corpus(corpus: Optional[str]) -> List[np.ndarray]:
+    """Áudios float32 mono 16kHz do diretório, ou sinais sintéticos se nenhum for informado"""
+    if not corpus:
+        # Vozes sintéticas (harmônicos com pitch variável): servem para latência,
+        # mas o desvio de similaridade só é representativo com fala real
+        rng = np.random.default_rng(0)
+        samples = []
+        for i in range(20):
+            seconds = 2.0 + (i % 5)
+            t = np.arange(int(seconds * 16000)) / 16000
+            pitch = 100 + 120 * rng.random() + 20 * np.sin(2 * np.pi * 0.5 * t)
+            phase = 2 * np.pi * np.cumsum(pitch) / 16000
+            signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+            signal += 0.02 * rng.standard_normal(t.size)
+            samples.append((0.3 * signal / np.abs(signal).max()).astype(np.float32))
+        return samples
+    
+    from app.utils.audio_processing import decode_audio
+    
+    samples = []
+    for path in sorted(Path(corpus).iterdir()):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        audio = decode_audio(path.read_bytes())
+        if audio is not None:
+            samples.append(audio.samples())
+    return samples
+
+
+def run_worker(args) -> None:
+    """Executa um único backend e imprime as estatísticas (JSON) na última linha"""
+    import torch
+    from app.utils.audio_processing import encoder_export_dir, load_speechbrain_classifier
+    from app.utils.speaker_encoder import load_speaker_encoder
+    
+    samples = load_corpus(args.corpus)
+    rss_before = peak_rss_mb()
+    
+    start = time.perf_counter()
+    classifier = load_speechbrain_classifier(args.model)
+    encoder = load_speaker_encoder(classifier, args.worker, encoder_export_dir(args.model))
+    load_seconds = time.perf_counter() - start
+    
+    def embed(samples_array: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            wavs = torch.from_numpy(samples_array).unsqueeze(0)
+            return encoder.encode_batch(wavs).squeeze().cpu().numpy()
+    
+    # Aquecimento (alocações e otimizações de grafo na primeira chamada)
+    embed(samples[0])
+    
+    embeddings, times, audio_seconds = [], [], 0.0
+    for samples_array in samples:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embedding = embed(samples_array)
+            times.append(time.perf_counter() - start)
+        embeddings.append(embedding)
+        audio_seconds += samples_array.size / 16000 * args.repeat
+    
+    np.save(args.output, np.stack(embeddings).astype(np.float32))
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "mean_ms": statistics.mean(times) * 1000,
+        "p50_ms": statistics.median(times) * 1000,
+        "rtf": sum(times) / audio_seconds,
+        "rss_mb": peak_rss_mb(),
+        "rss_base_mb": rss_before
+    }))
+
+
+def run_backend(backend: str, args, output: str) -> Optional[dict]:
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", backend, "--output", output,
+        "--model", args.model, "--repeat", str(args.repeat)
+    ]
+    if args.corpus:
+        command += ["--corpus", args.corpus]
+    
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"   ❌ {backend}: falhou")
+        for line in result.stderr.strip().splitlines()[-5:]:
+            print(f"      {line}")
+        return None
+    
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats["embeddings"] = np.load(output)
+    return stats
+
+
+def cosine_drift(embeddings: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    a = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    b = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    return 1.0 - np.sum(a * b, axis=1)
+
+
+def main():
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(description="Paridade e desempenho dos backends do encoder")
+    parser.add_argument("--corpus", help="Diretório com áudios de fala (padrão: sinais sintéticos)")
+    parser.add_argument("--backends", nargs="+", default=list(ENCODER_BACKENDS), choices=ENCODER_BACKENDS)
+    parser.add_argument("--model", default=settings.speechbrain_model)
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições por áudio")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Desvio máximo aceito (1 - cosseno)")
+    parser.add_argument("--worker", choices=ENCODER_BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        run_worker(args)
+        return
+    
+    if not args.corpus:
+        print("⚠️  Sem --corpus: usando sinais sintéticos (o desvio só é representativo com fala real)")
+    
+    # eager é a referência de paridade
+    backends = ["eager"] + [b for b in args.backends if b != "eager"]
+    
+    print("=" * 78)
+    print(f"📊 BACKENDS DO ENCODER ({args.model})")
+    print("=" * 78)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in backends:
+            print(f"\n▶ {backend}...")
+            stats = run_backend(backend, args, os.path.join(tmp_dir, f"{backend}.npy"))
+            if stats is not None:
+                results[backend] = stats
+    
+    if "eager" not in results:
+        print("\n❌ O backend eager (referência) falhou")
+        sys.exit(1)
+    
+    reference = results["eager"]["embeddings"]
+    print(f"\n{'Backend':<12} {'Carga (s)':>10} {'RSS (MB)':>9} {'Média (ms)':>11} {'p50 (ms)':>9} "
+          f"{'RTF':>7} {'Desvio máx':>11} {'Desvio médio':>13}")
+    print("-" * 88)
+    
+    eligible = []
+    for backend, stats in results.items():
+        drift = cosine_drift(stats["embeddings"], reference)
+        rss = f"{stats['rss_mb']:.0f}" if stats["rss_mb"] is not None else "n/d"
+        print(f"{backend:<12} {stats['load_seconds']:>10.2f} {rss:>9} {stats['mean_ms']:>11.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['rtf']:>7.3f} {drift.max():>11.5f} {drift.mean():>13.5f}")
+        if drift.max() <= args.tolerance:
+            eligible.append((stats["mean_ms"], backend))
+    
+    fastest = min(eligible)[1]
+    print(f"\n✅ Mais rápido dentro da tolerância ({args.tolerance}): ENCODER_BACKEND={fastest}")
+
+
+if __name__ == "__main__":
+    main()
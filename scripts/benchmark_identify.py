@@ -0,0 +1,99 @@
+"""
+Benchmark do índice de identificação de locutor (1:N)
+
+Gera populações sintéticas de embeddings normalizados e mede, para o índice
+exato (BruteForceIndex) e o aproximado (IVFIndex): tempo de construção,
+latência de busca (p50/p95/p99) e, para o IVF, a taxa de acerto do primeiro
+candidato (top-1) em relação ao índice exato.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_identify.py
+    python scripts/benchmark_identify.py --sizes 10000 100000 1000000 --queries 200 --nprobe 16
+
+Observação: 1M perfis de dimensão 192 ocupam ~770 MB por índice.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.scoring import l2_normalize
+from app.utils.speaker_index import BruteForceIndex, IVFIndex
+
+
+def percentiles(samples_ms):
+    """Retorna p50, p95 e p99 em milissegundos"""
+    return np.percentile(np.asarray(samples_ms), [50, 95, 99])
+
+
+def time_searches(index, queries, k):
+    """Executa uma busca por consulta e retorna (latências em ms, resultados)"""
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, k))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de identificação")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=192)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = automático (~4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    
+    print("=" * 94)
+    print(f"📊 BENCHMARK DE IDENTIFICAÇÃO 1:N (dim={args.dim}, top_k={args.top_k}, nprobe={args.nprobe})")
+    print("=" * 94)
+    print(f"{'perfis':>10} {'índice':>7} {'build (s)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'top-1':>7}")
+    
+    for size in args.sizes:
+        matrix = l2_normalize(rng.standard_normal((size, args.dim), dtype=np.float32))
+        ids = [f"user_{i}" for i in range(size)]
+        
+        # Consultas próximas de perfis existentes (mesmo locutor com ruído)
+        targets = rng.choice(size, size=args.queries, replace=False)
+        noise = rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.05
+        queries = l2_normalize(matrix[targets] + noise)
+        
+        started = time.perf_counter()
+        exact = BruteForceIndex(args.dim)
+        for user_id, embedding in zip(ids, matrix):
+            exact.add(user_id, embedding)
+        exact_build = time.perf_counter() - started
+        exact_latencies, exact_results = time_searches(exact, queries, args.top_k)
+        p50, p95, p99 = percentiles(exact_latencies)
+        print(f"{size:>10} {'exact':>7} {exact_build:>10.2f} {p50:>10.3f} {p95:>10.3f} {p99:>10.3f} {'1.000':>7}")
+        
+        started = time.perf_counter()
+        nlist = args.nlist or int(4 * np.sqrt(size))
+        ivf = IVFIndex.train(matrix, nlist=nlist, nprobe=args.nprobe)
+        ivf.add_batch(ids, matrix)
+        ivf_build = time.perf_counter() - started
+        ivf_latencies, ivf_results = time_searches(ivf, queries, args.top_k)
+        
+        hits = sum(
+            1 for expected, found in zip(exact_results, ivf_results)
+            if found and found[0][0] == expected[0][0]
+        )
+        top1 = hits / len(queries)
+        
+        p50, p95, p99 = percentiles(ivf_latencies)
+        print(f"{size:>10} {'ivf':>7} {ivf_build:>10.2f} {p50:>10.3f} {p95:>10.3f} {p99:>10.3f} {top1:>7.3f}")
+        
+        del exact, ivf, matrix
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark do tempo de importação (guarda contra regressões)
+
+Importa cada módulo em um interpretador novo, mede o tempo (melhor de N execuções)
+e verifica que nenhuma dependência pesada de ML (torch, SpeechBrain, Vosk, ...)
+foi carregada: elas devem ser importadas só no primeiro uso ou no aquecimento.
+Sai com código 1 se algum módulo passar do orçamento ou importar uma dependência
+pesada, para poder rodar em CI.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_import_time.py
+    python scripts/benchmark_import_time.py --budget 0.8 --repeat 5 --top 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "app.main",
+    "app.services.voice_service",
+    "app.utils.audio_processing",
+    "app.utils.audio_validation",
+]
+
+HEAVY_MODULES = [
+    "torch", "torchaudio", "speechbrain", "librosa", "pydub",
+    "vosk", "sklearn", "soundfile", "onnxruntime",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Importa o módulo em um interpretador novo"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list:
+    """Maiores tempos cumulativos segundo python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação dos módulos da API")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget", type=float, default=1.0, help="Tempo máximo de importação (s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por módulo (usa a melhor)")
+    parser.add_argument("--top", type=int, default=0, help="Mostra as N importações mais lentas de cada módulo")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print(f"⏱️  TEMPO DE IMPORTAÇÃO (orçamento: {args.budget:.2f}s)")
+    print("=" * 70)
+    
+    failed = False
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"❌ {module:<36} erro: {e}")
+            failed = True
+            continue
+        
+        best = min(run["seconds"] for run in runs)
+        heavy = sorted(set(name for run in runs for name in run["heavy"]))
+        ok = best <= args.budget and not heavy
+        failed = failed or not ok
+        
+        status = "✅" if ok else "❌"
+        print(f"{status} {module:<36} {best:>7.3f}s")
+        if heavy:
+            print(f"   Dependências pesadas importadas: {', '.join(heavy)}")
+        
+        if args.top:
+            for cumulative, name in slowest_imports(module, args.top):
+                print(f"      {cumulative / 1e6:>7.3f}s  {name}")
+    
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Benchmark offline do pipeline de áudio e da camada de serviço (VoiceService)
+
+Roda no próprio processo, sem servidor HTTP nem MySQL: o banco é um SQLite temporário
+e o áudio é gerado (voz sintética de várias durações, em WAV 16kHz, WAV 44.1kHz estéreo
+e, com FFmpeg instalado, em MP3/OGG/AAC) ou lido de um corpus (--corpus, cada arquivo com um .txt de mesmo nome
+contendo a frase falada). Mede vazão e latência p50/p95/p99 de decode, ASR, embedding,
+pontuação e enroll/verify de ponta a ponta em vários níveis de concorrência e grava
+o resultado em JSON. O modo --compare aponta regressões entre duas execuções e sai
+com código 1 se houver alguma, para poder rodar em CI.
+
+Só o WAV 16kHz mono passa pelo caminho rápido da decodificação (sem conversão); para
+os demais áudios o estágio decode também mede cada decodificador isoladamente
+(variantes "<áudio> ffmpeg" e "<áudio> pydub"), já que decode_audio usa o primeiro
+que funcionar.
+
+A transcrição de voz sintética não corresponde a nenhuma frase; sem --corpus, o texto
+reconhecido pelo Vosk é medido normalmente e depois substituído pela frase esperada,
+para que enroll e verify percorram o pipeline completo.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_pipeline.py --output bench_base.json
+    python scripts/benchmark_pipeline.py --stages decode scoring --concurrency 1 4
+    python scripts/benchmark_pipeline.py --corpus ./amostras --seconds 10 --output bench_new.json
+    python scripts/benchmark_pipeline.py --compare bench_base.json bench_new.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+STAGES = ["decode", "asr", "embedding", "scoring", "enroll", "verify"]
+SAMPLE_RATE = 16000
+# Taxa típica de gravação em celulares: exige resample e downmix na decodificação
+RESAMPLED_WAV_RATE = 44100
+
+# Argumentos de codificação do FFmpeg (PCM 16-bit mono 16kHz na entrada)
+FFMPEG_FORMATS = {
+    "mp3": ["-f", "mp3"],
+    "ogg": ["-c:a", "libopus", "-f", "ogg"],
+    "aac": ["-f", "adts"],
+}
+
+
+def generate_voice(seconds: float, seed: int) -> np.ndarray:
+    """
+    Voz sintética: sílabas com harmônicos e pitch variável separadas por pausas curtas
+    
+    As pausas e o ruído de fundo permitem que o VAD encontre a fala; a semente muda
+    o pitch, gerando "locutores" diferentes
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    base = 110 + 80 * rng.random()
+    pitch = base + 25 * np.sin(2 * np.pi * (0.3 + 0.4 * rng.random()) * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+    
+    # Sílabas de ~200 ms intercaladas com pausas de ~80 ms, com silêncio no início e no fim
+    envelope = (np.sin(np.pi * (t % 0.28) / 0.2) * ((t % 0.28) < 0.2)).clip(0)
+    envelope[(t < 0.3) | (t > seconds - 0.3)] = 0.0
+    signal = signal / np.abs(signal).max() * envelope * 0.4
+    signal += rng.standard_normal(t.shape[0]) * 0.001
+    return (signal.clip(-1, 1) * 32767).astype('<i2')
+
+
+def to_wav(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    """
+    PCM 16-bit mono 16kHz -> bytes WAV, reamostrado e duplicado em canais se pedido
+    
+    Com sample_rate ou channels diferentes do alvo o WAV não passa pelo caminho
+    rápido e precisa ser convertido por FFmpeg/pydub
+    """
+    if sample_rate != SAMPLE_RATE:
+        positions = np.arange(int(pcm.shape[0] * sample_rate / SAMPLE_RATE)) * (SAMPLE_RATE / sample_rate)
+        pcm = np.interp(positions, np.arange(pcm.shape[0]), pcm).astype('<i2')
+    if channels > 1:
+        pcm = np.repeat(pcm, channels)
+    
+    buffer = BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def encode_with_ffmpeg(pcm: np.ndarray, audio_format: str) -> bytes:
+    """Codifica PCM em outro formato via FFmpeg (pipes, sem arquivos temporários)"""
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+        *FFMPEG_FORMATS[audio_format], "pipe:1"
+    ]
+    process = subprocess.run(command, input=pcm.tobytes(), capture_output=True)
+    if process.returncode != 0 or not process.stdout:
+        raise RuntimeError(process.stderr.decode('utf-8', errors='ignore').strip() or "FFmpeg não retornou áudio")
+    return process.stdout
+
+
+def build_generated_corpus(lengths: List[float], formats: List[str]) -> List[dict]:
+    """Áudios gerados: uma amostra por (duração, formato)"""
+    corpus = []
+    for i, seconds in enumerate(lengths):
+        pcm = generate_voice(seconds, seed=i)
+        for audio_format in formats:
+            if audio_format == "wav":
+                data = to_wav(pcm)
+            elif shutil.which("ffmpeg") is None:
+                # Fora do caminho rápido a decodificação também depende do FFmpeg
+                print(f"⚠️  FFmpeg não encontrado: formato {audio_format} ignorado")
+                continue
+            elif audio_format == "wav44k":
+                data = to_wav(pcm, RESAMPLED_WAV_RATE, channels=2)
+            else:
+                try:
+                    data = encode_with_ffmpeg(pcm, audio_format)
+                except RuntimeError as e:
+                    print(f"⚠️  Não foi possível gerar {audio_format}: {e}")
+                    continue
+            corpus.append({"name": f"{seconds:g}s.{audio_format}", "bytes": data, "phrase": None})
+    return corpus
+
+
+def load_corpus(directory: str) -> List[dict]:
+    """Arquivos de áudio do diretório com a frase falada no .txt de mesmo nome"""
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        transcript = path.with_suffix(".txt")
+        if path.suffix == ".txt" or not path.is_file() or not transcript.exists():
+            continue
+        corpus.append({
+            "name": path.name,
+            "bytes": path.read_bytes(),
+            "phrase": transcript.read_text(encoding='utf-8').strip()
+        })
+    return corpus
+
+
+def run_closed_loop(fn: Callable[[int], bool], concurrency: int, seconds: float) -> dict:
+    """
+    Carga fechada: concurrency threads repetem fn até o fim do tempo
+    
+    fn recebe o número da iteração e retorna False em caso de erro
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    
+    def client() -> None:
+        nonlocal errors, counter
+        while time.perf_counter() < deadline:
+            with lock:
+                iteration = counter
+                counter += 1
+            start = time.perf_counter()
+            try:
+                ok = fn(iteration)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += 0 if ok else 1
+    
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99))
+    }
+
+
+def setup_sqlite(directory: str):
+    """Aponta app.database para um SQLite temporário e cria as tabelas"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.database as database
+    import app.models.user_voice_profile  # noqa: F401 (registra a tabela)
+    
+    engine = create_engine(
+        f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    database.engine = engine
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    database.Base.metadata.create_all(bind=engine)
+    return database.SessionLocal
+
+
+def build_benchmarks(
+    stages: List[str],
+    corpus: List[dict],
+    session_factory,
+    synthetic: bool
+) -> List[Tuple[str, str, Callable[[int], bool]]]:
+    """Lista de (estágio, variante, função medida)"""
+    from app.config import get_settings
+    from app.services import voice_service
+    from app.services.voice_service import VoiceService
+    from app.utils.audio_processing import (
+        _decode_wav_in_memory,
+        _decode_with_ffmpeg,
+        _decode_with_pydub,
+        decode_audio,
+        extract_voice_embedding,
+        transcribe_audio
+    )
+    from app.utils.scoring import l2_normalize, score_one
+    
+    settings = get_settings()
+    decoded = {sample["name"]: decode_audio(sample["bytes"]) for sample in corpus}
+    for name, audio in decoded.items():
+        if audio is None:
+            raise RuntimeError(f"Não foi possível decodificar {name}")
+    
+    synthetic_phrase = voice_service.CHALLENGE_PHRASES[0]
+    if synthetic:
+        # Voz sintética: o Vosk roda normalmente, mas a transcrição vira a frase esperada
+        real_transcribe = voice_service.transcribe_audio
+        
+        def transcribe_as_phrase(audio, vosk_model_path, grammar=None):
+            real_transcribe(audio, vosk_model_path, grammar)
+            return synthetic_phrase
+        
+        voice_service.transcribe_audio = transcribe_as_phrase
+    
+    benchmarks = []
+    for sample in corpus:
+        name, data, audio = sample["name"], sample["bytes"], decoded[sample["name"]]
+        if "decode" in stages:
+            benchmarks.append(("decode", name, lambda i, data=data: decode_audio(data) is not None))
+            if _decode_wav_in_memory(data) is None:
+                for decoder_name, decoder in (("ffmpeg", _decode_with_ffmpeg), ("pydub", _decode_with_pydub)):
+                    try:
+                        decoder(data)
+                    except Exception as e:
+                        print(f"⚠️  Decodificador {decoder_name} indisponível para {name}: {e}")
+                        continue
+                    benchmarks.append((
+                        "decode", f"{name} {decoder_name}",
+                        lambda i, data=data, decoder=decoder: decoder(data).size > 0
+                    ))
+        if "asr" in stages:
+            # Sem fala real a transcrição vazia é esperada
+            benchmarks.append(("asr", name, lambda i, audio=audio: transcribe_audio(audio, settings.vosk_model_path) is not None or synthetic))
+        if "embedding" in stages:
+            benchmarks.append(("embedding", name, lambda i, audio=audio: extract_voice_embedding(audio, settings.speechbrain_model) is not None))
+    
+    if "scoring" in stages:
+        rng = np.random.default_rng(0)
+        probe, reference = l2_normalize(rng.standard_normal(192)), l2_normalize(rng.standard_normal(192))
+        embedding = rng.standard_normal(192).tolist()
+        # decide_verification não consulta o banco
+        service = VoiceService(session_factory())
+        benchmarks.append(("scoring", "score_one", lambda i: bool(np.isfinite(score_one(probe, reference)))))
+        benchmarks.append(("scoring", "decide_verification",
+                           lambda i: "similarity" in service.decide_verification("bench", "-", embedding, reference)))
+    
+    for sample in corpus:
+        name, data, phrase = sample["name"], sample["bytes"], sample["phrase"] or synthetic_phrase
+        
+        if "enroll" in stages:
+            def enroll(i: int, data=data, phrase=phrase, name=name) -> bool:
+                db = session_factory()
+                try:
+                    return VoiceService(db).enroll_user(f"bench-enroll-{name}-{i}", data, phrase)["success"]
+                finally:
+                    db.close()
+            benchmarks.append(("enroll", name, enroll))
+        
+        if "verify" in stages:
+            user_id = f"bench-verify-{name}"
+            db = session_factory()
+            try:
+                enrolled = VoiceService(db).enroll_user(user_id, data, phrase)
+            finally:
+                db.close()
+            if not enrolled["success"]:
+                print(f"⚠️  Enrollment de {name} falhou ({enrolled['message']}): verify ignorado")
+                continue
+            
+            def verify(i: int, data=data, phrase=phrase, user_id=user_id) -> bool:
+                db = session_factory()
+                try:
+                    return "similarity" in VoiceService(db).verify_user(user_id, data, phrase)
+                finally:
+                    db.close()
+            benchmarks.append(("verify", name, verify))
+    
+    return benchmarks
+
+
+def environment() -> dict:
+    """Metadados da execução (máquina, commit e configuração relevante)"""
+    from app.config import get_runtime_profile, get_settings
+    
+    settings = get_settings()
+    profile = get_runtime_profile()
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cores": os.cpu_count(),
+        "encoder_backend": settings.encoder_backend,
+        "asr_grammar_mode": settings.asr_grammar_mode,
+        "embedding_batching": settings.embedding_batching,
+        "parallel_stages": settings.parallel_stages,
+        "torch_num_threads": profile.torch_num_threads,
+        "asr_max_concurrency": profile.asr_max_concurrency
+    }
+
+
+def run(args) -> None:
+    from app.config import get_settings
+    from app.utils.audio_processing import preload_models
+    from app.utils.runtime_profile import apply_runtime_profile
+    
+    settings = get_settings()
+    apply_runtime_profile()
+    
+    corpus = load_corpus(args.corpus) if args.corpus else build_generated_corpus(args.lengths, args.formats)
+    if not corpus:
+        print("❌ Nenhum áudio para o benchmark")
+        sys.exit(1)
+    
+    print("=" * 70)
+    print(f"📈 BENCHMARK DO PIPELINE: {len(corpus)} áudio(s), concorrência {args.concurrency}, {args.seconds:g}s por medição")
+    print("=" * 70)
+    
+    if set(args.stages) - {"decode", "scoring"}:
+        preload_models(settings.vosk_model_path, settings.speechbrain_model)
+    
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        session_factory = setup_sqlite(directory)
+        benchmarks = build_benchmarks(args.stages, corpus, session_factory, synthetic=not args.corpus)
+        
+        print(f"\n{'estágio':<10} {'variante':<22} {'conc':>4} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+        for stage, variant, fn in benchmarks:
+            # Aquecimento: primeira chamada fora da medição
+            fn(-1)
+            for concurrency in args.concurrency:
+                stats = run_closed_loop(fn, concurrency, args.seconds)
+                stats.update(stage=stage, variant=variant)
+                results.append(stats)
+                print(f"{stage:<10} {variant:<22} {concurrency:>4} {stats['throughput_rps']:>9.2f} "
+                      f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>6}")
+    
+    report = {"environment": environment(), "seconds": args.seconds, "results": results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Resultados gravados em {args.output}")
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float, min_delta_ms: float) -> bool:
+    """
+    Compara duas execuções por (estágio, variante, concorrência)
+    
+    Regressão: p95 maior ou vazão menor que a base por mais de threshold (fração);
+    aumentos de p95 menores que min_delta_ms são tratados como ruído
+    
+    Returns:
+        True se houver alguma regressão
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding='utf-8') as f:
+        candidate = json.load(f)
+    
+    def key(result: dict) -> Tuple[str, str, int]:
+        return result["stage"], result["variant"], result["concurrency"]
+    
+    base_results: Dict[Tuple[str, str, int], dict] = {key(r): r for r in baseline["results"]}
+    
+    print("=" * 70)
+    print(f"🔍 COMPARAÇÃO: {baseline_path} ({baseline['environment'].get('commit') or '?'}) -> "
+          f"{candidate_path} ({candidate['environment'].get('commit') or '?'})")
+    print("=" * 70)
+    print(f"\n{'estágio':<10} {'variante':<22} {'conc':>4} {'req/s':>16} {'p95 (ms)':>20}")
+    
+    regressions = 0
+    for result in candidate["results"]:
+        base = base_results.get(key(result))
+        if base is None:
+            continue
+        throughput_change = result["throughput_rps"] / base["throughput_rps"] - 1 if base["throughput_rps"] else 0.0
+        p95_change = result["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        p95_regressed = p95_change > threshold and result["p95_ms"] - base["p95_ms"] >= min_delta_ms
+        regressed = throughput_change < -threshold or p95_regressed
+        regressions += regressed
+        
+        status = "❌" if regressed else "✅"
+        print(f"{result['stage']:<10} {result['variant']:<22} {result['concurrency']:>4} "
+              f"{result['throughput_rps']:>8.2f} ({throughput_change:+6.1%}) "
+              f"{result['p95_ms']:>10.2f} ({p95_change:+6.1%}) {status}")
+    
+    if regressions:
+        print(f"\n❌ {regressions} regressão(ões) acima de {threshold:.0%}")
+    else:
+        print(f"\n✅ Nenhuma regressão acima de {threshold:.0%}")
+    return regressions > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de voz e do VoiceService")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duração de cada medição")
+    parser.add_argument("--lengths", nargs="+", type=float, default=[2.0, 5.0, 10.0],
+                        help="Durações (s) dos áudios gerados")
+    parser.add_argument("--formats", nargs="+", choices=["wav", "wav44k", *FFMPEG_FORMATS],
+                        default=["wav", "wav44k", "mp3", "ogg"],
+                        help="Formatos dos áudios gerados (wav44k: 44.1kHz estéreo; os comprimidos exigem FFmpeg)")
+    parser.add_argument("--corpus", help="Diretório com áudios reais e um .txt com a frase de cada um")
+    parser.add_argument("--output", default="benchmark_pipeline.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NOVO"), help="Compara dois JSONs gerados pelo benchmark")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Variação máxima tolerada no modo --compare (fração)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Aumento mínimo de p95 (ms) para contar como regressão no modo --compare")
+    args = parser.parse_args()
+    
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold, args.min_delta_ms) else 0)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Microbenchmark do núcleo de pontuação (app/utils/scoring.py)
+
+Compara a implementação anterior (sklearn cosine_similarity por par, a partir
+de listas Python) com o caminho vetorizado sobre vetores float32 normalizados.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_scoring.py
+    python scripts/benchmark_scoring.py --dim 192 --population 10000 --repeat 5
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.scoring import l2_normalize, score_many_to_many, score_one, score_one_to_many
+
+
+def legacy_cosine_similarity(embedding1: list, embedding2: list) -> float:
+    """Implementação anterior de app/utils/similarity.py"""
+    from sklearn.metrics.pairwise import cosine_similarity
+    
+    emb1 = np.array(embedding1).reshape(1, -1)
+    emb2 = np.array(embedding2).reshape(1, -1)
+    return float(cosine_similarity(emb1, emb2)[0][0])
+
+
+def measure(label: str, fn, number: int, repeat: int, per: int = 1) -> float:
+    """Executa fn e imprime o melhor tempo por operação"""
+    best = min(timeit.repeat(fn, number=number, repeat=repeat)) / (number * per)
+    print(f"   {label:<48} {best * 1e6:>12.2f} µs")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de pontuação de embeddings")
+    parser.add_argument("--dim", type=int, default=192, help="Dimensão do embedding (ECAPA = 192)")
+    parser.add_argument("--population", type=int, default=10000, help="Tamanho da matriz de referência")
+    parser.add_argument("--queries", type=int, default=64, help="Consultas no teste M:N")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal(args.dim).tolist()
+    b = rng.standard_normal(args.dim).tolist()
+    a_norm, b_norm = l2_normalize(a), l2_normalize(b)
+    references = l2_normalize(rng.standard_normal((args.population, args.dim)))
+    queries = l2_normalize(rng.standard_normal((args.queries, args.dim)))
+    
+    print("=" * 70)
+    print(f"📊 BENCHMARK DE PONTUAÇÃO (dim={args.dim})")
+    print("=" * 70)
+    
+    print("\n1️⃣  1:1 (verificação)")
+    try:
+        legacy = measure("sklearn cosine_similarity (listas)", lambda: legacy_cosine_similarity(a, b), 2000, args.repeat)
+    except ImportError:
+        legacy = None
+        print("   sklearn não instalado: comparação com a versão anterior ignorada")
+    normalize_and_score = measure("l2_normalize + score_one (listas)", lambda: score_one(l2_normalize(a), l2_normalize(b)), 20000, args.repeat)
+    fast = measure("score_one (pré-normalizados)", lambda: score_one(a_norm, b_norm), 100000, args.repeat)
+    if legacy:
+        print(f"   Speedup: {legacy / normalize_and_score:.1f}x (listas), {legacy / fast:.1f}x (pré-normalizados)")
+    
+    print(f"\n2️⃣  1:N (N={args.population})")
+    loop = measure("loop de score_one", lambda: [score_one(a_norm, row) for row in references], 1, args.repeat, per=args.population)
+    matmul = measure("score_one_to_many (matmul)", lambda: score_one_to_many(a_norm, references), 20, args.repeat, per=args.population)
+    print(f"   Speedup por comparação: {loop / matmul:.1f}x")
+    
+    print(f"\n3️⃣  M:N ({args.queries}x{args.population})")
+    pairs = args.queries * args.population
+    measure("score_many_to_many (matmul)", lambda: score_many_to_many(queries, references), 5, args.repeat, per=pairs)
+    
+    print("\n(tempos por comparação, melhor de cada repetição)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Teste de carga HTTP da API (challenge -> enroll -> verify) com varredura de taxa e concorrência
+
+Segue o fluxo de scripts/test_api.py: obtém uma frase, cadastra --users usuários com
+os áudios do corpus e então dispara requisições em carga aberta (as chegadas seguem a
+taxa configurada, independentemente das respostas) para cada combinação de taxa e
+concorrência máxima. A latência é medida a partir do horário agendado de cada
+requisição, então a espera por uma conexão livre também conta (sem omissão coordenada).
+
+Para cada passo reporta, por endpoint, vazão, taxa de erro e latências p50/p95/p99 e a
+média de cada estágio do cabeçalho Server-Timing; ao final aponta o joelho de saturação:
+a maior taxa sustentada antes de a vazão deixar de acompanhar a carga, o p99 disparar
+ou os erros passarem do limite.
+
+Uso (a partir da raiz do projeto, com a API rodando):
+    python scripts/load_test.py --audio test_audio.wav --phrase "Minha voz é minha identidade"
+    python scripts/load_test.py --corpus ./amostras --rates 1 2 4 8 16 --concurrency 8 32 --duration 30
+    python scripts/load_test.py --audio test_audio.wav --mix verify:8,enroll:1,challenge:1 --output carga.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+ENDPOINTS = ("challenge", "enroll", "verify")
+
+
+class Corpus:
+    """Áudios de teste e a frase falada em cada um"""
+    
+    def __init__(self, samples: List[Tuple[str, bytes, str]]):
+        self.samples = samples
+    
+    @classmethod
+    def load(cls, paths: List[Path], phrase: Optional[str]) -> "Corpus":
+        """
+        Lê os áudios; a frase vem de --phrase, do .txt de mesmo nome ou do /voice/challenge
+        """
+        samples = []
+        for path in paths:
+            transcript = path.with_suffix(".txt")
+            if phrase:
+                sample_phrase = phrase
+            elif transcript.exists():
+                sample_phrase = transcript.read_text(encoding='utf-8').strip()
+            else:
+                sample_phrase = None
+            samples.append((path.name, path.read_bytes(), sample_phrase))
+        return cls(samples)
+    
+    def sample(self, index: int) -> Tuple[str, bytes, str]:
+        return self.samples[index % len(self.samples)]
+
+
+class LoadClient:
+    """Requisições da API com uma sessão HTTP (keep-alive) por thread"""
+    
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+    
+    def challenge(self) -> requests.Response:
+        return self.session.get(f"{self.base_url}/voice/challenge", timeout=self.timeout)
+    
+    def enroll(self, user_id: str, name: str, audio: bytes, phrase: str) -> requests.Response:
+        return self.session.post(
+            f"{self.base_url}/voice/enroll",
+            files={'audio_file': (name, audio, 'audio/wav')},
+            data={'user_id': user_id, 'phrase_expected': phrase},
+            timeout=self.timeout
+        )
+    
+    def verify(self, user_id: str, name: str, audio: bytes, phrase: str) -> requests.Response:
+        return self.session.post(
+            f"{self.base_url}/voice/verify",
+            files={'audio_file': (name, audio, 'audio/wav')},
+            data={'user_id': user_id, 'phrase_expected': phrase},
+            timeout=self.timeout
+        )
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'asr;dur=310.5, total;dur=355.0' -> {'asr': 310.5, 'total': 355.0}"""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    """'verify:8,enroll:1' -> [('verify', 8.0), ('enroll', 1.0)]"""
+    weights = []
+    for item in mix.split(","):
+        endpoint, _, weight = item.partition(":")
+        endpoint = endpoint.strip()
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint inválido no --mix: {endpoint} (use {', '.join(ENDPOINTS)})")
+        weights.append((endpoint, float(weight or 1)))
+    return weights
+
+
+def enroll_users(client: LoadClient, corpus: Corpus, users: int, prefix: str) -> List[Tuple[str, int]]:
+    """
+    Cadastra os usuários usados pelo verify (usuário i usa o áudio i do corpus)
+    
+    Returns:
+        Pares (user_id, índice do áudio) cadastrados com sucesso
+    """
+    enrolled = []
+    for i in range(users):
+        user_id = f"{prefix}-{i}"
+        name, audio, phrase = corpus.sample(i)
+        response = client.enroll(user_id, name, audio, phrase)
+        if response.status_code == 200 and response.json().get("success"):
+            enrolled.append((user_id, i))
+        else:
+            print(f"⚠️  Enrollment de {user_id} ({name}) falhou: {response.status_code} {response.text[:200]}")
+    return enrolled
+
+
+def run_step(
+    client: LoadClient,
+    corpus: Corpus,
+    enrolled: List[Tuple[str, int]],
+    mix: List[Tuple[str, float]],
+    rate: float,
+    concurrency: int,
+    duration: float,
+    poisson: bool,
+    prefix: str
+) -> dict:
+    """
+    Carga aberta: dispara requisições na taxa definida por duration segundos
+    
+    No máximo concurrency requisições ficam em andamento; as demais esperam uma
+    conexão livre com o relógio correndo desde o horário agendado
+    """
+    endpoints = [endpoint for endpoint, _ in mix]
+    weights = np.array([weight for _, weight in mix]) / sum(weight for _, weight in mix)
+    rng = random.Random(0)
+    records: List[dict] = []
+    lock = threading.Lock()
+    
+    def send(endpoint: str, scheduled: float, index: int) -> None:
+        record = {"endpoint": endpoint, "status": None, "error": None, "stages": {}}
+        try:
+            if endpoint == "challenge":
+                response = client.challenge()
+            elif endpoint == "enroll":
+                name, audio, phrase = corpus.sample(index)
+                response = client.enroll(f"{prefix}-load-{index}", name, audio, phrase)
+            else:
+                user_id, sample_index = enrolled[index % len(enrolled)]
+                name, audio, phrase = corpus.sample(sample_index)
+                response = client.verify(user_id, name, audio, phrase)
+            record["status"] = response.status_code
+            record["stages"] = parse_server_timing(response.headers.get("server-timing"))
+        except requests.RequestException as e:
+            record["error"] = type(e).__name__
+        record["finished"] = time.perf_counter()
+        record["latency"] = record["finished"] - scheduled
+        with lock:
+            records.append(record)
+    
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    started = time.perf_counter()
+    next_arrival = started
+    index = 0
+    while next_arrival < started + duration:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        endpoint = endpoints[int(np.searchsorted(np.cumsum(weights), rng.random()))]
+        pool.submit(send, endpoint, next_arrival, index)
+        index += 1
+        next_arrival += rng.expovariate(rate) if poisson else 1.0 / rate
+    window_end = started + duration
+    pool.shutdown(wait=True)
+    drain = time.perf_counter() - window_end
+    
+    return summarize(records, rate, concurrency, started, window_end, drain)
+
+
+def window_throughput(finished: List[float], started: float, window_end: float) -> float:
+    """
+    Vazão medida só dentro da janela de chegadas, sem o tempo de esvaziar a fila
+    
+    As conclusões começam uma latência depois do início da janela: contar os
+    intervalos entre a primeira conclusão e o fim da janela evita que a latência
+    (ou a drenagem das requisições em andamento) reduza a vazão de um servidor
+    que acompanha a carga
+    """
+    inside = sorted(t for t in finished if t <= window_end)
+    if len(inside) < 2 or inside[0] >= window_end:
+        return len(inside) / (window_end - started)
+    return (len(inside) - 1) / (window_end - inside[0])
+
+
+def summarize(
+    records: List[dict],
+    rate: float,
+    concurrency: int,
+    started: float,
+    window_end: float,
+    drain: float
+) -> dict:
+    """Estatísticas do passo, no total e por endpoint"""
+    def stats(items: List[dict]) -> dict:
+        ok = [r for r in items if r["status"] is not None and r["status"] < 500]
+        errors = len(items) - len(ok)
+        latencies_ms = np.array([r["latency"] for r in ok]) * 1000 if ok else np.zeros(1)
+        stage_names = sorted({name for r in ok for name in r["stages"]})
+        return {
+            "sent": len(items),
+            "completed": len(ok),
+            "errors": errors,
+            "busy": sum(1 for r in items if r["status"] == 503),
+            "rejected": sum(1 for r in ok if r["status"] >= 400),
+            "error_rate": errors / len(items) if items else 0.0,
+            "throughput_rps": window_throughput([r["finished"] for r in ok], started, window_end),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p95_ms": float(np.percentile(latencies_ms, 95)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)),
+            "server_timing_ms": {
+                name: float(np.mean([r["stages"][name] for r in ok if name in r["stages"]]))
+                for name in stage_names
+            }
+        }
+    
+    endpoints = sorted({r["endpoint"] for r in records})
+    return {
+        "rate": rate,
+        "concurrency": concurrency,
+        "duration": window_end - started,
+        "drain_seconds": drain,
+        **stats(records),
+        "endpoints": {endpoint: stats([r for r in records if r["endpoint"] == endpoint]) for endpoint in endpoints}
+    }
+
+
+def find_knee(steps: List[dict], max_error_rate: float, p99_factor: float, slo_p99_ms: Optional[float]) -> Optional[dict]:
+    """
+    Maior taxa sustentada de uma série (mesma concorrência, taxas crescentes)
+    
+    Um passo está saturado se a vazão fica abaixo de 90% da taxa oferecida, se a taxa
+    de erro passa de max_error_rate ou se o p99 passa de p99_factor vezes o p99 da menor
+    taxa (ou do SLO, se informado). Todos os passos recebem a marcação "saturated";
+    o joelho é o último passo antes da primeira saturação
+    """
+    steps = sorted(steps, key=lambda s: s["rate"])
+    if not steps:
+        return None
+    p99_limit = slo_p99_ms or steps[0]["p99_ms"] * p99_factor
+    
+    for step in steps:
+        step["saturated"] = (
+            step["throughput_rps"] < 0.9 * step["rate"]
+            or step["error_rate"] > max_error_rate
+            or step["p99_ms"] > p99_limit
+        )
+    
+    knee = None
+    for step in steps:
+        if step["saturated"]:
+            break
+        knee = step
+    return knee
+
+
+def print_step(step: dict) -> None:
+    status = "❌" if step.get("saturated") else "✅"
+    print(f"{step['rate']:>7.1f} {step['concurrency']:>5} {step['throughput_rps']:>8.2f} "
+          f"{step['error_rate']:>7.1%} {step['p50_ms']:>9.0f} {step['p95_ms']:>9.0f} {step['p99_ms']:>9.0f} {status}")
+    for endpoint, stats in step["endpoints"].items():
+        stages = " ".join(f"{name}={value:.0f}" for name, value in stats["server_timing_ms"].items())
+        print(f"        {endpoint:<10} {stats['throughput_rps']:>8.2f} req/s, erros {stats['error_rate']:.1%}, "
+              f"p99 {stats['p99_ms']:.0f} ms  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de autenticação por voz")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--audio", nargs="+", type=Path, default=[], help="Arquivos de áudio")
+    parser.add_argument("--corpus", type=Path, help="Diretório de áudios (frase opcional no .txt de mesmo nome)")
+    parser.add_argument("--phrase", help="Frase falada em todos os áudios (padrão: .txt ou /voice/challenge)")
+    parser.add_argument("--users", type=int, default=10, help="Usuários cadastrados antes da carga")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("verify:1"),
+                        help="Endpoints e pesos, ex.: verify:8,enroll:1,challenge:1")
+    parser.add_argument("--rates", nargs="+", type=float, default=[1, 2, 4, 8, 16], help="Taxas (req/s) da varredura")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[16], help="Requisições simultâneas máximas")
+    parser.add_argument("--duration", type=float, default=20.0, help="Duração de cada passo (s)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Aquecimento antes da varredura (s)")
+    parser.add_argument("--poisson", action="store_true", help="Chegadas de Poisson em vez de intervalos fixos")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--p99-factor", type=float, default=3.0,
+                        help="Saturação quando o p99 passa deste múltiplo do p99 da menor taxa")
+    parser.add_argument("--slo-p99-ms", type=float, help="Limite absoluto de p99 (substitui --p99-factor)")
+    parser.add_argument("--no-stop", action="store_true", help="Continua a varredura depois da saturação")
+    parser.add_argument("--output", help="Grava o relatório em JSON")
+    args = parser.parse_args()
+    
+    paths = list(args.audio)
+    if args.corpus:
+        paths += sorted(p for p in args.corpus.iterdir() if p.is_file() and p.suffix != ".txt")
+    if not paths:
+        paths = [Path("test_audio.wav")]
+    missing = [str(p) for p in paths if not p.exists()]
+    if missing:
+        print(f"❌ Arquivo(s) de áudio não encontrado(s): {', '.join(missing)}")
+        return
+    
+    client = LoadClient(args.url, args.timeout)
+    try:
+        health = requests.get(f"{args.url}/health/ready", timeout=5)
+    except requests.RequestException as e:
+        print(f"❌ Erro ao conectar à API: {e}")
+        return
+    if health.status_code != 200:
+        print(f"❌ API não está pronta: {health.status_code} {health.text[:200]}")
+        return
+    
+    corpus = Corpus.load(paths, args.phrase)
+    challenge = None
+    for i, (name, audio, phrase) in enumerate(corpus.samples):
+        if phrase is None:
+            challenge = challenge or client.challenge().json()["phrase"]
+            corpus.samples[i] = (name, audio, challenge)
+    
+    prefix = f"load-{int(time.time())}"
+    print("=" * 70)
+    print(f"🚦 TESTE DE CARGA: {args.url}, {len(corpus.samples)} áudio(s), mix {args.mix}")
+    print("=" * 70)
+    
+    enrolled = enroll_users(client, corpus, args.users, prefix)
+    if not enrolled and any(endpoint == "verify" for endpoint, _ in args.mix):
+        print("❌ Nenhum usuário cadastrado: verifique o áudio e a frase esperada")
+        return
+    print(f"✅ {len(enrolled)} usuário(s) cadastrado(s)")
+    
+    if args.warmup > 0:
+        run_step(client, corpus, enrolled, args.mix, min(args.rates), max(args.concurrency),
+                 args.warmup, args.poisson, prefix)
+    
+    report = {"created_at": datetime.now().isoformat(timespec="seconds"), "url": args.url,
+              "mix": args.mix, "series": []}
+    for concurrency in args.concurrency:
+        print(f"\n▶️  Concorrência máxima {concurrency}")
+        print(f"{'taxa':>7} {'conc':>5} {'req/s':>8} {'erros':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+        steps = []
+        for rate in sorted(args.rates):
+            step = run_step(client, corpus, enrolled, args.mix, rate, concurrency,
+                            args.duration, args.poisson, prefix)
+            steps.append(step)
+            find_knee(steps, args.max_error_rate, args.p99_factor, args.slo_p99_ms)
+            print_step(step)
+            if step["saturated"] and not args.no_stop:
+                break
+        
+        knee = find_knee(steps, args.max_error_rate, args.p99_factor, args.slo_p99_ms)
+        report["series"].append({"concurrency": concurrency, "steps": steps, "knee": knee})
+        if knee:
+            print(f"📍 Joelho: {knee['rate']:.1f} req/s sustentadas "
+                  f"({knee['throughput_rps']:.2f} req/s, p99 {knee['p99_ms']:.0f} ms)")
+        else:
+            print("📍 Saturado já na menor taxa: reduza --rates")
+    
+    knees = [s["knee"] for s in report["series"] if s["knee"]]
+    if knees:
+        best = max(knees, key=lambda k: k["throughput_rps"])
+        print(f"\n✅ Capacidade do nó: {best['throughput_rps']:.2f} req/s "
+              f"(taxa {best['rate']:.1f}, concorrência {best['concurrency']}, p99 {best['p99_ms']:.0f} ms)")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Relatório gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
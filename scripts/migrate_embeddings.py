@@ -0,0 +1,130 @@
+"""
+Migração online dos embeddings de JSON para o formato binário compacto
+
+Adiciona as colunas embedding_blob, embedding_sum e sample_count (se necessário)
+e converte os registros em lotes, sem bloquear a tabela. Pode ser interrompido e
+executado novamente.
+
+Uso (a partir da raiz do projeto):
+    python scripts/migrate_embeddings.py
+    python scripts/migrate_embeddings.py --batch-size 200 --dtype float16 --pause 0.5
+    python scripts/migrate_embeddings.py --dry-run
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import inspect, text
+
+from app.config import get_settings
+from app.database import SessionLocal, engine
+from app.models.user_voice_profile import UserVoiceProfile
+from app.repositories.embedding_codec import encode_embedding
+
+settings = get_settings()
+
+
+def ensure_schema(dry_run: bool) -> None:
+    """Adiciona as colunas binárias/de centróide e torna a coluna JSON opcional"""
+    columns = {column["name"] for column in inspect(engine).get_columns("user_voice_profile")}
+    
+    statements = []
+    if "embedding_blob" not in columns:
+        statements.append("ALTER TABLE user_voice_profile ADD COLUMN embedding_blob BLOB NULL")
+        if engine.dialect.name == "mysql":
+            statements.append("ALTER TABLE user_voice_profile MODIFY embedding JSON NULL")
+    if "embedding_sum" not in columns:
+        statements.append("ALTER TABLE user_voice_profile ADD COLUMN embedding_sum BLOB NULL")
+    if "sample_count" not in columns:
+        statements.append("ALTER TABLE user_voice_profile ADD COLUMN sample_count INT NOT NULL DEFAULT 0")
+    
+    if not statements:
+        print("✅ Esquema já está atualizado")
+        return
+    
+    for statement in statements:
+        print(f"🔧 {statement}")
+        if not dry_run:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+
+
+def migrate(batch_size: int, dtype: str, pause: float, dry_run: bool) -> None:
+    """Converte os registros em lotes ordenados por id"""
+    last_id = 0
+    migrated = 0
+    json_bytes = 0
+    blob_bytes = 0
+    
+    while True:
+        db = SessionLocal()
+        try:
+            profiles = db.query(UserVoiceProfile).filter(
+                UserVoiceProfile.id > last_id,
+                UserVoiceProfile.embedding_blob.is_(None),
+                UserVoiceProfile.embedding.isnot(None)
+            ).order_by(UserVoiceProfile.id).limit(batch_size).all()
+            
+            if not profiles:
+                break
+            
+            for profile in profiles:
+                blob = encode_embedding(
+                    profile.embedding,
+                    dtype=dtype,
+                    model_version=settings.embedding_model_version
+                )
+                json_bytes += len(json.dumps(profile.embedding))
+                blob_bytes += len(blob)
+                
+                if not dry_run:
+                    profile.embedding_blob = blob
+                    profile.embedding = None
+            
+            if not dry_run:
+                db.commit()
+            
+            last_id = profiles[-1].id
+            migrated += len(profiles)
+            print(f"   {migrated} perfis convertidos (último id: {last_id})")
+        finally:
+            db.close()
+        
+        if pause > 0:
+            time.sleep(pause)
+    
+    print()
+    print(f"✅ Total convertido: {migrated} perfis{' (dry-run)' if dry_run else ''}")
+    if migrated:
+        print(f"   JSON: {json_bytes / migrated:.0f} bytes/perfil")
+        print(f"   BLOB: {blob_bytes / migrated:.0f} bytes/perfil")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra embeddings de JSON para BLOB binário")
+    parser.add_argument("--batch-size", type=int, default=500, help="Registros por transação")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=settings.embedding_storage_dtype)
+    parser.add_argument("--pause", type=float, default=0.0, help="Pausa entre lotes (segundos)")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas mostra o que seria feito")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🔄 MIGRAÇÃO DE EMBEDDINGS: JSON -> BLOB")
+    print("=" * 60)
+    
+    ensure_schema(args.dry_run)
+    if args.dry_run and "embedding_blob" not in {
+        column["name"] for column in inspect(engine).get_columns("user_voice_profile")
+    }:
+        print("ℹ️  Dry-run sem a coluna embedding_blob: nada mais a simular")
+        return
+    
+    migrate(args.batch_size, args.dtype, args.pause, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Cliente de teste da verificação em streaming (WS /voice/verify/stream)
+
+Envia um WAV (PCM 16-bit, mono, 16kHz) em pedaços no ritmo de tempo real, como
+um microfone faria, e mede o tempo entre o fim da fala e a decisão do servidor.
+
+Uso (a partir da raiz do projeto, com a API rodando):
+    python scripts/test_stream.py --audio test_audio.wav --user-id test_user_123 --phrase "..."
+    python scripts/test_stream.py --audio test_audio.wav --user-id test_user_123 --phrase "..." --chunk-ms 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import wave
+
+import numpy as np
+import websockets
+
+# Amplitude RMS (int16) a partir da qual um pedaço é considerado fala
+SPEECH_RMS = 500
+
+
+def load_pcm(path: str) -> bytes:
+    """Lê o WAV e valida o formato esperado pelo endpoint"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != 16000:
+            print("❌ O áudio deve ser WAV PCM 16-bit, mono, 16kHz")
+            sys.exit(1)
+        return wav.readframes(wav.getnframes())
+
+
+def split_chunks(pcm: bytes, chunk_ms: int) -> list:
+    chunk_bytes = 16000 * 2 * chunk_ms // 1000
+    return [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+
+def last_speech_chunk(chunks: list) -> int:
+    """Índice do último pedaço com energia de fala"""
+    last = 0
+    for i, chunk in enumerate(chunks):
+        samples = np.frombuffer(chunk, dtype='<i2').astype(np.float32)
+        if samples.size and np.sqrt(np.mean(samples ** 2)) >= SPEECH_RMS:
+            last = i
+    return last
+
+
+async def run(args) -> None:
+    chunks = split_chunks(load_pcm(args.audio), args.chunk_ms)
+    speech_end = last_speech_chunk(chunks)
+    speech_end_sent = None
+    
+    async with websockets.connect(args.url) as ws:
+        await ws.send(json.dumps({"user_id": args.user_id, "phrase_expected": args.phrase}))
+        
+        async def send_audio():
+            nonlocal speech_end_sent
+            for i, chunk in enumerate(chunks):
+                await ws.send(chunk)
+                if i == speech_end:
+                    speech_end_sent = time.perf_counter()
+                await asyncio.sleep(args.chunk_ms / 1000)
+            await ws.send(json.dumps({"event": "end"}))
+        
+        sender = asyncio.create_task(send_audio())
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                if event["type"] == "partial":
+                    print(f"   … {event['text']}")
+                    continue
+                
+                received = time.perf_counter()
+                print(f"\n📨 {event['type']}: {json.dumps(event, ensure_ascii=False)}")
+                if event["type"] == "result" and speech_end_sent is not None:
+                    print(f"⏱️  Fim da fala -> decisão: {(received - speech_end_sent) * 1000:.0f} ms")
+                break
+        finally:
+            sender.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste da verificação por voz em streaming")
+    parser.add_argument("--audio", default="test_audio.wav", help="WAV PCM 16-bit mono 16kHz")
+    parser.add_argument("--user-id", default="test_user_123")
+    parser.add_argument("--phrase", required=True, help="Frase pronunciada no áudio")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Duração de cada pedaço enviado")
+    parser.add_argument("--url", default="ws://localhost:8000/voice/verify/stream")
+    args = parser.parse_args()
+    
+    print("🎙️  Verificação em streaming")
+    print(f"   Áudio: {args.audio} em pedaços de {args.chunk_ms} ms")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
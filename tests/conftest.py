@@ -0,0 +1,47 @@
+"""
+Fixtures compartilhadas: banco SQLite em memória e repositório de perfis
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.user_voice_profile import UserVoiceProfile  # noqa: F401 (registra a tabela)
+from app.repositories.embedding_cache import EmbeddingCache
+from app.repositories.voice_repository import VoiceRepository
+
+
+@pytest.fixture
+def session_factory():
+    """Sessões de um SQLite em memória compartilhado entre threads"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def cache():
+    return EmbeddingCache(max_entries=100, ttl_seconds=60.0)
+
+
+@pytest.fixture
+def make_repository(session_factory, cache):
+    """Cria repositórios com sessões próprias e o mesmo cache (como requisições concorrentes)"""
+    sessions = []
+    
+    def factory() -> VoiceRepository:
+        session = session_factory()
+        sessions.append(session)
+        repository = VoiceRepository(session)
+        repository.cache = cache
+        return repository
+    
+    yield factory
+    for session in sessions:
+        session.close()
@@ -0,0 +1,142 @@
+"""
+Testes da validação de uploads: identificação do container e duração declarada no cabeçalho
+"""
+import io
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils.audio_processing import DecodedAudio
+from app.utils.audio_validation import (
+    AudioValidationError,
+    check_audio_quality,
+    header_duration,
+    sniff_container,
+    validate_upload,
+)
+
+
+def make_wav(seconds: float, sample_rate: int = 16000, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"\x00\x00" * channels * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def atom(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def make_mp4(timescale: int, duration: int, brand: bytes = b"isom", version: int = 0) -> bytes:
+    if version == 1:
+        mvhd = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        mvhd = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    ftyp = atom(b"ftyp", brand + b"\x00\x00\x00\x00" + brand)
+    # moov depois do mdat, como gravam muitos celulares
+    return ftyp + atom(b"mdat", b"\x00" * 64) + atom(b"moov", atom(b"mvhd", mvhd + b"\x00" * 80))
+
+
+def make_flac(sample_rate: int, total_samples: int) -> bytes:
+    info = (sample_rate << 44) | (0 << 41) | (15 << 36) | total_samples
+    streaminfo = b"\x10\x00\x10\x00" + b"\x00" * 6 + info.to_bytes(8, "big") + b"\x00" * 16
+    return b"fLaC" + b"\x80\x00\x00\x22" + streaminfo
+
+
+def ogg_page(granule: int, packet: bytes) -> bytes:
+    return b"OggS" + struct.pack("<BBqIIIB", 0, 0, granule, 1, 0, 0, 1) + bytes([len(packet)]) + packet
+
+
+def make_ogg_opus(seconds: float) -> bytes:
+    return ogg_page(0, b"OpusHead" + b"\x01\x01" + b"\x00" * 9) + ogg_page(int(seconds * 48000), b"\x00" * 32)
+
+
+def make_ogg_vorbis(seconds: float, sample_rate: int = 44100) -> bytes:
+    header = b"\x01vorbis" + struct.pack("<IBI", 0, 1, sample_rate) + b"\x00" * 12
+    return ogg_page(0, header) + ogg_page(int(seconds * sample_rate), b"\x00" * 32)
+
+
+@pytest.mark.parametrize("data, container", [
+    (make_wav(1.0), "wav"),
+    (make_mp4(1000, 3000), "mp4"),
+    (make_mp4(1000, 3000, brand=b"3gp4"), "3gp"),
+    (b"ID3\x04\x00" + b"\x00" * 32, "mp3"),
+    (b"\xff\xfb\x90\x00" + b"\x00" * 32, "mp3"),
+    (b"\xff\xf1\x50\x80" + b"\x00" * 32, "aac"),
+    (make_ogg_opus(1.0), "ogg"),
+    (make_flac(16000, 16000), "flac"),
+    (b"\x1a\x45\xdf\xa3" + b"\x00" * 32, "webm"),
+    (b"#!AMR\n" + b"\x00" * 32, "amr"),
+    (b"caff\x00\x01" + b"\x00" * 32, "caf"),
+])
+def test_sniff_container(data, container):
+    assert sniff_container(data) == container
+
+
+@pytest.mark.parametrize("data", [b"", b"%PDF-1.7", b"<html><body>", b"PK\x03\x04" + b"\x00" * 32])
+def test_sniff_rejects_non_audio(data):
+    assert sniff_container(data) is None
+
+
+@pytest.mark.parametrize("data, container, seconds", [
+    (make_wav(2.5), "wav", 2.5),
+    (make_wav(2.0, sample_rate=44100, channels=2), "wav", 2.0),
+    (make_mp4(600, 1800), "mp4", 3.0),
+    (make_mp4(48000, 48000 * 7, version=1), "mp4", 7.0),
+    (make_mp4(1000, 4500, brand=b"3gp4"), "3gp", 4.5),
+    (make_flac(44100, 44100 * 6), "flac", 6.0),
+    (make_ogg_opus(3.5), "ogg", 3.5),
+    (make_ogg_vorbis(5.0), "ogg", 5.0),
+])
+def test_header_duration(data, container, seconds):
+    assert header_duration(data, container) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("data, container", [
+    (b"\xff\xfb\x90\x00" + b"\x00" * 32, "mp3"),
+    (make_mp4(1000, 3000)[:40], "mp4"),
+    (make_flac(0, 0), "flac"),
+    (b"OggS\x00", "ogg"),
+])
+def test_header_duration_unknown_or_truncated(data, container):
+    assert header_duration(data, container) is None
+
+
+def test_validate_upload_returns_container():
+    assert validate_upload(make_wav(2.0), max_bytes=10_000_000, min_seconds=1.0, max_seconds=30.0) == "wav"
+
+
+@pytest.mark.parametrize("data, max_bytes, status_code", [
+    (make_wav(2.0), 1000, 413),
+    (b"not an audio file at all", 10_000_000, 415),
+    (make_wav(0.5), 10_000_000, 400),
+    (make_mp4(1000, 60_000), 10_000_000, 400),
+])
+def test_validate_upload_rejects(data, max_bytes, status_code):
+    with pytest.raises(AudioValidationError) as error:
+        validate_upload(data, max_bytes=max_bytes, min_seconds=1.0, max_seconds=30.0)
+    assert error.value.status_code == status_code
+
+
+def test_validate_upload_accepts_container_without_declared_duration():
+    data = b"\xff\xfb\x90\x00" + b"\x00" * 32
+    
+    assert validate_upload(data, max_bytes=10_000_000, min_seconds=1.0, max_seconds=30.0) == "mp3"
+
+
+def test_check_audio_quality():
+    t = np.arange(16000) / 16000
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    check_audio_quality(DecodedAudio(tone), max_clipping_ratio=0.05, min_rms_dbfs=-50.0)
+    
+    clipped = np.clip(tone.astype(np.int32) * 10, -32768, 32767).astype("<i2")
+    with pytest.raises(AudioValidationError, match="saturado"):
+        check_audio_quality(DecodedAudio(clipped), max_clipping_ratio=0.05, min_rms_dbfs=-50.0)
+    
+    with pytest.raises(AudioValidationError, match="baixo"):
+        check_audio_quality(DecodedAudio(np.zeros(16000, dtype="<i2")), max_clipping_ratio=0.05, min_rms_dbfs=-50.0)
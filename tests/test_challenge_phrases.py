@@ -0,0 +1,83 @@
+"""
+Testes do carregamento das frases de desafio e da gramática do Vosk
+"""
+from app.services import inference_executor
+from app.services import voice_service
+from app.services.voice_service import get_asr_grammar, load_challenge_phrases
+from app.utils.audio_processing import GRAMMAR_UNKNOWN, build_grammar, validate_transcription
+
+CUSTOM_PHRASES = ["Minha voz é minha senha", "Abra a porta do cofre agora"]
+
+
+def write_phrases(tmp_path):
+    path = tmp_path / "phrases.txt"
+    path.write_text("\n".join(CUSTOM_PHRASES) + "\n\n", encoding="utf-8")
+    return path
+
+
+def test_custom_phrases_are_used_by_grammar(tmp_path, monkeypatch):
+    monkeypatch.setattr(voice_service, "CHALLENGE_PHRASES", list(voice_service.CHALLENGE_PHRASES))
+    monkeypatch.setattr(voice_service.settings, "asr_grammar_mode", "vocabulary")
+    
+    assert get_asr_grammar(CUSTOM_PHRASES[0]) is None
+    assert load_challenge_phrases(str(write_phrases(tmp_path))) is True
+    
+    grammar = get_asr_grammar(CUSTOM_PHRASES[0])
+    assert {"minha", "senha", "cofre", "[unk]"} <= set(grammar)
+    assert "biometria" not in grammar
+
+
+def test_phrase_mode_restricts_to_expected_phrase(tmp_path, monkeypatch):
+    monkeypatch.setattr(voice_service, "CHALLENGE_PHRASES", list(voice_service.CHALLENGE_PHRASES))
+    monkeypatch.setattr(voice_service.settings, "asr_grammar_mode", "phrase")
+    load_challenge_phrases(str(write_phrases(tmp_path)))
+    
+    assert get_asr_grammar(f"  {CUSTOM_PHRASES[1]} ") == ("a", "abra", "agora", "cofre", "do", "porta", "[unk]")
+
+
+def test_missing_or_empty_file_keeps_defaults(tmp_path, monkeypatch):
+    defaults = list(voice_service.CHALLENGE_PHRASES)
+    monkeypatch.setattr(voice_service, "CHALLENGE_PHRASES", list(defaults))
+    empty = tmp_path / "empty.txt"
+    empty.write_text("\n", encoding="utf-8")
+    
+    assert load_challenge_phrases(str(tmp_path / "missing.txt")) is False
+    assert load_challenge_phrases(str(empty)) is False
+    assert voice_service.CHALLENGE_PHRASES == defaults
+
+
+def test_inference_worker_loads_phrases(tmp_path, monkeypatch):
+    monkeypatch.setattr(voice_service, "CHALLENGE_PHRASES", list(voice_service.CHALLENGE_PHRASES))
+    monkeypatch.setattr(inference_executor, "apply_runtime_profile", lambda: None)
+    monkeypatch.setattr(inference_executor, "warm_up_models", lambda *args: None)
+    write_phrases(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    
+    inference_executor._init_worker(None)
+    
+    assert voice_service.CHALLENGE_PHRASES == CUSTOM_PHRASES
+
+
+def phrase_grammar_decode(spoken: str, expected: str) -> str:
+    """Decodificação ideal com a gramática da frase esperada: palavra fora dela vira [unk]"""
+    grammar = set(build_grammar([expected]))
+    return " ".join(word if word in grammar else GRAMMAR_UNKNOWN for word in spoken.lower().split())
+
+
+def test_unknown_tokens_count_as_mismatches():
+    expected = "minha voz é minha senha"
+    
+    assert validate_transcription("minha voz é minha senha", expected)
+    assert validate_transcription("minha voz é [unk] senha", expected)
+    assert not validate_transcription("minha voz [unk] [unk] [unk] [unk]", expected)
+    assert not validate_transcription("[unk] [unk]", expected)
+
+
+def test_other_challenge_phrase_fails_with_phrase_grammar():
+    phrases = voice_service.CHALLENGE_PHRASES
+    
+    for expected in phrases:
+        assert validate_transcription(phrase_grammar_decode(expected, expected), expected)
+        for spoken in phrases:
+            if spoken != expected:
+                assert not validate_transcription(phrase_grammar_decode(spoken, expected), expected)
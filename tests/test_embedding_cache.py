@@ -0,0 +1,130 @@
+"""
+Testes do cache de embeddings de perfis (LRU, TTL, invalidação e geração)
+"""
+import numpy as np
+
+from app.config import Settings
+from app.repositories import embedding_cache as cache_module
+from app.repositories.embedding_cache import EmbeddingCache
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_get_returns_stored_embedding_read_only():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60.0)
+    embedding = vector(1.0)
+    
+    assert cache.put("alice", embedding) is True
+    
+    cached = cache.get("alice")
+    assert cached is embedding
+    assert not cached.flags.writeable
+    assert cache.get("bob") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(max_entries=2, ttl_seconds=60.0)
+    cache.put("alice", vector(1.0))
+    cache.put("bob", vector(2.0))
+    
+    cache.get("alice")
+    cache.put("carol", vector(3.0))
+    
+    assert cache.get("bob") is None
+    assert cache.get("alice") is not None
+    assert cache.get("carol") is not None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=30.0)
+    cache.put("alice", vector(1.0))
+    
+    now[0] += 29.0
+    assert cache.get("alice") is not None
+    
+    now[0] += 2.0
+    assert cache.get("alice") is None
+
+
+def test_invalidate_removes_entry():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60.0)
+    cache.put("alice", vector(1.0))
+    cache.put("bob", vector(2.0))
+    
+    cache.invalidate("alice")
+    
+    assert cache.get("alice") is None
+    assert cache.get("bob") is not None
+
+
+def test_put_after_invalidation_of_same_user_is_discarded():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60.0)
+    generation = cache.generation()
+    
+    cache.invalidate("alice")
+    
+    assert cache.put("alice", vector(1.0), generation) is False
+    assert cache.get("alice") is None
+    # Uma leitura iniciada depois da invalidação é armazenada normalmente
+    assert cache.put("alice", vector(2.0), cache.generation()) is True
+
+
+def test_invalidation_of_other_user_does_not_discard_put():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60.0)
+    generation = cache.generation()
+    
+    cache.invalidate("bob")
+    
+    assert cache.put("alice", vector(1.0), generation) is True
+
+
+def test_forgotten_invalidations_are_treated_conservatively():
+    cache = EmbeddingCache(max_entries=2, ttl_seconds=60.0)
+    generation = cache.generation()
+    
+    # alice sai do registro de invalidações, mas continua sendo posterior à leitura
+    for user_id in ("alice", "bob", "carol"):
+        cache.invalidate(user_id)
+    
+    assert cache.put("alice", vector(1.0), generation) is False
+    assert cache.put("alice", vector(1.0), cache.generation()) is True
+
+
+def test_clear_discards_reads_in_flight():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60.0)
+    cache.put("alice", vector(1.0))
+    generation = cache.generation()
+    
+    cache.clear()
+    
+    assert cache.get("alice") is None
+    assert cache.put("bob", vector(2.0), generation) is False
+
+
+def cache_for(monkeypatch, **overrides):
+    settings = Settings(**overrides)
+    monkeypatch.setattr(cache_module, "get_settings", lambda: settings)
+    cache_module.get_embedding_cache.cache_clear()
+    try:
+        return cache_module.get_embedding_cache()
+    finally:
+        cache_module.get_embedding_cache.cache_clear()
+
+
+def test_cache_is_bypassed_when_several_processes_serve_profiles(monkeypatch):
+    assert cache_for(monkeypatch, web_concurrency=1, inference_executor="thread") is not None
+    assert cache_for(monkeypatch, web_concurrency=4, inference_executor="thread") is None
+    assert cache_for(monkeypatch, web_concurrency=1, inference_executor="prefork") is None
+    assert cache_for(monkeypatch, web_concurrency=1, inference_executor="process") is None
+
+
+def test_multiprocess_opt_in_keeps_cache_with_short_ttl(monkeypatch):
+    cache = cache_for(monkeypatch, web_concurrency=4, inference_executor="prefork", profile_cache_multiprocess=True)
+    
+    assert cache is not None
+    # Entre processos a invalidação não chega: o TTL é o atraso máximo
+    assert cache.ttl_seconds <= 10.0
@@ -0,0 +1,63 @@
+"""
+Testes do codec binário de embeddings
+"""
+import numpy as np
+import pytest
+
+from app.repositories.embedding_codec import FORMAT_VERSION, HEADER, MAGIC, decode_embedding, encode_embedding
+
+
+@pytest.fixture
+def embedding():
+    return np.random.default_rng(0).standard_normal(192).astype(np.float32)
+
+
+def test_float32_round_trip_is_exact(embedding):
+    blob = encode_embedding(embedding, dtype="float32", model_version=3)
+    
+    decoded, header = decode_embedding(blob)
+    
+    assert len(blob) == HEADER.size + 192 * 4
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, embedding)
+    assert (header.dim, header.model_version, header.dtype) == (192, 3, np.dtype("<f4"))
+
+
+def test_float16_round_trip_keeps_cosine(embedding):
+    blob = encode_embedding(embedding, dtype="float16")
+    
+    decoded, header = decode_embedding(blob)
+    
+    assert len(blob) == HEADER.size + 192 * 2
+    assert decoded.dtype == np.float32
+    assert header.dtype == np.dtype("<f2")
+    cosine = decoded @ embedding / (np.linalg.norm(decoded) * np.linalg.norm(embedding))
+    assert cosine > 0.9999
+
+
+def test_accepts_lists_and_column_vectors(embedding):
+    from_list, _ = decode_embedding(encode_embedding(embedding.tolist()))
+    from_column, _ = decode_embedding(encode_embedding(embedding.reshape(-1, 1)))
+    
+    np.testing.assert_array_equal(from_list, embedding)
+    np.testing.assert_array_equal(from_column, embedding)
+
+
+def test_invalid_storage_dtype():
+    with pytest.raises(ValueError, match="dtype"):
+        encode_embedding([1.0, 2.0], dtype="float64")
+
+
+@pytest.mark.parametrize("mutate, message", [
+    (lambda blob: blob[:HEADER.size - 1], "truncado"),
+    (lambda blob: b"JSON" + blob[4:], "não é um embedding"),
+    (lambda blob: HEADER.pack(MAGIC, FORMAT_VERSION + 1, 1, 4, 1) + blob[HEADER.size:], "Versão de formato"),
+    (lambda blob: HEADER.pack(MAGIC, FORMAT_VERSION, 9, 4, 1) + blob[HEADER.size:], "dtype"),
+    (lambda blob: blob[:-1], "Tamanho"),
+    (lambda blob: blob + b"\x00\x00\x00\x00", "Tamanho"),
+])
+def test_corrupted_blobs_are_rejected(mutate, message):
+    blob = encode_embedding([1.0, 2.0, 3.0, 4.0])
+    
+    with pytest.raises(ValueError, match=message):
+        decode_embedding(mutate(blob))
@@ -0,0 +1,103 @@
+"""
+Testes da detecção do joelho de saturação do teste de carga (scripts/load_test.py)
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from load_test import find_knee, parse_mix, parse_server_timing, window_throughput  # noqa: E402
+
+
+def make_step(rate: float, throughput: float, p99_ms: float = 100.0, error_rate: float = 0.0) -> dict:
+    return {"rate": rate, "concurrency": 8, "throughput_rps": throughput, "error_rate": error_rate,
+            "p50_ms": p99_ms / 2, "p95_ms": p99_ms, "p99_ms": p99_ms, "endpoints": {}}
+
+
+def test_knee_is_last_step_before_throughput_falls_behind():
+    steps = [make_step(10, 10), make_step(20, 19.5), make_step(40, 30), make_step(80, 31)]
+    
+    knee = find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)
+    
+    assert knee["rate"] == 20
+
+
+def test_every_step_is_marked_even_after_saturation():
+    steps = [make_step(1, 1), make_step(2, 1.2), make_step(4, 4)]
+    
+    find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)
+    
+    assert [step["saturated"] for step in steps] == [False, True, False]
+
+
+def test_knee_ignores_recovery_after_first_saturation():
+    steps = [make_step(1, 1), make_step(2, 1.2), make_step(4, 4)]
+    
+    assert find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)["rate"] == 1
+
+
+def test_steps_are_ordered_by_rate():
+    steps = [make_step(40, 20), make_step(10, 10), make_step(20, 20)]
+    
+    assert find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)["rate"] == 20
+
+
+def test_error_rate_saturates():
+    steps = [make_step(10, 10), make_step(20, 20, error_rate=0.05)]
+    
+    assert find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)["rate"] == 10
+
+
+def test_p99_factor_is_relative_to_lowest_rate():
+    steps = [make_step(10, 10, p99_ms=100), make_step(20, 20, p99_ms=250), make_step(40, 40, p99_ms=350)]
+    
+    assert find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None)["rate"] == 20
+
+
+def test_slo_replaces_p99_factor():
+    steps = [make_step(10, 10, p99_ms=100), make_step(20, 20, p99_ms=250)]
+    
+    assert find_knee(steps, max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=200)["rate"] == 10
+
+
+def test_saturated_at_lowest_rate_has_no_knee():
+    assert find_knee([make_step(10, 5)], max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None) is None
+    assert find_knee([], max_error_rate=0.01, p99_factor=3.0, slo_p99_ms=None) is None
+
+
+def test_parse_server_timing():
+    header = "queue;dur=0.4, asr;desc=\"vosk\";dur=310.5, total;dur=355.0, invalid;dur=x"
+    
+    assert parse_server_timing(header) == {"queue": 0.4, "asr": 310.5, "total": 355.0}
+    assert parse_server_timing(None) == {}
+
+
+def test_parse_mix():
+    assert parse_mix("verify:8,enroll:1,challenge") == [("verify", 8.0), ("enroll", 1.0), ("challenge", 1.0)]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("identify:1")
+
+
+def test_window_throughput_ignores_latency_of_a_server_that_keeps_up():
+    # 10 req/s durante 20 s, cada uma concluída 2 s depois de enviada
+    finished = [i / 10 + 2.0 for i in range(200)]
+    
+    assert window_throughput(finished, started=0.0, window_end=20.0) == pytest.approx(10.0)
+
+
+def test_window_throughput_reports_service_rate_when_saturated():
+    # o servidor conclui 5 req/s, a fila só esvazia depois da janela
+    finished = [(i + 1) / 5 for i in range(200)]
+    
+    assert window_throughput(finished, started=0.0, window_end=20.0) == pytest.approx(5.0)
+
+
+def test_window_throughput_excludes_drain():
+    inside = [1.0 + i for i in range(10)]
+    drained = [30.0 + i for i in range(50)]
+    
+    assert window_throughput(inside + drained, 0.0, 10.0) == window_throughput(inside, 0.0, 10.0)
+    assert window_throughput([], 0.0, 10.0) == 0.0
@@ -0,0 +1,86 @@
+"""
+Testes do Server-Timing, do X-Request-ID e da propagação do ID da requisição aos logs
+"""
+import json
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.request_timing import (
+    RequestIdLogFilter,
+    RequestTimingMiddleware,
+    current_request_id,
+    server_timing_header,
+)
+from app.services.inference_executor import _run_collecting_stages
+from app.utils.metrics import StageTrace, track_stage
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware)
+    
+    @app.get("/voice/ping")
+    def ping():
+        with track_stage("decode"):
+            pass
+        return {"request_id": current_request_id()}
+    
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+    
+    return app
+
+
+def test_server_timing_header_sums_repeated_stages():
+    trace = StageTrace()
+    trace.stages = [("decode", 0.010), ("asr", 0.300), ("decode", 0.005)]
+    
+    assert server_timing_header(trace, 0.5) == "decode;dur=15.0, asr;dur=300.0, total;dur=500.0"
+
+
+def test_voice_routes_get_request_id_and_server_timing(caplog):
+    client = TestClient(make_app())
+    
+    with caplog.at_level(logging.INFO, logger="app.middleware.request_timing"):
+        response = client.get("/voice/ping", headers={"X-Request-ID": "req-42"})
+    
+    assert response.headers["x-request-id"] == "req-42"
+    assert response.json() == {"request_id": "req-42"}
+    assert "decode;dur=" in response.headers["server-timing"]
+    summary = json.loads(caplog.records[-1].getMessage())
+    assert summary["request_id"] == "req-42"
+    assert summary["status"] == 200
+    assert "decode" in summary["stages_ms"]
+
+
+def test_request_id_is_generated_and_other_routes_are_untouched():
+    client = TestClient(make_app())
+    
+    response = client.get("/voice/ping")
+    assert len(response.headers["x-request-id"]) == 32
+    
+    response = client.get("/health")
+    assert "x-request-id" not in response.headers
+    assert "server-timing" not in response.headers
+
+
+def test_inference_process_job_logs_and_trace_carry_request_id():
+    def job(value):
+        return value, current_request_id()
+    
+    (result, trace) = _run_collecting_stages(job, time.time(), "req-7", 3)
+    
+    assert result == (3, "req-7")
+    assert current_request_id() is None
+    assert "queue" in trace.durations()
+
+
+def test_log_filter_adds_request_id():
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "mensagem", None, None)
+    
+    assert RequestIdLogFilter().filter(record) is True
+    assert record.request_id == "-"
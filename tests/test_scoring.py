@@ -0,0 +1,48 @@
+"""
+Testes do núcleo vetorizado de pontuação
+"""
+import numpy as np
+
+from app.utils.scoring import l2_normalize, score_many_to_many, score_one, score_one_to_many
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_l2_normalize_vector_and_rows():
+    rng = np.random.default_rng(0)
+    vector = rng.standard_normal(192)
+    matrix = rng.standard_normal((5, 192)) * 10
+    
+    assert l2_normalize(vector).dtype == np.float32
+    assert abs(np.linalg.norm(l2_normalize(vector)) - 1.0) < 1e-6
+    np.testing.assert_allclose(np.linalg.norm(l2_normalize(matrix), axis=1), 1.0, atol=1e-6)
+    np.testing.assert_allclose(l2_normalize([3.0, 4.0]), [0.6, 0.8], atol=1e-7)
+
+
+def test_l2_normalize_keeps_zero_vectors():
+    result = l2_normalize(np.array([[0.0, 0.0], [0.0, 2.0]]))
+    
+    np.testing.assert_array_equal(result, [[0.0, 0.0], [0.0, 1.0]])
+    assert not np.isnan(result).any()
+
+
+def test_scores_match_cosine_similarity():
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((3, 64))
+    references = rng.standard_normal((7, 64))
+    q, r = l2_normalize(queries), l2_normalize(references)
+    expected = np.array([[cosine(a, b) for b in references] for a in queries])
+    
+    assert abs(score_one(q[0], r[0]) - expected[0, 0]) < 1e-5
+    np.testing.assert_allclose(score_one_to_many(q[1], r), expected[1], atol=1e-5)
+    np.testing.assert_allclose(score_many_to_many(q, r), expected, atol=1e-5)
+
+
+def test_score_bounds():
+    vector = l2_normalize([1.0, 2.0, 3.0])
+    
+    assert abs(score_one(vector, vector) - 1.0) < 1e-6
+    assert abs(score_one(vector, -vector) + 1.0) < 1e-6
+    assert isinstance(score_one(vector, vector), float)
@@ -0,0 +1,175 @@
+"""
+Testes dos índices de identificação: busca exata e IVF aproximado
+"""
+import numpy as np
+import pytest
+
+from app.models.user_voice_profile import UserVoiceProfile
+from app.repositories.voice_repository import VoiceRepository
+from app.services.voice_service import VoiceService
+from app.utils import speaker_index
+from app.utils.scoring import l2_normalize
+from app.utils.speaker_index import BruteForceIndex, IVFIndex, build_index
+
+
+def clustered_embeddings(n_clusters: int = 20, per_cluster: int = 50, dim: int = 32, seed: int = 0):
+    """Locutores agrupados em torno de centros aleatórios, como embeddings reais"""
+    rng = np.random.default_rng(seed)
+    centers = l2_normalize(rng.standard_normal((n_clusters, dim)))
+    points = np.repeat(centers, per_cluster, axis=0) + rng.standard_normal((n_clusters * per_cluster, dim)) * 0.15
+    ids = [f"user-{i}" for i in range(points.shape[0])]
+    return ids, l2_normalize(points)
+
+
+def exact_top_k(matrix: np.ndarray, ids, query: np.ndarray, k: int):
+    scores = matrix @ query
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def test_brute_force_returns_sorted_top_k():
+    ids, matrix = clustered_embeddings()
+    index = BruteForceIndex()
+    for user_id, embedding in zip(ids, matrix):
+        index.add(user_id, embedding)
+    query = matrix[123]
+    
+    candidates = index.search(query, k=5)
+    
+    assert [user_id for user_id, _ in candidates] == exact_top_k(matrix, ids, query, 5)
+    assert candidates[0] == ("user-123", pytest.approx(1.0, abs=1e-5))
+    scores = [score for _, score in candidates]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_brute_force_update_and_remove():
+    index = BruteForceIndex()
+    index.add("alice", l2_normalize([1.0, 0.0]))
+    index.add("bob", l2_normalize([0.0, 1.0]))
+    index.add("carol", l2_normalize([1.0, 1.0]))
+    
+    index.add("bob", l2_normalize([1.0, 0.1]))
+    assert index.remove("alice") is True
+    assert index.remove("alice") is False
+    
+    assert len(index) == 2
+    assert [user_id for user_id, _ in index.search(l2_normalize([1.0, 0.0]), k=5)] == ["bob", "carol"]
+
+
+def test_brute_force_grows_past_initial_capacity():
+    ids, matrix = clustered_embeddings(n_clusters=30, per_cluster=50)
+    index = BruteForceIndex()
+    for user_id, embedding in zip(ids, matrix):
+        index.add(user_id, embedding)
+    
+    assert len(index) == 1500
+    assert index.search(matrix[1400], k=1)[0][0] == "user-1400"
+
+
+def test_empty_index_search():
+    assert BruteForceIndex().search(l2_normalize([1.0, 0.0]), k=3) == []
+
+
+def test_ivf_with_all_lists_probed_matches_exact_search():
+    ids, matrix = clustered_embeddings()
+    index = IVFIndex.train(matrix, nlist=16, nprobe=16)
+    index.add_batch(ids, matrix)
+    
+    for query_row in (0, 250, 999):
+        query = matrix[query_row]
+        assert [user_id for user_id, _ in index.search(query, k=10)] == exact_top_k(matrix, ids, query, 10)
+
+
+def test_ivf_recall_against_exact_search():
+    ids, matrix = clustered_embeddings(seed=1)
+    index = IVFIndex.train(matrix, nlist=16, nprobe=4)
+    index.add_batch(ids, matrix)
+    rng = np.random.default_rng(2)
+    
+    hits = total = 0
+    for query_row in rng.choice(len(ids), size=50, replace=False):
+        query = l2_normalize(matrix[query_row] + rng.standard_normal(matrix.shape[1]) * 0.05)
+        expected = set(exact_top_k(matrix, ids, query, 10))
+        found = {user_id for user_id, _ in index.search(query, k=10)}
+        hits += len(expected & found)
+        total += len(expected)
+    
+    assert hits / total >= 0.9
+
+
+def test_ivf_update_moves_user_between_lists_and_remove():
+    ids, matrix = clustered_embeddings()
+    index = IVFIndex.train(matrix, nlist=16, nprobe=16)
+    index.add_batch(ids, matrix)
+    
+    index.add("user-0", matrix[999])
+    assert len(index) == len(ids)
+    assert {user_id for user_id, _ in index.search(matrix[999], k=2)} == {"user-0", "user-999"}
+    
+    assert index.remove("user-0") is True
+    assert index.remove("user-0") is False
+    assert "user-0" not in {user_id for user_id, _ in index.search(matrix[999], k=5)}
+
+
+def test_build_index_switches_to_ivf_at_threshold():
+    ids, matrix = clustered_embeddings()
+    items = list(zip(ids, matrix))
+    
+    exact = build_index(items, ivf_threshold=len(items) + 1)
+    ivf = build_index(items, ivf_threshold=len(items), nprobe=8)
+    
+    assert exact.kind == "exact"
+    assert ivf.kind == "ivf"
+    assert len(exact) == len(ivf) == len(items)
+    assert ivf.centroids.shape[0] == int(4 * np.sqrt(len(items)))
+    assert ivf.search(matrix[42], k=1)[0][0] == "user-42"
+
+
+@pytest.fixture
+def published_index(monkeypatch):
+    """Isola o índice global do processo"""
+    monkeypatch.setattr(speaker_index, "_speaker_index", None)
+    monkeypatch.setattr(speaker_index, "_pending_writes", None)
+
+
+def test_writes_during_rebuild_are_replayed(published_index):
+    ids, matrix = clustered_embeddings(n_clusters=4, per_cluster=5)
+    speaker_index.set_speaker_index(build_index(zip(ids, matrix), ivf_threshold=1000))
+    
+    speaker_index.begin_index_build()
+    snapshot = list(zip(ids, matrix))
+    # Escritas depois da leitura do banco: o índice antigo recebe, o novo não viu
+    speaker_index.apply_profile_change("new-user", matrix[0])
+    speaker_index.apply_profile_change("user-1", None)
+    rebuilt = build_index(snapshot, ivf_threshold=1000)
+    speaker_index.set_speaker_index(rebuilt)
+    
+    assert speaker_index.get_speaker_index() is rebuilt
+    found = {user_id for user_id, _ in rebuilt.search(matrix[0], k=len(ids) + 1)}
+    assert "new-user" in found
+    assert "user-1" not in found
+    # Fora de uma reconstrução as escritas não são mais registradas
+    speaker_index.apply_profile_change("later", matrix[2])
+    assert speaker_index._pending_writes is None
+
+
+def test_identify_drops_candidates_deleted_by_another_process(published_index, session_factory, cache):
+    service = VoiceService(session_factory())
+    service.repository.cache = cache
+    alice, bob = l2_normalize(np.array([[1.0, 0.0, 0.0], [0.9, 0.1, 0.0]], dtype=np.float32))
+    service.repository.create_profile("alice", alice)
+    service.repository.create_profile("bob", bob)
+    index = service._get_speaker_index()
+    
+    # Outro processo exclui alice e re-cadastra bob: o índice deste processo não fica sabendo
+    other = session_factory()
+    other.query(UserVoiceProfile).filter(UserVoiceProfile.user_id == "alice").delete()
+    other.query(UserVoiceProfile).filter(UserVoiceProfile.user_id == "bob").update(
+        {"embedding_blob": VoiceRepository._encode(np.array([0.0, 1.0, 0.0], dtype=np.float32))}
+    )
+    other.commit()
+    other.close()
+    
+    candidates = service._confirm_candidates(alice, index.search(alice, 4), top_k=2)
+    
+    assert candidates == [("bob", pytest.approx(0.0, abs=1e-6))]
+    assert "alice" not in {user_id for user_id, _ in index.search(alice, 4)}
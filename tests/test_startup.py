@@ -0,0 +1,43 @@
+"""
+Testes do aquecimento dos modelos no startup da API
+"""
+import asyncio
+
+import pytest
+
+from app import main
+
+
+class FakeExecutor:
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.waited = False
+    
+    def wait_ready(self) -> None:
+        self.waited = True
+
+
+@pytest.fixture
+def warm_up_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "warm_up_models", lambda *args: calls.append(args))
+    monkeypatch.setattr(main, "_readiness", {"database": False, "models": False, "error": None})
+    return calls
+
+
+@pytest.mark.parametrize("mode", ["process", "prefork"])
+def test_worker_modes_do_not_warm_up_in_api_process(mode, warm_up_calls):
+    executor = FakeExecutor(mode)
+    
+    asyncio.run(main._warm_up(executor))
+    
+    assert warm_up_calls == []
+    assert executor.waited
+    assert main._readiness["models"] is True
+
+
+def test_thread_mode_warms_up_in_api_process(warm_up_calls):
+    asyncio.run(main._warm_up(FakeExecutor("thread")))
+    
+    assert len(warm_up_calls) == 1
+    assert main._readiness["models"] is True
@@ -0,0 +1,97 @@
+"""
+Testes da detecção de atividade de voz (trim_silence)
+"""
+import numpy as np
+import pytest
+
+from app.utils.audio_processing import DecodedAudio, trim_silence
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_voice(seconds: float, depth: float = 0.7, amplitude: float = 0.4) -> np.ndarray:
+    """Harmônicos com pitch variável e sílabas de 280ms (depth=1.0 zera o envelope entre sílabas)"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 25 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 1 - depth * (0.5 + 0.5 * np.cos(2 * np.pi * t / 0.28))
+    return amplitude * signal / np.abs(signal).max() * envelope
+
+
+def to_audio(signal: np.ndarray) -> DecodedAudio:
+    return DecodedAudio((np.clip(signal, -1, 1) * 32767).astype('<i2'))
+
+
+def silence(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    return rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001
+
+
+def test_continuous_speech_is_kept_whole():
+    audio = to_audio(synthetic_voice(3.0))
+    
+    trimmed, speech_seconds = trim_silence(audio, max_pause_ms=300)
+    
+    assert trimmed is audio
+    assert speech_seconds == pytest.approx(3.0, abs=0.03)
+
+
+@pytest.mark.parametrize("modulation", [0.0, 0.4])
+def test_tone_without_silence_is_speech(modulation):
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 200 * t) * (1 - modulation + modulation * np.sin(2 * np.pi * 4 * t))
+    
+    _, speech_seconds = trim_silence(to_audio(tone), max_pause_ms=300)
+    
+    assert speech_seconds == pytest.approx(3.0, abs=0.03)
+
+
+def test_leading_and_trailing_silence_are_trimmed():
+    rng = np.random.default_rng(0)
+    signal = np.concatenate([silence(1.0, rng), synthetic_voice(3.0), silence(1.0, rng)])
+    
+    trimmed, speech_seconds = trim_silence(to_audio(signal), max_pause_ms=300)
+    
+    assert speech_seconds == pytest.approx(3.0, abs=0.1)
+    # 150ms de margem em cada ponta
+    assert 3.0 <= trimmed.duration <= 3.4
+
+
+def test_long_internal_pause_is_shortened():
+    rng = np.random.default_rng(0)
+    signal = np.concatenate([synthetic_voice(1.5), silence(2.0, rng), synthetic_voice(1.5)])
+    
+    trimmed, _ = trim_silence(to_audio(signal), max_pause_ms=300)
+    
+    # 3s de fala + 150ms de margem em cada lado da pausa + no máximo 300ms de pausa
+    assert 3.0 <= trimmed.duration <= 3.65
+
+
+@pytest.mark.parametrize("snr_db", [10.0, 5.0, 0.0])
+def test_low_snr_speech_is_not_lost(snr_db):
+    rng = np.random.default_rng(1)
+    voice = synthetic_voice(3.0, depth=1.0, amplitude=0.3)
+    signal = np.concatenate([np.zeros(SAMPLE_RATE // 2), voice, np.zeros(SAMPLE_RATE // 2), voice])
+    noise_std = np.sqrt(np.mean(voice ** 2) / 10 ** (snr_db / 10))
+    signal = signal + rng.standard_normal(signal.shape[0]) * noise_std
+    
+    _, speech_seconds = trim_silence(to_audio(signal), max_pause_ms=300)
+    
+    assert speech_seconds >= 3.0
+
+
+@pytest.mark.parametrize("noise_std", [0.05, 0.0005])
+def test_pure_noise_has_no_speech(noise_std):
+    rng = np.random.default_rng(2)
+    audio = to_audio(rng.standard_normal(3 * SAMPLE_RATE) * noise_std)
+    
+    trimmed, speech_seconds = trim_silence(audio, max_pause_ms=300)
+    
+    assert speech_seconds == 0.0
+    assert trimmed.num_samples == 0
+
+
+def test_audio_shorter_than_a_frame_is_returned_as_is():
+    audio = to_audio(np.zeros(100))
+    
+    assert trim_silence(audio, max_pause_ms=300) == (audio, 0.0)
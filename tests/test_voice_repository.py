@@ -0,0 +1,111 @@
+"""
+Testes do repositório de perfis: centróide incremental e consistência do cache
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from app.utils.scoring import l2_normalize
+
+
+def unit(*values: float) -> np.ndarray:
+    return l2_normalize(np.asarray(values, dtype=np.float32))
+
+
+def test_stale_read_is_not_cached_after_concurrent_update(make_repository, cache):
+    writer = make_repository()
+    writer.create_profile("alice", unit(1, 0, 0))
+    reader = make_repository()
+    
+    read_done = threading.Event()
+    update_done = threading.Event()
+    original_get_profile = reader.get_profile_by_user_id
+    
+    def slow_get_profile(user_id):
+        # Lê a linha antiga e só devolve depois que o re-enrollment for gravado
+        profile = original_get_profile(user_id)
+        read_done.set()
+        update_done.wait(5)
+        return profile
+    
+    reader.get_profile_by_user_id = slow_get_profile
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(embedding=reader.get_embedding_by_user_id("alice")))
+    thread.start()
+    
+    assert read_done.wait(5)
+    writer.update_profile("alice", unit(0, 1, 0))
+    update_done.set()
+    thread.join(5)
+    
+    # A requisição em andamento usa o que leu, mas o perfil antigo não volta para o cache
+    np.testing.assert_allclose(result["embedding"], unit(1, 0, 0), atol=1e-6)
+    assert cache.get("alice") is None
+    np.testing.assert_allclose(make_repository().get_embedding_by_user_id("alice"), unit(0, 1, 0), atol=1e-6)
+    assert cache.get("alice") is not None
+
+
+def test_cache_is_filled_on_miss_and_invalidated_on_write(make_repository, cache):
+    repository = make_repository()
+    repository.create_profile("alice", unit(1, 0, 0))
+    
+    first = repository.get_embedding_by_user_id("alice")
+    assert cache.get("alice") is first
+    
+    repository.add_samples("alice", [unit(0, 1, 0)])
+    assert cache.get("alice") is None
+    
+    repository.delete_profile("alice")
+    assert repository.get_embedding_by_user_id("alice") is None
+
+
+def test_add_samples_keeps_running_centroid(make_repository):
+    repository = make_repository()
+    samples = [unit(1, 0, 0), unit(1, 1, 0), unit(0, 1, 1), unit(3, 1, 2)]
+    
+    repository.add_samples("alice", [samples[0]])
+    repository.add_samples("alice", samples[1:3])
+    profile = repository.add_samples("alice", [samples[3] * 5])
+    
+    embedding_sum, count = repository.get_running_stats(profile)
+    assert count == 4
+    np.testing.assert_allclose(embedding_sum, np.sum(samples, axis=0), atol=1e-5)
+    np.testing.assert_allclose(
+        repository.get_embedding(profile), l2_normalize(np.mean(samples, axis=0)), atol=1e-3
+    )
+
+
+def test_add_samples_reset_discards_previous_samples(make_repository):
+    repository = make_repository()
+    repository.add_samples("alice", [unit(1, 0, 0), unit(0, 1, 0)])
+    
+    profile = repository.add_samples("alice", [unit(0, 0, 1)], reset=True)
+    
+    embedding_sum, count = repository.get_running_stats(profile)
+    assert count == 1
+    np.testing.assert_allclose(embedding_sum, unit(0, 0, 1), atol=1e-6)
+
+
+def test_legacy_profile_counts_as_one_sample(make_repository):
+    repository = make_repository()
+    profile = repository.create_profile("alice", unit(1, 0, 0))
+    profile.embedding_sum = None
+    profile.sample_count = 0
+    repository.db.commit()
+    
+    profile = repository.add_samples("alice", [unit(0, 1, 0)])
+    
+    embedding_sum, count = repository.get_running_stats(profile)
+    assert count == 2
+    np.testing.assert_allclose(repository.get_embedding(profile), unit(1, 1, 0), atol=1e-3)
+
+
+@pytest.mark.parametrize("reset", [False, True])
+def test_add_samples_creates_missing_profile(make_repository, reset):
+    repository = make_repository()
+    
+    profile = repository.add_samples("bob", [unit(0, 0, 1)], reset=reset)
+    
+    assert profile.sample_count == 1
+    assert repository.user_exists("bob")
@@ -0,0 +1,98 @@
+"""
+Testes da verificação em streaming: validações do áudio acumulado e etapa final
+"""
+import json
+
+import numpy as np
+
+from app.services import voice_service
+from app.services.voice_service import VoiceService
+from app.services.voice_stream import VerificationStream
+from app.utils.scoring import l2_normalize
+
+SAMPLE_RATE = 16000
+PHRASE = "minha voz é minha senha"
+
+
+def synthetic_voice(seconds: float) -> np.ndarray:
+    """Harmônicos com pitch variável e sílabas de 280ms"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(140 + 25 * np.sin(2 * np.pi * 0.5 * t)) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 1 - 0.7 * (0.5 + 0.5 * np.cos(2 * np.pi * t / 0.28))
+    return 0.4 * signal / np.abs(signal).max() * envelope
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal(int(seconds * SAMPLE_RATE)) * 0.001
+
+
+def to_pcm(signal: np.ndarray) -> bytes:
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+class FakeRecognizer:
+    def __init__(self, text: str):
+        self.text = text
+    
+    def FinalResult(self) -> str:
+        return json.dumps({"text": self.text})
+
+
+def make_stream(session_factory, cache, signal: np.ndarray, text: str = PHRASE) -> VerificationStream:
+    stream = VerificationStream(session_factory(), "alice", PHRASE)
+    stream.service.repository.cache = cache
+    stream._recognizer = FakeRecognizer(text)
+    stream._pcm.extend(to_pcm(signal))
+    return stream
+
+
+def test_finish_keeps_trimmed_speech_for_the_embedding(session_factory, cache):
+    stream = make_stream(session_factory, cache, np.concatenate([silence(1.0), synthetic_voice(2.0), silence(1.0)]))
+    
+    assert stream.finish() is None
+    
+    speech_seconds = len(stream.speech_pcm) / 2 / SAMPLE_RATE
+    assert 2.0 <= speech_seconds <= 2.4
+    assert stream.duration == 4.0
+
+
+def test_finish_rejects_too_little_speech(session_factory, cache):
+    stream = make_stream(session_factory, cache, np.concatenate([silence(1.0), synthetic_voice(0.5), silence(1.0)]))
+    
+    result = stream.finish()
+    
+    assert result["authenticated"] is False
+    assert "Fala insuficiente" in result["message"]
+    assert stream.speech_pcm is None
+
+
+def test_finish_rejects_short_audio(session_factory, cache):
+    result = make_stream(session_factory, cache, synthetic_voice(0.5)).finish()
+    
+    assert result["authenticated"] is False
+    assert result["message"].startswith("Áudio muito curto")
+
+
+def test_finish_rejects_other_phrase_before_audio_checks(session_factory, cache):
+    stream = make_stream(session_factory, cache, synthetic_voice(0.5), text="abra a porta do cofre")
+    
+    result = stream.finish()
+    
+    assert result["message"] == "A frase pronunciada não corresponde à esperada"
+    assert result["transcription"] == "abra a porta do cofre"
+
+
+def test_verify_speech_scores_against_profile(session_factory, cache, monkeypatch):
+    service = VoiceService(session_factory())
+    service.repository.cache = cache
+    pcm = to_pcm(synthetic_voice(2.0))
+    monkeypatch.setattr(voice_service, "extract_voice_embedding", lambda audio, model: [1.0, 0.0, 0.0])
+    
+    assert service.verify_speech("alice", pcm, PHRASE)["message"] == "Usuário não possui perfil de voz cadastrado"
+    
+    service.repository.create_profile("alice", l2_normalize(np.array([1.0, 0.0, 0.0], dtype=np.float32)))
+    result = service.verify_speech("alice", pcm, PHRASE)
+    
+    assert result["authenticated"] is True
+    assert result["transcription"] == PHRASE